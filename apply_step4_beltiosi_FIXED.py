@@ -1,15 +1,35 @@
 # -*- coding: utf-8 -*-
 """
 Driver (BELTIOSI, FIXED import)
-Same as your apply_step4_beltiosi, but imports the FIXED module.
+Βήμα 4 σε ΟΛΑ τα σενάρια ΒΗΜΑ3_ΣΕΝΑΡΙΟ_* ενός workbook (ή σε dict από DataFrames στη μνήμη).
+- Κάθε σενάριο τρέχει σε ξεχωριστή διεργασία (ProcessPoolExecutor, workers=1 → σειριακά).
+- Τα αποτελέσματα γράφονται σε ΕΝΑ workbook, με τη σειρά των σεναρίων, μόλις είναι διαθέσιμα:
+  ΒΗΜΑ4_ΣΕΝΑΡΙΟ_<i>_BEST, S<i>_Σύγκριση_BEST και φύλλο «Σύνοψη».
+- Ρυθμιζόμενα όρια ανά σενάριο: max_nodes (κόμβοι DFS) και time_budget (δευτερόλεπτα).
+
+Χρήση (CLI):
+    python apply_step4_beltiosi_FIXED.py VIMA3_Scenarios.xlsx -o VIMA4_Scenarios_BELTIOSI_FIXED.xlsx \\
+        --workers 4 --max-nodes 200000 --time-budget 30
+
+Χρήση (βιβλιοθήκη):
+    from apply_step4_beltiosi_FIXED import run_step4_batch
+    out = run_step4_batch({"ΒΗΜΑ3_ΣΕΝΑΡΙΟ_1": df3}, out_path=None, workers=1)
 """
-import pandas as pd, math, re
+import argparse
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from step4_filikoi_omades_beltiosi_FIXED import apply_step4_strict
-import zipfile
+from typing import Dict, Optional, Union
+
+import pandas as pd
 
-src = Path("/mnt/data/VIMA3_Scenarios.xlsx")
-xls = pd.ExcelFile(src)
+from step4_filikoi_omades_beltiosi_FIXED import apply_step4_strict, BATCH_MAX_NODES, BATCH_TIME_BUDGET
+from step_2_helpers_FIXED import parse_friends_cell
+
+SHEET_RE = re.compile(r"^ΒΗΜΑ3_ΣΕΝΑΡΙΟ_(\d+)$")
 
 def infer_col_and_classes(df, preferred):
     col = preferred if preferred in df.columns else None
@@ -32,48 +52,122 @@ def apply_assignment(df3, step3_col, placement_dict):
     out.loc[mask, col4] = out.loc[mask, "ΟΝΟΜΑ"].map(name2cls)
     return out, col4
 
-out_xlsx = Path("/mnt/data/VIMA4_Scenarios_BELTIOSI_FIXED.xlsx")
-out_cmp  = Path("/mnt/data/VIMA4_Comparison_Tables_BELTIOSI_FIXED.xlsx")
-
-summary_rows = []
-
-with pd.ExcelWriter(out_xlsx, engine="openpyxl") as writer_steps, \
-     pd.ExcelWriter(out_cmp,  engine="openpyxl") as writer_cmp:
-
-    for i in (1,2,3):
-        sheet = f"ΒΗΜΑ3_ΣΕΝΑΡΙΟ_{i}"
-        if sheet not in xls.sheet_names:
-            continue
-        df3 = pd.read_excel(src, sheet_name=sheet)
-        step3_col, classes = infer_col_and_classes(df3, sheet)
-        results = apply_step4_strict(df3, assigned_column=step3_col, num_classes=len(classes), max_results=5, max_nodes=120000)
-        if results:
-            (best_placement, best_penalty) = results[0]
-            best_df, best_col = apply_assignment(df3, step3_col, best_placement)
-            best_df.to_excel(writer_steps, index=False, sheet_name=f"ΒΗΜΑ4_ΣΕΝΑΡΙΟ_{i}_BEST")
-            assigned = best_df[~best_df[best_col].isna()].copy()
-            classes_best = sorted(assigned[best_col].dropna().astype(str).unique())
-            lbl = {c: f"Τμήμα {k+1}" for k,c in enumerate(classes_best)}
-            rows=[]
-            for c in classes_best:
-                sub = assigned[assigned[best_col].astype(str)==c]
-                rows.append({"ΤΜΗΜΑ": lbl[c],
-                             "ΑΓΟΡΙΑ": int((sub["ΦΥΛΟ"]=="Α").sum()),
-                             "ΚΟΡΙΤΣΙΑ": int((sub["ΦΥΛΟ"]=="Κ").sum()),
-                             "ΓΝΩΣΗ ΕΛΛ. (Ν)": int((sub["ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"]=="Ν").sum()),
-                             "ΣΥΝΟΛΟ": len(sub)})
-            pd.DataFrame(rows).to_excel(writer_cmp, index=False, sheet_name=f"S{i}_Σύγκριση_BEST")
+def comparison_table(df4, col4):
+    """Πίνακας ανά τμήμα (ΑΓΟΡΙΑ / ΚΟΡΙΤΣΙΑ / ΓΝΩΣΗ ΕΛΛ. / ΣΥΝΟΛΟ) για τους ήδη τοποθετημένους."""
+    assigned = df4[~df4[col4].isna()]
+    classes_best = sorted(assigned[col4].dropna().astype(str).unique())
+    lbl = {c: f"Τμήμα {k+1}" for k,c in enumerate(classes_best)}
+    rows=[]
+    for c in classes_best:
+        sub = assigned[assigned[col4].astype(str)==c]
+        rows.append({"ΤΜΗΜΑ": lbl[c],
+                     "ΑΓΟΡΙΑ": int((sub["ΦΥΛΟ"]=="Α").sum()),
+                     "ΚΟΡΙΤΣΙΑ": int((sub["ΦΥΛΟ"]=="Κ").sum()),
+                     "ΓΝΩΣΗ ΕΛΛ. (Ν)": int((sub["ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"]=="Ν").sum()),
+                     "ΣΥΝΟΛΟ": len(sub)})
+    return pd.DataFrame(rows)
+
+def _scenario_tag(name, pos):
+    m = SHEET_RE.match(str(name))
+    return m.group(1) if m else str(pos)
+
+def run_scenario(name, df3, *, max_results=5, max_nodes=BATCH_MAX_NODES, time_budget=BATCH_TIME_BUDGET):
+    """
+    Βήμα 4 για ένα σενάριο. Top-level ώστε να εκτελείται σε worker διεργασία.
+    Επιστρέφει dict: name / column / df / comparison / penalty / groups / elapsed.
+    """
+    t0 = time.perf_counter()
+    df3 = df3.copy()
+    if "ΦΙΛΟΙ" in df3.columns:
+        # από Excel οι φίλοι έρχονται ως κείμενο· το Βήμα 4 περιμένει λίστες
+        df3["ΦΙΛΟΙ"] = df3["ΦΙΛΟΙ"].map(parse_friends_cell)
+    step3_col, classes = infer_col_and_classes(df3, name)
+    results = apply_step4_strict(df3, assigned_column=step3_col, num_classes=len(classes),
+                                 max_results=max_results, max_nodes=max_nodes, time_budget=time_budget)
+    if results:
+        best_placement, best_penalty = results[0]
+        df4, col4 = apply_assignment(df3, step3_col, best_placement)
+        cmp = comparison_table(df4, col4)
+    else:
+        best_placement, best_penalty = {}, None
+        col4 = step3_col.replace("ΒΗΜΑ3","ΒΗΜΑ4")
+        df4 = df3.copy()
+        df4[col4] = df4[step3_col]
+        cmp = None
+    return {"name": name, "column": col4, "df": df4, "comparison": cmp,
+            "penalty": best_penalty, "groups": len(best_placement),
+            "elapsed": time.perf_counter() - t0}
+
+def load_step3_scenarios(src) -> Dict[str, pd.DataFrame]:
+    """Διαβάζει όλα τα φύλλα ΒΗΜΑ3_ΣΕΝΑΡΙΟ_* (με αριθμητική σειρά)."""
+    xls = pd.ExcelFile(src)
+    sheets = sorted((s for s in xls.sheet_names if SHEET_RE.match(s)),
+                    key=lambda s: int(SHEET_RE.match(s).group(1)))
+    if not sheets:
+        raise ValueError(f"Δεν βρέθηκαν φύλλα ΒΗΜΑ3_ΣΕΝΑΡΙΟ_* στο {src}.")
+    return {s: pd.read_excel(xls, sheet_name=s) for s in sheets}
+
+def run_step4_batch(source: Union[str, Path, Dict[str, pd.DataFrame]],
+                    out_path: Optional[Union[str, Path]] = None,
+                    *, workers: Optional[int] = None, max_results: int = 5,
+                    max_nodes: int = BATCH_MAX_NODES,
+                    time_budget: Optional[float] = BATCH_TIME_BUDGET) -> Dict[str, Dict]:
+    """
+    Εκτελεί το Βήμα 4 σε όλα τα σενάρια του source (path workbook ή dict όνομα → DataFrame).
+    Αν δοθεί out_path, τα φύλλα γράφονται σε ένα workbook καθώς ολοκληρώνεται κάθε σενάριο.
+    Επιστρέφει dict όνομα σεναρίου → αποτέλεσμα του run_scenario.
+    """
+    scenarios = source if isinstance(source, dict) else load_step3_scenarios(source)
+    if workers is None:
+        workers = min(len(scenarios), os.cpu_count() or 1)
+    workers = max(1, int(workers))
+    kw = dict(max_results=max_results, max_nodes=max_nodes, time_budget=time_budget)
+
+    writer = pd.ExcelWriter(out_path, engine="openpyxl") if out_path is not None else None
+    results, summary = {}, []
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(scenarios) > 1 else None
+    try:
+        if pool is not None:
+            pending = [pool.submit(run_scenario, name, df, **kw) for name, df in scenarios.items()]
+            outcomes = (f.result() for f in pending)
         else:
-            base = df3.copy()
-            base[step3_col.replace("ΒΗΜΑ3","ΒΗΜΑ4")] = base[step3_col]
-            base.to_excel(writer_steps, index=False, sheet_name=f"ΒΗΜΑ4_ΣΕΝΑΡΙΟ_{i}_BEST")
-
-# zip bundle
-zip_path = Path("/mnt/data/VIMA4_BELTIOSI_FIXED_bundle.zip")
-with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-    z.write(out_xlsx, arcname=out_xlsx.name)
-    z.write(out_cmp,  arcname=out_cmp.name)
-
-print(out_xlsx.as_posix())
-print(out_cmp.as_posix())
-print(zip_path.as_posix())
+            outcomes = (run_scenario(name, df, **kw) for name, df in scenarios.items())
+        for pos, res in enumerate(outcomes, start=1):
+            name = res["name"]
+            results[name] = res
+            summary.append({"ΣΕΝΑΡΙΟ": name, "ΣΤΗΛΗ": res["column"], "ΟΜΑΔΕΣ": res["groups"],
+                            "PENALTY": res["penalty"], "ΧΡΟΝΟΣ_s": round(res["elapsed"], 3)})
+            if writer is not None:
+                tag = _scenario_tag(name, pos)
+                res["df"].to_excel(writer, index=False, sheet_name=f"ΒΗΜΑ4_ΣΕΝΑΡΙΟ_{tag}_BEST")
+                if res["comparison"] is not None:
+                    res["comparison"].to_excel(writer, index=False, sheet_name=f"S{tag}_Σύγκριση_BEST")
+        if writer is not None:
+            pd.DataFrame(summary).to_excel(writer, index=False, sheet_name="Σύνοψη")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.close()
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Βήμα 4 (BELTIOSI) σε όλα τα φύλλα ΒΗΜΑ3_ΣΕΝΑΡΙΟ_* ενός workbook.")
+    ap.add_argument("src", help="Workbook με φύλλα ΒΗΜΑ3_ΣΕΝΑΡΙΟ_*")
+    ap.add_argument("-o", "--out", default=None, help="Workbook εξόδου (default: VIMA4_Scenarios_BELTIOSI_FIXED.xlsx δίπλα στο src)")
+    ap.add_argument("--workers", type=int, default=None, help="Πλήθος διεργασιών (default: #σεναρίων ή #CPU)")
+    ap.add_argument("--max-nodes", type=int, default=BATCH_MAX_NODES, help="Μέγιστοι κόμβοι DFS ανά σενάριο")
+    ap.add_argument("--time-budget", type=float, default=BATCH_TIME_BUDGET, help="Χρονικό όριο ανά σενάριο (δευτερόλεπτα)")
+    ap.add_argument("--max-results", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    src = Path(args.src)
+    out = Path(args.out) if args.out else src.with_name("VIMA4_Scenarios_BELTIOSI_FIXED.xlsx")
+    res = run_step4_batch(src, out, workers=args.workers, max_results=args.max_results,
+                          max_nodes=args.max_nodes, time_budget=args.time_budget)
+    for name, r in res.items():
+        print(f"{name}: penalty={r['penalty']} groups={r['groups']} ({r['elapsed']:.2f}s)")
+    print(out.as_posix())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+batch_runner.py
+
+Headless εκτέλεση των Βημάτων 1→7 για ΠΟΛΛΑ rosters (π.χ. όλα τα σχολεία του Σεπτεμβρίου), χωρίς Streamlit.
+- Είσοδος: φάκελος με .xlsx/.csv ή manifest (.txt, μία διαδρομή ανά γραμμή, # σχόλια· σχετικές
+  διαδρομές ως προς τον φάκελο του manifest).
+- Κάθε roster τρέχει σε ξεχωριστή διεργασία (ProcessPoolExecutor) και γράφει στο <out>/<όνομα>/:
+  ΑΠΟΤΕΛΕΣΜΑΤΑ.xlsx (ένα φύλλο ανά τελικό σενάριο + Σύγκριση + Στατιστικά) και summary.json.
+- Συνέχιση: το summary.json γράφεται ΤΕΛΕΥΤΑΙΟ (ατομικά)· roster με summary status "ok" και ίδιο
+  hash αρχείου + παραμέτρων παραλείπεται στην επόμενη εκτέλεση. Αποτυχημένα/μισά ξανατρέχουν, και τα
+  βήματα που είχαν ήδη ολοκληρωθεί διαβάζονται από τα checkpoints (<out>/.checkpoints, stage_graph)·
+  π.χ. αλλαγή μόνο του --step6-engine δεν ξανατρέχει τα Βήματα 1–4.
+  Με --force όλα υπολογίζονται ξανά (και τα checkpoints αντικαθίστανται).
+- Φραγμένη μνήμη: κάθε worker ανακυκλώνεται μετά από --tasks-per-worker rosters (max_tasks_per_child)
+  και, σε Unix, προαιρετικό όριο --max-memory-mb (RLIMIT_AS) ανά worker. Στον γονέα επιστρέφει μόνο
+  το μικρό summary, όχι DataFrames. (Με --workers 1 όλα τρέχουν στην ίδια διεργασία, χωρίς όριο.)
+- Το Βήμα 4 τρέχει με τα όρια batch (BATCH_MAX_NODES / BATCH_TIME_BUDGET), όχι τα διαδραστικά.
+
+Χρήση (CLI):
+    python batch_runner.py rosters/ -o results/ --workers 4
+    python batch_runner.py manifest.txt -o results/ --workers 8 --max-memory-mb 2048 --force
+
+Χρήση (βιβλιοθήκη):
+    from batch_runner import run_batch
+    summaries = run_batch("rosters/", "results/", workers=4)
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from pipeline import STEP_ORDER, STEP_PARAMS, normalize_roster
+from scenario_model import scenario_frames
+from stage_graph import CheckpointStore, pipeline_graph
+from statistics_generator import scenario_statistics
+from step4_filikoi_omades_beltiosi_FIXED import BATCH_MAX_NODES, BATCH_TIME_BUDGET
+
+ROSTER_SUFFIXES = (".xlsx", ".csv")
+SUMMARY_NAME = "summary.json"
+RESULTS_NAME = "ΑΠΟΤΕΛΕΣΜΑΤΑ.xlsx"
+CHECKPOINTS_NAME = ".checkpoints"
+
+# Παράμετροι batch πάνω από τα STEP_PARAMS της εφαρμογής
+BATCH_PARAMS = {'step4': {'max_nodes': BATCH_MAX_NODES, 'time_budget': BATCH_TIME_BUDGET}}
+
+# ------------------------ Είσοδος ------------------------
+
+def discover_rosters(source: Union[str, Path]) -> List[Path]:
+    """Φάκελος → όλα τα .xlsx/.csv (ταξινομημένα, χωρίς προσωρινά ~$)· αρχείο → manifest."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p for p in source.iterdir()
+                      if p.suffix.lower() in ROSTER_SUFFIXES and not p.name.startswith("~$"))
+    if not source.is_file():
+        raise ValueError(f"Δεν βρέθηκε φάκελος ή manifest: {source}")
+    paths = []
+    for line in source.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            p = Path(line)
+            paths.append(p if p.is_absolute() else source.parent / p)
+    return paths
+
+def read_roster(path: Union[str, Path]) -> pd.DataFrame:
+    path = Path(path)
+    df = pd.read_csv(path) if path.suffix.lower() == ".csv" else pd.read_excel(path)
+    return normalize_roster(df)
+
+def batch_params(overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Πλήρεις παράμετροι ανά βήμα: STEP_PARAMS ← BATCH_PARAMS ← overrides."""
+    params = {step: dict(STEP_PARAMS[step]) for step in STEP_ORDER}
+    for extra in (BATCH_PARAMS, overrides or {}):
+        for step, values in extra.items():
+            params[step].update(values)
+    # Το Βήμα 1 (enumerate_all) κατανέμει τα παιδιά εκπαιδευτικών μόνο σε Α1/Α2
+    if any(p.get('num_classes', 2) != 2 for p in params.values()):
+        raise ValueError("Το Βήμα 1 υποστηρίζει μόνο 2 τμήματα· num_classes διάφορο του 2 δεν επιτρέπεται.")
+    return params
+
+def roster_fingerprint(path: Union[str, Path], params: Dict[str, Dict[str, Any]]) -> str:
+    """Hash των bytes του αρχείου + των παραμέτρων (αλλαγή σε οποιοδήποτε → ξανατρέχει)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(Path(path).read_bytes())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+def output_dir_for(path: Union[str, Path], out_root: Union[str, Path]) -> Path:
+    return Path(out_root) / re.sub(r'[\\/:*?"<>|]+', "_", Path(path).stem)
+
+def load_summary(out_dir: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((Path(out_dir) / SUMMARY_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def is_done(out_dir: Union[str, Path], fingerprint: str) -> bool:
+    summary = load_summary(out_dir)
+    return bool(summary) and summary.get("status") == "ok" and summary.get("fingerprint") == fingerprint
+
+# ------------------------ Ένα roster ------------------------
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return str(obj)
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Ατομική εγγραφή: πρώτα .tmp και μετά os.replace (ποτέ μισό summary.json)."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=_json_default), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _rank_key(score):
+    return (score["total_score"], score["diff_population"], score["diff_gender"], score["diff_greek"])
+
+def write_results(final_results: Dict[str, Dict[str, Any]], path: Path) -> None:
+    """Ένα φύλλο ανά τελικό σενάριο + Σύγκριση + Στατιστικά (MultiIndex ΣΕΝΑΡΙΟ/ΤΜΗΜΑ)."""
+    rows = [dict(ΣΕΝΑΡΙΟ=name, **res["final_score"]) for name, res in final_results.items()]
+    frames = scenario_frames(final_results)
+    stats = scenario_statistics({name: (frames[name], res["final_column"]) for name, res in final_results.items()})
+    tmp = path.with_name("~" + path.name)
+    with pd.ExcelWriter(tmp, engine="openpyxl") as w:
+        for name, df in frames.items():
+            df.to_excel(w, index=False, sheet_name=name[:31])
+        pd.DataFrame(rows).to_excel(w, index=False, sheet_name="Σύγκριση")
+        stats.to_excel(w, index=True, sheet_name="Στατιστικά")
+    os.replace(tmp, path)
+
+def run_roster(path: Union[str, Path], out_root: Union[str, Path],
+               params: Dict[str, Dict[str, Any]], fingerprint: str, force: bool = False) -> Dict[str, Any]:
+    """
+    Τρέχει 1→7 για ένα roster και γράφει τα αρχεία του· επιστρέφει το summary (και ως summary.json).
+    force=True → αγνοεί και τα checkpoints (όλα τα βήματα υπολογίζονται ξανά και τα αντικαθιστούν).
+    Δεν σηκώνει εξαίρεση: σφάλμα → status "failed" με traceback στο summary.
+    """
+    path = Path(path)
+    out_dir = output_dir_for(path, out_root)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = {"roster": path.as_posix(), "fingerprint": fingerprint, "params": params,
+               "status": "failed", "steps": {}, "messages": []}
+    t0 = time.perf_counter()
+    try:
+        df = read_roster(path)
+        summary["students"] = len(df)
+        graph = pipeline_graph()
+        outputs = graph.run(df, store=CheckpointStore(Path(out_root) / CHECKPOINTS_NAME), params=params,
+                            rerun_from=STEP_ORDER[0] if force else None)
+        for step, (results, messages) in outputs.items():
+            summary["steps"][step] = graph.last_stats[step]
+            summary["messages"] += [[step, kind, text] for kind, text in messages if kind in ("warning", "error")]
+
+        final_results = outputs[STEP_ORDER[-1]][0]
+        if not final_results:
+            summary["error"] = "Κανένα τελικό σενάριο (δείτε τα μηνύματα)."
+        else:
+            ranked = sorted(final_results, key=lambda s: _rank_key(final_results[s]["final_score"]))
+            summary["best"] = ranked[0]
+            summary["scores"] = {name: final_results[name]["final_score"] for name in ranked}
+            write_results(final_results, out_dir / RESULTS_NAME)
+            summary["results"] = RESULTS_NAME
+            summary["status"] = "ok"
+    except Exception as e:
+        summary["error"] = f"{e}\n{traceback.format_exc()}"
+    summary["seconds"] = round(time.perf_counter() - t0, 3)
+    _write_json(out_dir / SUMMARY_NAME, summary)
+    return summary
+
+# ------------------------ Πολλά rosters ------------------------
+
+def _limit_memory(max_memory_mb: Optional[int]) -> None:
+    """Initializer worker: όριο εικονικής μνήμης (μόνο Unix· αλλού αγνοείται)."""
+    if not max_memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = int(max_memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def run_batch(source: Union[str, Path, List[Union[str, Path]]], out_root: Union[str, Path],
+              *, workers: Optional[int] = None, tasks_per_worker: int = 1,
+              max_memory_mb: Optional[int] = None, params: Optional[Dict[str, Dict[str, Any]]] = None,
+              force: bool = False, log=print) -> Dict[str, Dict[str, Any]]:
+    """
+    Εκτελεί όλα τα rosters του source (φάκελος, manifest ή λίστα διαδρομών) με workers διεργασίες.
+    Επιστρέφει {διαδρομή roster: summary}· τα ήδη ολοκληρωμένα διαβάζονται από το summary.json τους.
+    """
+    paths = [Path(p) for p in source] if isinstance(source, (list, tuple)) else discover_rosters(source)
+    if tasks_per_worker < 1:
+        raise ValueError("Το tasks_per_worker πρέπει να είναι ≥ 1.")
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    params = batch_params(params)
+
+    summaries, todo = {}, []
+    for path in paths:
+        key = path.as_posix()
+        if not path.is_file():
+            summaries[key] = {"roster": key, "status": "failed", "error": "Δεν βρέθηκε το αρχείο."}
+            continue
+        fingerprint = roster_fingerprint(path, params)
+        out_dir = output_dir_for(path, out_root)
+        if not force and is_done(out_dir, fingerprint):
+            summaries[key] = load_summary(out_dir)
+            log(f"⏭️  {key}: ήδη ολοκληρωμένο")
+        else:
+            todo.append((path, fingerprint))
+
+    def report(done, summary):
+        extra = f"best={summary.get('best')}" if summary["status"] == "ok" else summary.get("error", "").splitlines()[0]
+        log(f"[{done}/{len(todo)}] {summary['roster']}: {summary['status']} {extra} ({summary.get('seconds', 0):.1f}s)")
+
+    if workers is None:
+        workers = min(len(todo), os.cpu_count() or 1)
+    workers = max(1, int(workers))
+    if workers == 1 or len(todo) <= 1:
+        for done, (path, fingerprint) in enumerate(todo, start=1):
+            summary = run_roster(path, out_root, params, fingerprint, force)
+            summaries[path.as_posix()] = summary
+            report(done, summary)
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=tasks_per_worker,
+                             initializer=_limit_memory, initargs=(max_memory_mb,)) as pool:
+        futures = {pool.submit(run_roster, path, out_root, params, fingerprint, force): path
+                   for path, fingerprint in todo}
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                # π.χ. MemoryError / worker που τερματίστηκε· το roster ξανατρέχει στην επόμενη εκτέλεση
+                summary = {"roster": path.as_posix(), "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            summaries[path.as_posix()] = summary
+            report(done, summary)
+    return summaries
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Βήματα 1→7 για πολλά rosters (headless, παράλληλα).")
+    ap.add_argument("source", help="Φάκελος με .xlsx/.csv ή manifest (.txt, μία διαδρομή ανά γραμμή)")
+    ap.add_argument("-o", "--out", required=True, help="Φάκελος εξόδου (ένας υποφάκελος ανά roster)")
+    ap.add_argument("--workers", type=int, default=None, help="Πλήθος διεργασιών (default: #rosters ή #CPU)")
+    ap.add_argument("--tasks-per-worker", type=int, default=1,
+                    help="Rosters ανά worker πριν ανακυκλωθεί (αποδεσμεύει τη μνήμη)")
+    ap.add_argument("--max-memory-mb", type=int, default=None, help="Όριο μνήμης ανά worker (Unix)")
+    ap.add_argument("--max-nodes", type=int, default=BATCH_MAX_NODES, help="Μέγιστοι κόμβοι DFS στο Βήμα 4")
+    ap.add_argument("--time-budget", type=float, default=BATCH_TIME_BUDGET,
+                    help="Χρονικό όριο Βήματος 4 ανά σενάριο (δευτερόλεπτα)")
+    ap.add_argument("--step6-engine", choices=("hill", "tabu"), default=None, help="Μηχανή του Βήματος 6")
+    ap.add_argument("--num-classes", type=int, default=None, help="Πλήθος τμημάτων (προς το παρόν μόνο 2, όπως το Βήμα 1)")
+    ap.add_argument("--force", action="store_true", help="Ξανατρέχει και τα ήδη ολοκληρωμένα rosters (χωρίς checkpoints)")
+    args = ap.parse_args(argv)
+    if args.num_classes not in (None, 2):
+        ap.error("το Βήμα 1 υποστηρίζει μόνο 2 τμήματα (--num-classes 2)")
+
+    params = {'step4': {'max_nodes': args.max_nodes, 'time_budget': args.time_budget}}
+    if args.step6_engine is not None:
+        params['final'] = {'engine': args.step6_engine}
+    if args.num_classes is not None:
+        for step in ('step2', 'step3', 'step4', 'final'):
+            params.setdefault(step, {})['num_classes'] = args.num_classes
+    summaries = run_batch(args.source, args.out, workers=args.workers, tasks_per_worker=args.tasks_per_worker,
+                          max_memory_mb=args.max_memory_mb, params=params, force=args.force)
+    failed = [k for k, s in summaries.items() if s.get("status") != "ok"]
+    print(f"Ολοκληρώθηκαν {len(summaries) - len(failed)}/{len(summaries)} rosters.")
+    for key in failed:
+        print(f"  ✗ {key}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
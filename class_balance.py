@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+class_balance.py
+
+Κοινή δομή ισορροπίας τμημάτων (χρησιμοποιείται από τα Βήματα 2, 4, 5 και 6).
+- Μετρητές ανά τμήμα: cnt / boys / girls / good / z (ΖΩΗΡΟΣ) / i (ΙΔΙΑΙΤΕΡΟΤΗΤΑ).
+- add / remove / move ενός μαθητή ή ομάδας σε O(1).
+- Διαφορά max−min ανά χαρακτηριστικό για ΟΠΟΙΟΔΗΠΟΤΕ πλήθος τμημάτων, χωρίς επανυπολογισμό:
+  κρατάμε ιστόγραμμα «τιμή → #τμημάτων» και τα τρέχοντα άκρα, οπότε μια μεταβολή κατά k
+  ενημερώνει τα άκρα σε O(k) (k = μέγεθος ομάδας ≤ 3).
+
+Χρήση (ενδεικτικά):
+-------------------
+from class_balance import ClassBalance, student_vector
+
+bal = ClassBalance.from_frame(df, "ΒΗΜΑ4_ΣΕΝΑΡΙΟ_1", classes=["Α1", "Α2", "Α3"])
+bal.add("Α2", student_vector(row))
+bal.spread("boys")   # max−min αγοριών ανάμεσα σε ΟΛΑ τα τμήματα
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+ATTRS: Tuple[str, ...] = ("cnt", "boys", "girls", "good", "z", "i")
+_IDX = {a: k for k, a in enumerate(ATTRS)}
+
+YES_TOKENS = {"Ν", "ΝΑΙ", "YES", "Y", "TRUE", "1"}
+
+def _norm_str(x) -> str:
+    return str(x).strip().upper()
+
+def _is_yes(x) -> bool:
+    return _norm_str(x) in YES_TOKENS
+
+# ------------------------ Attribute vectors ------------------------
+
+def student_vector(row, gender_col: str = "ΦΥΛΟ", lang_col: str = "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ") -> Tuple[int, ...]:
+    """(cnt, boys, girls, good, z, i) για μία γραμμή (dict ή pd.Series)."""
+    g = _norm_str(row.get(gender_col, ""))
+    if lang_col in row:
+        good = _is_yes(row.get(lang_col))
+    else:
+        good = _norm_str(row.get("ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "")) in {"ΚΑΛΗ", "GOOD", "Ν"}
+    return (1, int(g == "Α"), int(g == "Κ"), int(good),
+            int(_is_yes(row.get("ΖΩΗΡΟΣ", ""))), int(_is_yes(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", ""))))
+
+def frame_vectors(df: pd.DataFrame, gender_col: str = "ΦΥΛΟ", lang_col: str = "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ") -> np.ndarray:
+    """Πίνακας (n × 6) int με τα διανύσματα όλων των μαθητών — ένα πέρασμα, χωρίς iterrows."""
+    n = len(df)
+    out = np.zeros((n, len(ATTRS)), dtype=np.int64)
+    out[:, 0] = 1
+    if gender_col in df.columns:
+        g = df[gender_col].map(_norm_str).to_numpy()
+        out[:, 1] = g == "Α"
+        out[:, 2] = g == "Κ"
+    if lang_col in df.columns:
+        out[:, 3] = df[lang_col].map(_is_yes).to_numpy()
+    elif "ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ" in df.columns:
+        out[:, 3] = df["ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"].map(lambda v: _norm_str(v) in {"ΚΑΛΗ", "GOOD", "Ν"}).to_numpy()
+    if "ΖΩΗΡΟΣ" in df.columns:
+        out[:, 4] = df["ΖΩΗΡΟΣ"].map(_is_yes).to_numpy()
+    if "ΙΔΙΑΙΤΕΡΟΤΗΤΑ" in df.columns:
+        out[:, 5] = df["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].map(_is_yes).to_numpy()
+    return out
+
+def sum_vectors(vectors: Iterable[Sequence[int]]) -> Tuple[int, ...]:
+    acc = [0] * len(ATTRS)
+    for v in vectors:
+        for k in range(len(ATTRS)):
+            acc[k] += int(v[k])
+    return tuple(acc)
+
+# ------------------------ Tracker ------------------------
+
+class ClassBalance:
+    """Μετρητές ανά τμήμα + διατηρούμενα άκρα (min/max) ανά χαρακτηριστικό."""
+
+    __slots__ = ("classes", "_pos", "_vals", "_hist", "_lo", "_hi")
+
+    def __init__(self, classes: Sequence, counts: Optional[np.ndarray] = None):
+        self.classes: List = list(classes)
+        if not self.classes:
+            raise ValueError("Απαιτείται τουλάχιστον 1 τμήμα.")
+        self._pos = {c: k for k, c in enumerate(self.classes)}
+        if counts is None:
+            counts = np.zeros((len(self.classes), len(ATTRS)), dtype=np.int64)
+        # λίστες από λίστες: γρηγορότερες από numpy για μεμονωμένα +=1
+        self._vals: List[List[int]] = [[int(x) for x in row] for row in counts]
+        self._rebuild()
+
+    # ---- construction ----
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, class_col: str, classes: Optional[Sequence] = None,
+                   gender_col: str = "ΦΥΛΟ", lang_col: str = "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ",
+                   vectors: Optional[np.ndarray] = None) -> "ClassBalance":
+        """Μετρά τους ήδη τοποθετημένους της class_col σε ένα πέρασμα (τιμές εκτός classes αγνοούνται)."""
+        if classes is None:
+            classes = list(df[class_col].dropna().unique())
+        classes = list(classes)
+        if vectors is None:
+            vectors = frame_vectors(df, gender_col, lang_col)
+        pos = {c: k for k, c in enumerate(classes)}
+        codes = np.fromiter((pos.get(v, -1) for v in df[class_col].to_numpy()), dtype=np.int64, count=len(df))
+        counts = np.zeros((len(classes), len(ATTRS)), dtype=np.int64)
+        m = codes >= 0
+        if m.any():
+            np.add.at(counts, codes[m], vectors[m])
+        return cls(classes, counts)
+
+    def copy(self) -> "ClassBalance":
+        return ClassBalance(self.classes, np.asarray(self._vals, dtype=np.int64))
+
+    def _rebuild(self) -> None:
+        self._hist = []
+        self._lo = []
+        self._hi = []
+        for k in range(len(ATTRS)):
+            h: Dict[int, int] = {}
+            for row in self._vals:
+                h[row[k]] = h.get(row[k], 0) + 1
+            self._hist.append(h)
+            self._lo.append(min(h))
+            self._hi.append(max(h))
+
+    # ---- updates ----
+    def _bump(self, c: int, k: int, d: int) -> None:
+        if d == 0:
+            return
+        row = self._vals[c]
+        old = row[k]
+        new = old + d
+        row[k] = new
+        h = self._hist[k]
+        left = h[old] - 1
+        if left:
+            h[old] = left
+        else:
+            del h[old]
+        h[new] = h.get(new, 0) + 1
+        if new > self._hi[k]:
+            self._hi[k] = new
+        if new < self._lo[k]:
+            self._lo[k] = new
+        if not left:
+            # το παλιό άκρο άδειασε → το νέο άκρο βρίσκεται ανάμεσα σε old και new
+            if old == self._hi[k]:
+                v = old - 1
+                while v not in h:
+                    v -= 1
+                self._hi[k] = v
+            if old == self._lo[k]:
+                v = old + 1
+                while v not in h:
+                    v += 1
+                self._lo[k] = v
+
+    def add(self, cls, vec: Sequence[int]) -> None:
+        c = self._pos[cls]
+        for k in range(len(ATTRS)):
+            self._bump(c, k, int(vec[k]))
+
+    def remove(self, cls, vec: Sequence[int]) -> None:
+        c = self._pos[cls]
+        for k in range(len(ATTRS)):
+            self._bump(c, k, -int(vec[k]))
+
+    def move(self, src, dst, vec: Sequence[int]) -> None:
+        if src == dst:
+            return
+        self.remove(src, vec)
+        self.add(dst, vec)
+
+    # ---- queries ----
+    def get(self, cls, attr: str) -> int:
+        return self._vals[self._pos[cls]][_IDX[attr]]
+
+    def row(self, cls) -> Dict[str, int]:
+        r = self._vals[self._pos[cls]]
+        return {a: r[k] for k, a in enumerate(ATTRS)}
+
+    def counts(self, attr: str) -> Dict:
+        k = _IDX[attr]
+        return {c: self._vals[p][k] for c, p in self._pos.items()}
+
+    def max(self, attr: str) -> int:
+        return self._hi[_IDX[attr]]
+
+    def min(self, attr: str) -> int:
+        return self._lo[_IDX[attr]]
+
+    def spread(self, attr: str) -> int:
+        k = _IDX[attr]
+        return self._hi[k] - self._lo[k]
+
+    def spreads(self) -> Dict[str, int]:
+        return {a: self._hi[k] - self._lo[k] for k, a in enumerate(ATTRS)}
+
+    def as_dicts(self) -> Tuple[Dict, Dict, Dict, Dict]:
+        """(cnt, good, boys, girls) — μορφή που περιμένουν τα accept/penalty του Βήματος 4."""
+        return self.counts("cnt"), self.counts("good"), self.counts("boys"), self.counts("girls")
+
+    def __contains__(self, cls) -> bool:
+        return cls in self._pos
+
+    def __repr__(self) -> str:
+        return f"ClassBalance({ {c: self.row(c) for c in self.classes} })"
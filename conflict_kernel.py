@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+conflict_kernel.py
+
+Κοινός πυρήνας για τις παιδαγωγικές συγκρούσεις ανά τμήμα (Βήματα 2 και 7).
+Η ποινή ενός ζεύγους εξαρτάται ΜΟΝΟ από το προφίλ (Ζ, Ι) των δύο μαθητών:
+    Ι–Ι → 5,   Ι–Ζ → 4,   Ζ–Ζ → 3,   αλλιώς 0
+με «Ι» = έχει ΙΔΙΑΙΤΕΡΟΤΗΤΑ (με ή χωρίς ΖΩΗΡΟΣ) και «Ζ» = ΖΩΗΡΟΣ.
+Άρα το άθροισμα ενός τμήματος είναι κλειστή συνάρτηση τεσσάρων μετρητών κατηγορίας
+(κανένα / μόνο Ζ / μόνο Ι / Ζ+Ι), χωρίς βρόχο O(n²) στα ζεύγη:
+
+    z = μόνο Ζ,  i = μόνο Ι,  b = Ζ+Ι
+    άθροισμα = 3·C(z,2) + 4·z·i + 4·z·b + 5·C(i,2) + 5·i·b + 5·C(b,2)
+    ζεύγη σε σύγκρουση = C(z+i+b, 2)      (κάθε ζεύγος «σημαδεμένων» μαθητών συγκρούεται)
+
+Η κανονικοποίηση Ν/Ο μένει στον καλούντα (κάθε βήμα έχει τους δικούς του κανόνες)·
+ο πυρήνας δέχεται booleans ή τύπους (0..3).
+
+Χρήση (ενδεικτικά):
+-------------------
+from conflict_kernel import ConflictCounter, conflict_sum, student_type
+
+cc = ConflictCounter(["Α1", "Α2"])
+cc.add("Α1", student_type(z=True, i=False))
+cc.total()          # Σ ποινών σε όλα τα τμήματα, O(#τμημάτων)
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Sequence
+
+NONE, Z, I, BOTH = 0, 1, 2, 3     # τύπος μαθητή = Ζ | (Ι << 1)
+N_TYPES = 4
+
+def pair_penalty(aZ, aI, bZ, bI) -> int:
+    """Ποινή ενός ζεύγους — ο ορισμός αναφοράς των Βημάτων 2/7."""
+    if aI and bI:
+        return 5
+    if (aI and bZ) or (bI and aZ):
+        return 4
+    if aZ and bZ:
+        return 3
+    return 0
+
+# PAIR_PENALTY[t][u] για τύπους t, u
+PAIR_PENALTY: List[List[int]] = [[pair_penalty(t & 1, t & 2, u & 1, u & 2) for u in range(N_TYPES)]
+                                 for t in range(N_TYPES)]
+
+def student_type(z, i) -> int:
+    return int(bool(z)) | (int(bool(i)) << 1)
+
+def _c2(x):
+    return x * (x - 1) // 2
+
+CONFLICT_WEIGHTS = (3, 4, 5)   # ποινή ζεύγους Ζ–Ζ / Ζ–Ι / Ι–Ι
+
+def conflict_sum(z, i, b):
+    """Άθροισμα ποινών ενός τμήματος από τα πλήθη (μόνο Ζ, μόνο Ι, Ζ+Ι). Δουλεύει και σε numpy πίνακες."""
+    return 3 * _c2(z) + 4 * z * i + 4 * z * b + 5 * _c2(i) + 5 * i * b + 5 * _c2(b)
+
+def conflict_components(z, i, b):
+    """(#ζευγών Ζ–Ζ, #Ζ–Ι, #Ι–Ι)· conflict_sum = Σ CONFLICT_WEIGHTS · components."""
+    return _c2(z), z * (i + b), _c2(i + b)
+
+def conflict_pairs(z, i, b):
+    """Πλήθος ζευγών με ποινή > 0 ενός τμήματος."""
+    return _c2(z + i + b)
+
+def type_counts(types: Iterable[int]) -> List[int]:
+    out = [0] * N_TYPES
+    for t in types:
+        out[t] += 1
+    return out
+
+def class_conflict_sum(types: Iterable[int]) -> int:
+    n = type_counts(types)
+    return conflict_sum(n[Z], n[I], n[BOTH])
+
+def pairwise_reference(types: Sequence[int]) -> int:
+    """Ο αρχικός βρόχος O(n²) — μόνο για έλεγχο."""
+    s = 0
+    for a in range(len(types)):
+        for b in range(a + 1, len(types)):
+            s += PAIR_PENALTY[types[a]][types[b]]
+    return s
+
+# ------------------------ Incremental counter ------------------------
+
+class ConflictCounter:
+    """Πλήθη τύπων ανά τμήμα + τρέχον άθροισμα ποινών· add/remove/move σε O(1)."""
+
+    __slots__ = ("_n", "_sum", "_total")
+
+    def __init__(self, classes: Iterable = ()):
+        self._n: Dict = {}
+        self._sum: Dict = {}
+        self._total = 0
+        for c in classes:
+            self._ensure(c)
+
+    def _ensure(self, cls) -> List[int]:
+        n = self._n.get(cls)
+        if n is None:
+            n = self._n[cls] = [0] * N_TYPES
+            self._sum[cls] = 0
+        return n
+
+    def delta_add(self, cls, t: int) -> int:
+        """Πόσο θα αυξηθεί το άθροισμα αν μπει ένας μαθητής τύπου t στο cls (χωρίς αλλαγή)."""
+        n = self._n.get(cls)
+        if n is None:
+            return 0
+        row = PAIR_PENALTY[t]
+        return row[1] * n[1] + row[2] * n[2] + row[3] * n[3]
+
+    def add(self, cls, t: int) -> int:
+        n = self._ensure(cls)
+        d = self.delta_add(cls, t)
+        n[t] += 1
+        self._sum[cls] += d
+        self._total += d
+        return d
+
+    def remove(self, cls, t: int) -> int:
+        n = self._n[cls]
+        if n[t] <= 0:
+            raise ValueError(f"Δεν υπάρχει μαθητής τύπου {t} στο τμήμα '{cls}'.")
+        n[t] -= 1
+        d = self.delta_add(cls, t)
+        self._sum[cls] -= d
+        self._total -= d
+        return d
+
+    def move(self, src, dst, t: int) -> None:
+        if src == dst:
+            return
+        self.remove(src, t)
+        self.add(dst, t)
+
+    def counts(self, cls) -> List[int]:
+        return list(self._n.get(cls, [0] * N_TYPES))
+
+    def class_sum(self, cls) -> int:
+        return self._sum.get(cls, 0)
+
+    def class_pairs(self, cls) -> int:
+        n = self._n.get(cls, [0] * N_TYPES)
+        return conflict_pairs(n[Z], n[I], n[BOTH])
+
+    def total(self) -> int:
+        return self._total
+
+    def total_pairs(self) -> int:
+        return sum(self.class_pairs(c) for c in self._n)
+
+    def copy(self) -> "ConflictCounter":
+        cc = ConflictCounter()
+        cc._n = {c: list(n) for c, n in self._n.items()}
+        cc._sum = dict(self._sum)
+        cc._total = self._total
+        return cc
+
+    def __repr__(self) -> str:
+        return f"ConflictCounter(total={self._total}, { {c: n for c, n in self._n.items()} })"
+
+
+if __name__ == "__main__":
+    # Self-check: κλειστή μορφή και αυξητικές ενημερώσεις έναντι του βρόχου ζευγών
+    import random
+    rng = random.Random(0)
+    for _ in range(2000):
+        types = [rng.randrange(N_TYPES) for _ in range(rng.randint(0, 30))]
+        n = type_counts(types)
+        assert class_conflict_sum(types) == pairwise_reference(types)
+        assert sum(w * c for w, c in zip(CONFLICT_WEIGHTS, conflict_components(n[Z], n[I], n[BOTH]))) \
+            == pairwise_reference(types)
+        assert conflict_pairs(n[Z], n[I], n[BOTH]) == sum(
+            1 for a in range(len(types)) for b in range(a + 1, len(types)) if PAIR_PENALTY[types[a]][types[b]])
+    cc = ConflictCounter(["Α1", "Α2", "Α3"])
+    members = {c: [] for c in ("Α1", "Α2", "Α3")}
+    for _ in range(5000):
+        c = rng.choice(list(members))
+        if members[c] and rng.random() < 0.4:
+            t = members[c].pop(rng.randrange(len(members[c])))
+            cc.remove(c, t)
+        else:
+            t = rng.randrange(N_TYPES)
+            members[c].append(t)
+            cc.add(c, t)
+        assert cc.class_sum(c) == pairwise_reference(members[c])
+    assert cc.total() == sum(pairwise_reference(m) for m in members.values())
+    print("conflict_kernel: OK")
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline.py
+
+Τα Βήματα 1–7 ως καθαρές συναρτήσεις (χωρίς Streamlit), ώστε να τρέχουν σε background worker
+(pipeline_jobs.JobManager) ή σε script.
+
+Κάθε compute_*(roster, αποτελέσματα προηγούμενου βήματος, progress, **παράμετροι) επιστρέφει
+(αποτελέσματα, μηνύματα) με μηνύματα = [(είδος, κείμενο)], είδος ∈ {success, info, warning, error, code}.
+Αποτελέσματα = {σενάριο: {'scenario': Scenario, 'column'/'final_column': ..., μετρικές}}: ανάμεσα στα
+βήματα κυκλοφορούν μόνο πίνακες κωδικών τμήματος (scenario_model)· DataFrame φτιάχνεται με
+scenario.frame() μόνο ως είσοδος στο module του βήματος ή για εμφάνιση/εξαγωγή.
+progress(info) καλείται με πραγματικούς μετρητές: {step, done, total} ανά σενάριο και, στο Βήμα 4,
+{nodes, max_nodes, elapsed, time_budget} μέσα στην αναζήτηση. Αν επιστρέψει True, το βήμα
+διακόπτεται με JobCancelled (στο Βήμα 4 η αναζήτηση σταματά αμέσως).
+
+Χρήση (ενδεικτικά):
+-------------------
+from pipeline import run_pipeline
+
+outputs = run_pipeline(df)                 # {"step1": (results, messages), ..., "final": (...)}
+final_results, messages = outputs["final"]
+"""
+import traceback
+
+import numpy as np
+
+from step_1_paidia_ekp_FIXED import enumerate_all
+from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
+from step3_amivaia_filia_FIXED import apply_step3_on_sheet
+from step_2_helpers_FIXED import parse_friends_cell
+from step4_filikoi_omades_beltiosi_FIXED import (apply_step4_strict, INTERACTIVE_MAX_NODES,
+                                                 INTERACTIVE_TIME_BUDGET)
+from step_5_ypoloipoi_mathites_FIXED_compat import apply_step5_to_all_scenarios
+from step_6_final_check_and_fix_PATCHED import apply_step6_to_step5_scenarios
+from step_7_final_score_FIXED_PATCHED import score_one_scenario_auto, score_lower_bound, reaches_bound
+from scenario_model import Scenario
+
+def normalize_roster(df):
+    """Κανονικοποίηση ονομάτων στηλών και τιμών Ν/Ο, Α/Κ ενός roster (όπως στη φόρτωση της εφαρμογής)."""
+    # Κανονικοποίηση στηλών
+    rename_map = {}
+    for col in df.columns:
+        col_str = str(col).strip().upper()
+        if any(x in col_str for x in ['ΟΝΟΜΑ', 'NAME', 'ΜΑΘΗΤΗΣ']):
+            rename_map[col] = 'ΟΝΟΜΑ'
+        elif any(x in col_str for x in ['ΦΥΛΟ', 'GENDER']):
+            rename_map[col] = 'ΦΥΛΟ'
+        elif 'ΓΝΩΣΗ' in col_str and 'ΕΛΛΗΝΙΚ' in col_str:
+            rename_map[col] = 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'
+        elif 'ΠΑΙΔΙ' in col_str and 'ΕΚΠΑΙΔΕΥΤΙΚ' in col_str:
+            rename_map[col] = 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'
+        elif 'ΦΙΛΟΙ' in col_str or 'FRIEND' in col_str:
+            rename_map[col] = 'ΦΙΛΟΙ'
+    
+    if rename_map:
+        df = df.rename(columns=rename_map)
+    
+    # Κανονικοποίηση τιμών
+    if 'ΦΥΛΟ' in df.columns:
+        df['ΦΥΛΟ'] = df['ΦΥΛΟ'].astype(str).str.upper().map({'Α':'Α', 'Κ':'Κ', 'ΑΓΟΡΙ':'Α', 'ΚΟΡΙΤΣΙ':'Κ'}).fillna('Α')
+    
+    for col in ['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ', 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ']:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.upper().map({'Ν':'Ν', 'Ο':'Ο', 'ΝΑΙ':'Ν', 'ΟΧΙ':'Ο', 'YES':'Ν', 'NO':'Ο', '1':'Ν', '0':'Ο'}).fillna('Ο')
+    
+    return df
+
+class JobCancelled(Exception):
+    """Η εκτέλεση ακυρώθηκε από τον χρήστη (progress επέστρεψε True)."""
+
+def _tick(progress, info):
+    if progress is not None and progress(info):
+        raise JobCancelled(info.get('step'))
+
+STEP_PARAMS = {
+    'step1': (('top_k', 3),),
+    'step2': (('num_classes', 2), ('max_results', 5), ('seed', 42)),
+    'step3': (('num_classes', 2),),
+    'step4': (('num_classes', 2), ('max_results', 3), ('max_nodes', INTERACTIVE_MAX_NODES),
+              ('time_budget', INTERACTIVE_TIME_BUDGET)),
+    'final': (('num_classes', 2), ('engine', 'hill'), ('max_iter', None)),
+}
+STEP_ORDER = ('step1', 'step2', 'step3', 'step4', 'final')
+
+def step_params_chain(step):
+    """Παράμετροι του βήματος και όλων των προηγούμενων (το αποτέλεσμα εξαρτάται από όλες)."""
+    chain = ()
+    for name in STEP_ORDER[:STEP_ORDER.index(step) + 1]:
+        chain += ((name,) + STEP_PARAMS[name],)
+    return chain
+
+def compute_step1(df, prev=None, progress=None, *, top_k=3):
+    messages = []
+    teacher_kids = df[df['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'] == 'Ν']
+    if len(teacher_kids) <= 12:
+        sols, names = enumerate_all(df, top_k=top_k)
+    else:
+        messages.append(('warning', "Πολλά παιδιά εκπαιδευτικών (>12). Χρήση greedy approach."))
+        sols, names = enumerate_all(df, top_k=top_k)  # fallback
+    
+    # Ένα Scenario ανά λύση: κοινό roster + στήλη κωδικών τμήματος (οι υπόλοιποι μαθητές: μη τοποθετημένοι)
+    base = Scenario(df, num_classes=2)
+    step1_results = {}
+    for i, (score, assign_map, state) in enumerate(sols, 1):
+        col_name = f"ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{i}"
+        step1_results[f"ΣΕΝΑΡΙΟ_{i}"] = {
+            'scenario': base.with_labels(col_name, df['ΟΝΟΜΑ'].map(assign_map).to_numpy(dtype=object)),
+            'score': score,
+            'assignments': assign_map,
+            'state': state,
+            'column': col_name
+        }
+        _tick(progress, {'step': 'step1', 'done': i, 'total': len(sols)})
+    return step1_results, messages
+
+# ---- Ένα σενάριο ανά κλήση: (όνομα, αποτέλεσμα προηγούμενου βήματος) → (αποτέλεσμα ή None, μηνύματα) ----
+# Δεν σηκώνουν εξαίρεση (εκτός από JobCancelled)· τα compute_* τα τρέχουν στη σειρά, το stage_graph σε pool.
+
+def step2_one(scenario_name, step1_data, progress=None, *, num_classes=2, max_results=5, seed=42):
+    try:
+        scenario = step1_data['scenario'].with_classes(num_classes)
+        results = step2_apply_FIXED_v3(
+            scenario.frame(), 
+            num_classes=num_classes, 
+            step1_col_name=step1_data['column'],
+            seed=seed,
+            max_results=max_results
+        )
+        if not results:
+            return None, [('warning', f"⚠️ {scenario_name}: Δεν βρέθηκαν λύσεις")]
+        # Επιλογή καλύτερου αποτελέσματος
+        best_result = results[0]  # Το πρώτο είναι συνήθως το καλύτερο
+        return {
+            'scenario': scenario.absorb(best_result[1]),
+            'metrics': best_result[2],
+            'column': best_result[1].columns[-1]  # Η νέα στήλη
+        }, [('success', f"✅ {scenario_name}: {len(results)} αποτελέσματα")]
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return None, [('error', f"Σφάλμα στο {scenario_name}: {e}")]
+
+def step3_one(scenario_name, step2_data, progress=None, *, num_classes=2):
+    try:
+        step2_col = step2_data['column']
+        scenario = step2_data['scenario'].with_classes(num_classes)
+        df_step3, metrics = apply_step3_on_sheet(scenario.frame(), step2_col, num_classes=num_classes)
+        return {
+            'scenario': scenario.absorb(df_step3),
+            'metrics': metrics,
+            'column': step2_col.replace('ΒΗΜΑ2', 'ΒΗΜΑ3')
+        }, [('success', f"✅ {scenario_name} ολοκληρώθηκε")]
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return None, [('error', f"Σφάλμα στο {scenario_name}: {e}")]
+
+def step4_one(scenario_name, step3_data, progress=None, *, num_classes=2, max_results=3,
+              max_nodes=INTERACTIVE_MAX_NODES, time_budget=INTERACTIVE_TIME_BUDGET):
+    """progress(info) λαμβάνει τους μετρητές του DFS (nodes, elapsed, ...)· True → σταματά αμέσως."""
+    try:
+        scenario = step3_data['scenario'].with_classes(num_classes)
+        step3_col = step3_data['column']
+        df = scenario.frame()
+        if 'ΦΙΛΟΙ' in df.columns:
+            # από Excel/CSV οι φίλοι έρχονται ως κείμενο· το Βήμα 4 περιμένει λίστες
+            df['ΦΙΛΟΙ'] = df['ΦΙΛΟΙ'].map(parse_friends_cell)
+        
+        # Εκτέλεση Step 4 (διαδραστικό όριο: επιστρέφει το καλύτερο ως τώρα)
+        results = apply_step4_strict(
+            df, 
+            assigned_column=step3_col, 
+            num_classes=num_classes,
+            max_results=max_results,
+            max_nodes=max_nodes,
+            time_budget=time_budget,
+            progress=progress
+        )
+        
+        # Εφαρμογή ανάθεσης (χωρίς λύση → «pass-through» της στήλης Βήματος 3, όπως στο Βήμα 2)
+        step4_col = step3_col.replace('ΒΗΜΑ3', 'ΒΗΜΑ4')
+        moves, best_penalty = {}, None
+        
+        if results:
+            best_placement, best_penalty = results[0]
+            moves = {student: class_assigned for group, class_assigned in best_placement.items()
+                     for student in group}
+            messages = [('success', f"✅ {scenario_name}: Penalty = {best_penalty}")]
+        else:
+            messages = [('warning', f"⚠️ {scenario_name}: Δεν βρέθηκαν λύσεις — συνέχεια με την ανάθεση του Βήματος 3")]
+        
+        return {
+            'scenario': scenario.with_assignments(step3_col, step4_col, moves),
+            'penalty': best_penalty,
+            'column': step4_col
+        }, messages
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return None, [('error', f"Σφάλμα στο {scenario_name}: {e}")]
+
+def _placement_steps(df, step3_col, step4_col):
+    """Βήμα τοποθέτησης ανά μαθητή για το Βήμα 6: 3 = κλειδωμένος ως το Βήμα 3, 4 = ομάδα Βήματος 4, 5 = Βήμα 5."""
+    placed3 = df[step3_col].notna() if step3_col in df.columns else False
+    placed4 = df[step4_col].notna()
+    return np.where(placed3, 3, np.where(placed4, 4, 5))
+
+def final_one(scenario_name, step4_data, progress=None, *, num_classes=2, engine="hill", max_iter=None):
+    """Βήματα 5, 6 (engine/max_iter του Βήματος 6) και 7 για ένα σενάριο."""
+    try:
+        scenario = step4_data['scenario'].with_classes(num_classes)
+        df = scenario.frame()
+        step4_col = step4_data['column']
+        
+        # Step 5: Υπόλοιποι μαθητές
+        penalty5 = 0
+        df_step5, penalty5 = apply_step5_to_all_scenarios(
+            {scenario_name: df}, 
+            step4_col, 
+            num_classes=num_classes
+        )
+        if df_step5 is not None:
+            df = df_step5
+        
+        # Step 6: Τελικός έλεγχος
+        step5_col = step4_col.replace('ΒΗΜΑ4', 'ΒΗΜΑ5')
+        if step5_col not in df.columns:
+            df[step5_col] = df[step4_col]
+        
+        if 'ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ' not in df.columns:
+            df['ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ'] = _placement_steps(df, step4_col.replace('ΒΗΜΑ4', 'ΒΗΜΑ3'), step4_col)
+        if 'ID' not in df.columns:
+            # Το Βήμα 6 ταυτοποιεί μαθητές με ID· χωρίς στήλη → αύξων αριθμός γραμμής
+            df['ID'] = np.arange(1, len(df) + 1)
+        
+        step6_output = apply_step6_to_step5_scenarios(
+            {scenario_name: df},
+            class_col=step5_col,
+            engine=engine,
+            max_iter=max_iter
+        )
+        
+        if scenario_name in step6_output:
+            df_final = step6_output[scenario_name]['df']
+            summary6 = step6_output[scenario_name]['summary']
+        else:
+            df_final = df
+            summary6 = {}
+        
+        # Step 7: Τελικό σκορ
+        step6_col = 'ΒΗΜΑ6_ΤΜΗΜΑ'
+        if step6_col not in df_final.columns:
+            step6_col = step5_col
+        
+        final_score = score_one_scenario_auto(df_final, step6_col)
+        return {
+            'scenario': scenario.absorb(df_final),
+            'step5_penalty': penalty5,
+            'step6_summary': summary6,
+            'final_score': final_score,
+            'final_column': step6_col
+        }, [('success', f"✅ {scenario_name} ολοκληρώθηκε — Τελικό Score: {final_score['total_score']}")]
+        
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return None, [('error', f"Σφάλμα στην τελικοποίηση {scenario_name}: {e}"),
+                      ('code', traceback.format_exc())]
+
+SCENARIO_STEP = {
+    'step2': step2_one,
+    'step3': step3_one,
+    'step4': step4_one,
+    'final': final_one,
+}
+
+def _run_each(step, prev, progress, params):
+    """Τρέχει το SCENARIO_STEP[step] για κάθε σενάριο του prev στη σειρά, με progress ανά σενάριο."""
+    results, messages = {}, []
+    total = len(prev)
+    for k, (scenario_name, data) in enumerate(prev.items(), 1):
+        def inner(info, k=k):
+            # Πρόοδος μέσα στο σενάριο (Βήμα 4: κόμβοι DFS)· True → ακύρωση
+            return progress is not None and progress({
+                'step': step, 'done': k - 1, 'total': total,
+                'nodes': info['nodes'], 'max_nodes': params.get('max_nodes'),
+                'elapsed': info['elapsed'], 'time_budget': params.get('time_budget')})
+        entry, msgs = SCENARIO_STEP[step](scenario_name, data, inner, **params)
+        if entry is not None:
+            results[scenario_name] = entry
+        messages += msgs
+        _tick(progress, {'step': step, 'done': k, 'total': total})
+    return results, messages
+
+def compute_step2(df, step1_results, progress=None, **params):
+    return _run_each('step2', step1_results, progress, params)
+
+def compute_step3(df, step2_results, progress=None, **params):
+    return _run_each('step3', step2_results, progress, params)
+
+def compute_step4(df, step3_results, progress=None, **params):
+    return _run_each('step4', step3_results, progress, params)
+
+def compute_steps_5_6_7(df, step4_results, progress=None, **params):
+    final_results, messages = {}, []
+    
+    for k, (scenario_name, step4_data) in enumerate(step4_results.items(), 1):
+        stop = final_early_stop(final_results)
+        if stop is not None:
+            messages.append(stop)
+            break
+        
+        entry, msgs = final_one(scenario_name, step4_data, **params)
+        messages += msgs
+        if entry is not None:
+            final_results[scenario_name] = entry
+        _tick(progress, {'step': 'final', 'done': k, 'total': len(step4_results)})
+    
+    return final_results, messages
+
+def final_bound(entry):
+    """Κάτω φράγμα του Βήματος 7 για το roster ενός τελικού σεναρίου."""
+    return score_lower_bound(entry['scenario'].frame(), num_classes=entry['final_score']['num_classes'])
+
+def final_early_stop(final_results):
+    """
+    Μήνυμα 'info' αν το καλύτερο ως τώρα τελικό σενάριο πέτυχε το κάτω φράγμα (κανένα επόμενο δεν
+    μπορεί να το ξεπεράσει), αλλιώς None. Κοινό για compute_steps_5_6_7 και stage_graph.
+    """
+    if not final_results:
+        return None
+    # ίδιο roster σε όλα τα σενάρια → ένα φράγμα
+    bound = final_bound(next(iter(final_results.values())))
+    best_name = min(final_results, key=lambda s: final_results[s]['final_score']['total_score'])
+    if not reaches_bound(final_results[best_name]['final_score'], bound):
+        return None
+    return ('info', f"🎯 Το {best_name} πέτυχε το κάτω φράγμα (Score: {bound['total_score']}) — "
+                    f"παραλείπονται τα υπόλοιπα σενάρια.")
+
+COMPUTE = {
+    'step1': compute_step1,
+    'step2': compute_step2,
+    'step3': compute_step3,
+    'step4': compute_step4,
+    'final': compute_steps_5_6_7,
+}
+
+def run_pipeline(df, start='step1', stop='final', prev=None, progress=None, params=None):
+    """
+    Τρέχει τα βήματα start..stop στη σειρά (prev = αποτελέσματα του βήματος πριν το start).
+    params: {βήμα: {παράμετρος: τιμή}} για αλλαγή των STEP_PARAMS.
+    Επιστρέφει {βήμα: (αποτελέσματα, μηνύματα)}.
+    """
+    if start not in STEP_ORDER or stop not in STEP_ORDER:
+        raise ValueError(f"Άγνωστο βήμα (αναμένεται ένα από {', '.join(STEP_ORDER)}).")
+    outputs = {}
+    for step in STEP_ORDER[STEP_ORDER.index(start):STEP_ORDER.index(stop) + 1]:
+        kwargs = dict(STEP_PARAMS[step])
+        kwargs.update((params or {}).get(step, {}))
+        prev, messages = COMPUTE[step](df, prev, progress, **kwargs)
+        outputs[step] = (prev, messages)
+    return outputs
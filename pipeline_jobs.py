@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline_jobs.py
+
+Εκτέλεση βημάτων του pipeline σε background threads, ώστε η σελίδα Streamlit να μην μπλοκάρει.
+- JobManager.submit(fn, ...) → Job· το fn καλείται ως fn(*args, progress=job.report, **kwargs).
+- Job.report(info) κρατά τους τελευταίους πραγματικούς μετρητές (σενάρια, κόμβοι DFS) και επιστρέφει
+  True όταν έχει ζητηθεί ακύρωση — το ίδιο πρωτόκολλο με το progress του pipeline/Βήματος 4.
+- Jobs με ίδιο key (π.χ. hash roster + παράμετροι) που τρέχουν ή ολοκληρώθηκαν ΔΕΝ ξαναϋποβάλλονται.
+- Ένα κοινό job έχει «συνδρομητές» (π.χ. id συνεδρίας)· release(job_id, subscriber) αποσυνδέει μία
+  συνεδρία και το job ακυρώνεται μόνο όταν φύγει και ο τελευταίος — ένας χρήστης δεν ακυρώνει τον άλλον.
+- Ο manager ζει όσο η διεργασία (st.cache_resource), άρα τα jobs επιβιώνουν από reruns της σελίδας·
+  η συνεδρία κρατά μόνο το job id.
+Threads (όχι διεργασίες): το progress callback και τα αποτελέσματα μένουν στη μνήμη χωρίς pickling.
+
+Χρήση (ενδεικτικά):
+-------------------
+from pipeline import compute_step4
+from pipeline_jobs import JobManager
+
+jobs = JobManager(max_workers=2)
+job = jobs.submit(compute_step4, roster, step3_results, key=("roster-hash", "step4"))
+job.fraction()      # 0..1 από τους μετρητές
+job.cancel()        # το Βήμα 4 σταματά στον επόμενο έλεγχο (κάθε PROGRESS_EVERY κόμβους)
+jobs.release(job.id, "session-1")   # ή: ακύρωση μόνο αν δεν το περιμένει άλλη συνεδρία
+"""
+from __future__ import annotations
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from pipeline import JobCancelled
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job:
+    """Handle ενός background υπολογισμού: κατάσταση, πρόοδος, αποτέλεσμα, ακύρωση."""
+
+    def __init__(self, job_id: str, key: Optional[Hashable] = None, label: str = ""):
+        self.id = job_id
+        self.key = key
+        self.label = label
+        self.status = PENDING
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.subscribers: Set[Hashable] = set()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---- από τον worker ----
+    def report(self, info: Dict[str, Any]) -> bool:
+        """progress callback: αποθηκεύει τους μετρητές· True → ζητήθηκε ακύρωση."""
+        with self._lock:
+            self.progress = dict(info)
+        return self._cancel.is_set()
+
+    def _set(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            if status == RUNNING:
+                self.started = time.time()
+            if status in FINISHED:
+                self.result, self.error, self.finished = result, error, time.time()
+        if status in FINISHED:
+            self._done.set()
+
+    # ---- από το UI ----
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def finished_ok(self) -> bool:
+        return self.status == DONE
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def fraction(self) -> float:
+        """0..1: ολοκληρωμένα σενάρια + (στο Βήμα 4) κλάσμα κόμβων/χρόνου του τρέχοντος σεναρίου."""
+        if self.status == DONE:
+            return 1.0
+        with self._lock:
+            info = dict(self.progress)
+        total = info.get('total') or 0
+        if not total:
+            return 0.0
+        frac = float(info.get('done', 0))
+        if 'nodes' in info and info.get('max_nodes'):
+            part = info['nodes'] / info['max_nodes']
+            if info.get('time_budget'):
+                part = max(part, info.get('elapsed', 0.0) / info['time_budget'])
+            frac += min(1.0, part)
+        return min(1.0, frac / total)
+
+    def snapshot(self) -> Dict[str, Any]:
+        frac = self.fraction()
+        with self._lock:
+            return {"id": self.id, "label": self.label, "status": self.status, "progress": dict(self.progress),
+                    "fraction": frac, "error": self.error, "cancel_requested": self._cancel.is_set(),
+                    "elapsed": ((self.finished or time.time()) - self.started) if self.started else 0.0}
+
+    def __repr__(self) -> str:
+        return f"Job({self.id!r}, {self.label!r}, {self.status})"
+
+class JobManager:
+    """Pool από threads + μητρώο jobs (τα τελευταία `keep` ολοκληρωμένα κρατιούνται για ανάγνωση)."""
+
+    def __init__(self, max_workers: int = 2, keep: int = 64):
+        if max_workers < 1:
+            raise ValueError("Το max_workers πρέπει να είναι ≥ 1.")
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-job")
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.keep = keep
+
+    def submit(self, fn: Callable, *args, key: Optional[Hashable] = None, label: str = "",
+               subscriber: Optional[Hashable] = None, **kwargs) -> Job:
+        """
+        Υποβάλλει fn(*args, progress=job.report, **kwargs). Αν υπάρχει job με ίδιο key που τρέχει ή
+        ολοκληρώθηκε επιτυχώς, επιστρέφεται αυτό (ένας υπολογισμός για όλες τις συνεδρίες).
+        Ο subscriber (αν δοθεί) προστίθεται στους συνδρομητές του job (βλ. release).
+        """
+        with self._lock:
+            if key is not None and key in self._by_key:
+                job = self._jobs.get(self._by_key[key])
+                if job is not None and job.status not in (FAILED, CANCELLED) and not job.cancel_requested:
+                    if subscriber is not None:
+                        job.subscribers.add(subscriber)
+                    return job
+            job = Job(f"job-{next(self._ids)}", key, label)
+            if subscriber is not None:
+                job.subscribers.add(subscriber)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._prune()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job: Job, fn: Callable, args, kwargs) -> None:
+        if job.cancel_requested:
+            job._set(CANCELLED)
+            return
+        job._set(RUNNING)
+        try:
+            result = fn(*args, progress=job.report, **kwargs)
+        except JobCancelled:
+            job._set(CANCELLED)
+        except Exception as e:
+            job._set(FAILED, error=f"{e}\n{traceback.format_exc()}")
+        else:
+            job._set(DONE, result=result)
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        for job in sorted(finished, key=lambda j: j.finished or 0)[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+            if job.key is not None and self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        job.cancel()
+        return True
+
+    def release(self, job_id: str, subscriber: Hashable) -> bool:
+        """
+        Ο subscriber δεν περιμένει πια το job. Ακύρωση μόνο αν δεν έμεινε άλλος συνδρομητής·
+        True → το job ακυρώθηκε.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.subscribers.discard(subscriber)
+            if job.subscribers or job.status in FINISHED:
+                return False
+        job.cancel()
+        return True
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, cancel: bool = True, wait: bool = False) -> None:
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._pool.shutdown(wait=wait, cancel_futures=cancel)
+        for job in self.jobs():
+            if job.status == PENDING and cancel:
+                job._set(CANCELLED)
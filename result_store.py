@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+result_store.py
+
+Συμπαγής αποθήκευση αποτελεσμάτων βημάτων (για cache της εφαρμογής Streamlit).
+- frame_fingerprint(df): hash περιεχομένου (στήλες + τιμές), ανεξάρτητο από το όνομα αρχείου.
+- compact_results / expand_results: κάθε σενάριο κρατά ΜΟΝΟ τις στήλες που πρόσθεσε/άλλαξε σε σχέση
+  με το roster· το πλήρες DataFrame ξαναχτίζεται από το roster όταν διαβαστεί.
+  (Αν ένα βήμα άλλαξε γραμμές/index, κρατιέται ολόκληρο το DataFrame.)
+- Αποτελέσματα με "scenario" (scenario_model.Scenario) αποθηκεύονται χωρίς το roster (detach/attach).
+
+Χρήση (ενδεικτικά):
+-------------------
+from result_store import frame_fingerprint, compact_results, expand_results
+
+key = frame_fingerprint(roster)
+packed = compact_results(step_results, roster)   # {"ΣΕΝΑΡΙΟ_1": {"df": ..., ...}, ...}
+step_results = expand_results(packed, roster)
+"""
+from __future__ import annotations
+import hashlib
+from typing import Any, Dict
+
+import pandas as pd
+
+from scenario_model import Scenario
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """blake2b των ονομάτων στηλών και όλων των τιμών (object στήλες με λίστες → ως κείμενο)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(map(str, df.columns))).encode("utf-8"))
+    h.update(str(len(df)).encode())
+    try:
+        values = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        values = pd.util.hash_pandas_object(df.astype(str), index=True)
+    h.update(values.to_numpy().tobytes())
+    return h.hexdigest()
+
+def _compact_frame(df: pd.DataFrame, base: pd.DataFrame) -> Dict[str, Any]:
+    if not df.index.equals(base.index):
+        return {"full": df}
+    columns = {}
+    for col in df.columns:
+        if col not in base.columns or not df[col].equals(base[col]):
+            columns[col] = df[col].to_numpy(copy=True)
+    dropped = [c for c in base.columns if c not in df.columns]
+    return {"order": list(df.columns), "columns": columns, "dropped": dropped}
+
+def _expand_frame(packed: Dict[str, Any], base: pd.DataFrame) -> pd.DataFrame:
+    if "full" in packed:
+        return packed["full"].copy()
+    out = base.drop(columns=packed["dropped"]) if packed["dropped"] else base.copy()
+    for col, values in packed["columns"].items():
+        out[col] = values
+    return out[packed["order"]]
+
+def compact_results(results: Dict[str, Dict[str, Any]], base: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """{σενάριο: {"df"/"scenario": ...}} → ίδια δομή σε συμπαγή μορφή (τα υπόλοιπα κλειδιά ως έχουν)."""
+    out = {}
+    for name, res in results.items():
+        res = dict(res)
+        if isinstance(res.get("scenario"), Scenario):
+            res["scenario"] = res["scenario"].detach()
+        if isinstance(res.get("df"), pd.DataFrame):
+            res["df"] = _compact_frame(res["df"], base)
+        out[name] = res
+    return out
+
+def expand_results(packed: Dict[str, Dict[str, Any]], base: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Αντίστροφο του compact_results· κάθε κλήση δίνει ΝΕΑ DataFrames (ασφαλή για τροποποίηση)."""
+    out = {}
+    for name, res in packed.items():
+        res = dict(res)
+        if isinstance(res.get("scenario"), Scenario):
+            res["scenario"] = res["scenario"].attach(base)
+        if isinstance(res.get("df"), dict):
+            res["df"] = _expand_frame(res["df"], base)
+        out[name] = res
+    return out
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+scenario_model.py
+
+Συμπαγής αναπαράσταση σεναρίου ανάμεσα στα βήματα του pipeline.
+- Ένα roster (DataFrame) κοινό για όλα τα σενάρια — δεν τροποποιείται ποτέ.
+- Ανά στήλη τμήματος (ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1, ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1, ...) ένας πίνακας int8 με κωδικούς τμήματος
+  (0 = Α1, 1 = Α2, ...· UNPLACED = -1 για μη τοποθετημένους): n bytes ανά βήμα αντί για ολόκληρο πίνακα.
+- Ό,τι άλλο άλλαξε ένα βήμα σε σχέση με το roster (π.χ. κανονικοποίηση Ν/Ο στο Βήμα 2, στήλες audit του
+  Βήματος 6) κρατιέται ως «overrides» ανά στήλη.
+- Κάθε with_* επιστρέφει ΝΕΟ Scenario που μοιράζεται (χωρίς αντιγραφή) roster και προηγούμενους πίνακες.
+- DataFrame δημιουργείται μόνο με frame(), για εμφάνιση/εξαγωγή ή ως είσοδος σε module βήματος.
+
+Χρήση (ενδεικτικά):
+-------------------
+from scenario_model import Scenario
+
+sc = Scenario(roster, num_classes=2)
+sc = sc.with_labels("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1", roster["ΟΝΟΜΑ"].map(assign_map))
+sc = sc.absorb(step2_df)          # κρατά μόνο ό,τι πρόσθεσε/άλλαξε το βήμα
+df = sc.frame()                   # πλήρες DataFrame (νέο, ασφαλές για τροποποίηση)
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+UNPLACED = -1
+MAX_CLASSES = int(np.iinfo(np.int8).max)
+
+def class_labels_for(num_classes: int) -> Tuple[str, ...]:
+    if not 1 <= num_classes <= MAX_CLASSES:
+        raise ValueError(f"Το πλήθος τμημάτων πρέπει να είναι 1..{MAX_CLASSES}.")
+    return tuple(f"Α{i+1}" for i in range(num_classes))
+
+def encode_labels(values, class_labels: Sequence[str]) -> Optional[np.ndarray]:
+    """Ετικέτες τμημάτων → int8 (NaN/κενό → UNPLACED). None αν υπάρχει τιμή εκτός class_labels."""
+    index = {label: code for code, label in enumerate(class_labels)}
+    values = pd.Series(values, dtype=object)
+    missing = values.isna() | (values.astype(str).str.strip() == "")
+    codes = values.astype(str).str.strip().map(index)
+    if codes[~missing].isna().any():
+        return None
+    return codes.where(~missing, UNPLACED).to_numpy(dtype=np.int8)
+
+def decode_labels(codes: np.ndarray, class_labels: Sequence[str]) -> np.ndarray:
+    """int8 → object πίνακας ετικετών (UNPLACED → NaN)."""
+    table = np.array(list(class_labels) + [np.nan], dtype=object)
+    return table[np.where(codes < 0, len(class_labels), codes)]
+
+class Scenario:
+    """Roster + πίνακες κωδικών τμήματος ανά βήμα + overrides στηλών. Αμετάβλητο."""
+
+    __slots__ = ("roster", "class_labels", "labels", "overrides", "dropped", "order", "meta")
+
+    def __init__(self, roster: Optional[pd.DataFrame], num_classes: int = 2, *,
+                 class_labels: Optional[Sequence[str]] = None,
+                 labels: Optional[Mapping[str, np.ndarray]] = None,
+                 overrides: Optional[Mapping[str, np.ndarray]] = None,
+                 dropped: Iterable[str] = (), order: Optional[Sequence[str]] = None,
+                 meta: Optional[Mapping[str, Any]] = None):
+        self.roster = roster
+        self.class_labels = tuple(class_labels) if class_labels is not None else class_labels_for(num_classes)
+        self.labels: Dict[str, np.ndarray] = dict(labels or {})
+        self.overrides: Dict[str, np.ndarray] = dict(overrides or {})
+        self.dropped: Tuple[str, ...] = tuple(dropped)
+        self.order: Optional[Tuple[str, ...]] = tuple(order) if order is not None else None
+        self.meta: Dict[str, Any] = dict(meta or {})
+
+    def _replace(self, **changes) -> "Scenario":
+        state = dict(class_labels=self.class_labels, labels=self.labels, overrides=self.overrides,
+                     dropped=self.dropped, order=self.order, meta=self.meta)
+        roster = changes.pop("roster", self.roster)
+        state.update(changes)
+        return Scenario(roster, **state)
+
+    # ---- ανάγνωση ----
+    @property
+    def num_classes(self) -> int:
+        return len(self.class_labels)
+
+    @property
+    def nbytes(self) -> int:
+        """Μνήμη πέρα από το κοινό roster."""
+        return sum(a.nbytes for a in self.labels.values()) + sum(a.nbytes for a in self.overrides.values())
+
+    def codes(self, column: str) -> np.ndarray:
+        """Κωδικοί τμήματος μιας στήλης (read-only view)."""
+        codes = self.labels[column].view()
+        codes.flags.writeable = False
+        return codes
+
+    def column(self, column: str) -> np.ndarray:
+        """Τιμές μιας στήλης όπως θα τις έβλεπε το frame() (χωρίς δημιουργία DataFrame)."""
+        if column in self.labels:
+            return decode_labels(self.labels[column], self.class_labels)
+        if column in self.overrides:
+            return self.overrides[column]
+        if column in self.dropped or self.roster is None:
+            raise KeyError(column)
+        return self.roster[column].to_numpy()
+
+    def columns(self) -> List[str]:
+        """Σειρά στηλών του frame(): όπως την άφησε το τελευταίο βήμα, αλλιώς roster + νέες στήλες."""
+        if self.order is not None:
+            return list(self.order)
+        out = [c for c in self.roster.columns if c not in self.dropped]
+        out += [c for c in self.overrides if c not in out]
+        out += [c for c in self.labels if c not in out]
+        return out
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """ΝΕΟ DataFrame: roster (με overrides) + στήλες τμήματος ως ετικέτες (NaN = μη τοποθετημένος)."""
+        if self.roster is None:
+            raise ValueError("Το σενάριο δεν έχει roster (attach πρώτα).")
+        wanted = self.columns() if columns is None else list(columns)
+        base = [c for c in wanted if c in self.roster.columns and c not in self.overrides and c not in self.labels]
+        out = self.roster[base].copy()
+        for col in wanted:
+            if col not in base:
+                out[col] = self.column(col)
+        return out[wanted]
+
+    # ---- νέα σενάρια ----
+    def with_labels(self, column: str, values, **meta) -> "Scenario":
+        """Νέα στήλη τμήματος από ετικέτες (ή ήδη κωδικούς int)."""
+        values = np.asarray(values)
+        if values.dtype.kind in "iu":
+            codes = values.astype(np.int8, copy=False)
+        else:
+            codes = encode_labels(values, self.class_labels)
+            if codes is None:
+                raise ValueError(f"Η στήλη '{column}' έχει τιμές εκτός των τμημάτων {', '.join(self.class_labels)}.")
+        if len(codes) != len(self.roster):
+            raise ValueError(f"Η στήλη '{column}' έχει {len(codes)} τιμές για roster {len(self.roster)} μαθητών.")
+        labels = dict(self.labels)
+        labels[column] = codes
+        order = self.order
+        if order is not None and column not in order:
+            order = order + (column,)
+        return self._replace(labels=labels, order=order, meta={**self.meta, **meta})
+
+    def with_classes(self, num_classes: int) -> "Scenario":
+        """Περισσότερα τμήματα για τα επόμενα βήματα (οι υπάρχοντες κωδικοί μένουν ίδιοι)."""
+        if num_classes <= self.num_classes:
+            return self
+        return self._replace(class_labels=class_labels_for(num_classes))
+
+    def with_assignments(self, source: str, column: str, assignments: Mapping[str, str], **meta) -> "Scenario":
+        """Αντίγραφο της στήλης source με τους μαθητές του assignments (όνομα → τμήμα) σε νέα τμήματα."""
+        codes = self.labels[source].copy()
+        index = {label: code for code, label in enumerate(self.class_labels)}
+        names = pd.Series(self.column("ΟΝΟΜΑ"), dtype=object)
+        target = names.map({n: index[c] for n, c in assignments.items()})
+        hit = target.notna().to_numpy()
+        codes[hit] = target[hit].to_numpy(dtype=np.int8)
+        return self.with_labels(column, codes, **meta)
+
+    def absorb(self, df: pd.DataFrame, **meta) -> "Scenario":
+        """
+        Νέο σενάριο από την έξοδο ενός βήματος: νέες/αλλαγμένες στήλες με ετικέτες τμημάτων → int8,
+        οι υπόλοιπες αλλαγές → overrides. Αν το βήμα άλλαξε γραμμές/σειρά, σηκώνει ValueError.
+        """
+        if len(df) != len(self.roster) or not df.index.equals(self.roster.index):
+            raise ValueError("Το βήμα άλλαξε τις γραμμές του roster· δεν αναπαρίσταται ως Scenario.")
+        labels, overrides = dict(self.labels), dict(self.overrides)
+        for col in df.columns:
+            values = df[col]
+            if col in labels:
+                codes = encode_labels(values.to_numpy(dtype=object), self.class_labels)
+                if codes is not None:
+                    if not np.array_equal(codes, labels[col]):
+                        labels[col] = codes
+                    continue
+                del labels[col]
+            elif col in overrides:
+                if pd.Series(overrides[col], index=df.index).equals(values):
+                    continue
+            elif col in self.roster.columns:
+                if self.roster[col].equals(values):
+                    continue
+            else:
+                codes = encode_labels(values.to_numpy(dtype=object), self.class_labels)
+                if codes is not None and (codes != UNPLACED).any():
+                    labels[col] = codes
+                    continue
+            overrides[col] = values.to_numpy(copy=True)
+        kept = set(df.columns)
+        labels = {c: a for c, a in labels.items() if c in kept}
+        overrides = {c: a for c, a in overrides.items() if c in kept}
+        dropped = [c for c in self.roster.columns if c not in kept]
+        return self._replace(labels=labels, overrides=overrides, dropped=dropped, order=list(df.columns),
+                             meta={**self.meta, **meta})
+
+    # ---- cache ----
+    def detach(self) -> "Scenario":
+        """Χωρίς roster (για αποθήκευση σε cache· το roster ξαναδίνεται με attach)."""
+        return self._replace(roster=None)
+
+    def attach(self, roster: pd.DataFrame) -> "Scenario":
+        return self._replace(roster=roster)
+
+    def __repr__(self) -> str:
+        n = 0 if self.roster is None else len(self.roster)
+        return f"Scenario(n={n}, classes={self.num_classes}, labels={list(self.labels)}, overrides={list(self.overrides)})"
+
+def scenario_frames(results: Mapping[str, Mapping[str, Any]]) -> Dict[str, pd.DataFrame]:
+    """{σενάριο: αποτέλεσμα με "scenario"} → {σενάριο: DataFrame} (για εξαγωγή/εμφάνιση)."""
+    return {name: res["scenario"].frame() for name, res in results.items()}
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+stage_graph.py
+
+Μικρός εκτελεστής DAG για τα Βήματα 1→7, με checkpoints σε δίσκο.
+- Stage: όνομα, εισόδους (άλλα stages), προεπιλεγμένες παραμέτρους και είτε συνάρτηση για όλο το stage
+  (compute: (roster, *είσοδοι, progress, **params) → (αποτελέσματα, μηνύματα)) είτε συνάρτηση ανά σενάριο
+  (per_scenario: (όνομα, αποτέλεσμα εισόδου, progress, **params) → (αποτέλεσμα ή None, μηνύματα)).
+- CheckpointStore: content-addressed αποθήκη (pickle) σε ιδιωτικό φάκελο (0o700, μόνο του χρήστη — το
+  pickle.load εκτελεί κώδικα, άρα ο φάκελος δεν πρέπει να είναι εγγράψιμος από άλλους), με προαιρετικό
+  όριο μεγέθους (max_bytes: διαγράφονται τα λιγότερο πρόσφατα χρησιμοποιημένα).
+  Κλειδί σεναρίου = hash(κώδικας, stage, παράμετροι, κλειδί του σεναρίου-εισόδου) → αλλαγή παραμέτρων
+  του Βήματος 6 ΔΕΝ ξανατρέχει τα Βήματα 1–4, αλλαγή στον κώδικα ενός βήματος ακυρώνει τα checkpoints.
+- StageGraph.run: τα σενάρια ενός stage ανά σενάριο τρέχουν σε pool διεργασιών (workers)· ό,τι υπάρχει
+  στην αποθήκη διαβάζεται αντί να υπολογιστεί. rerun_from="stepN" αγνοεί τα checkpoints από εκεί και κάτω.
+- Αποτυχίες (σενάριο χωρίς αποτέλεσμα, stage με μήνυμα error) ΔΕΝ αποθηκεύονται· ξαναδοκιμάζονται στην
+  επόμενη εκτέλεση.
+- Stage.early_stop (τελικό stage: pipeline.final_early_stop): χωρίς pool, πριν από κάθε σενάριο ελέγχεται
+  αν τα ως τώρα αποτελέσματα αρκούν (π.χ. το καλύτερο έπιασε το κάτω φράγμα) και τα υπόλοιπα
+  παραλείπονται. Με pool όλα τα σενάρια υπολογίζονται ταυτόχρονα.
+
+Χρήση (ενδεικτικά):
+-------------------
+from stage_graph import CheckpointStore, pipeline_graph
+
+graph = pipeline_graph()
+store = CheckpointStore(".checkpoints", max_bytes=512 * 2**20)
+outputs = graph.run(roster, store=store, workers=4)                             # {stage: (αποτελέσματα, μηνύματα)}
+outputs = graph.run(roster, store=store, params={"final": {"engine": "tabu"}})  # μόνο το τελικό stage ξανατρέχει
+"""
+from __future__ import annotations
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import stat
+import sys
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from pipeline import JobCancelled, SCENARIO_STEP, STEP_ORDER, STEP_PARAMS, compute_step1, final_early_stop
+from result_store import compact_results, expand_results, frame_fingerprint
+
+# Αύξηση → όλα τα παλιά checkpoints αγνοούνται (αλλαγές στον κώδικα των βημάτων πιάνονται και από το code_fingerprint)
+GRAPH_VERSION = 1
+
+def _tick(progress, info):
+    if progress is not None and progress(info):
+        raise JobCancelled(info.get('step'))
+
+def _digest(*parts) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(parts, sort_keys=True, default=repr, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def _global_names(code: types.CodeType):
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _global_names(const)
+
+def _local_module(mod: Any) -> bool:
+    path = getattr(mod, "__file__", None)
+    return path is not None and Path(path).resolve().parent == Path(__file__).resolve().parent
+
+def code_fingerprint(functions: Sequence[Callable]) -> str:
+    """
+    Hash του κώδικα από τον οποίο εξαρτώνται οι functions: ο πηγαίος τους, οι συναρτήσεις/κλάσεις του ίδιου
+    module που καλούν (μεταβατικά) και ΟΛΑ τα modules βημάτων του φακέλου που αγγίζουν (μεταβατικά, μέσω
+    των imports τους). Έτσι αλλαγή στο Βήμα 6 δεν ακυρώνει τα checkpoints του Βήματος 2.
+    """
+    home = {fn.__module__ for fn in functions}
+    sources: Dict[str, str] = {}
+    modules: Dict[str, Path] = {}
+    todo_objs, todo_mods = list(functions), []
+    while todo_objs or todo_mods:
+        if todo_objs:
+            obj = todo_objs.pop()
+            name = f"{obj.__module__}.{obj.__qualname__}"
+            if name in sources:
+                continue
+            try:
+                sources[name] = inspect.getsource(obj)
+            except (OSError, TypeError):
+                sources[name] = ""
+            if not isinstance(obj, types.FunctionType):
+                continue
+            for ref in _global_names(obj.__code__):
+                value = obj.__globals__.get(ref)
+                mod = value if isinstance(value, types.ModuleType) else sys.modules.get(getattr(value, "__module__", None) or "")
+                if mod is None or not _local_module(mod):
+                    continue
+                if mod.__name__ not in home:
+                    todo_mods.append(mod)
+                elif inspect.isfunction(value) or inspect.isclass(value):
+                    todo_objs.append(value)
+        else:
+            mod = todo_mods.pop()
+            if mod.__name__ in modules:
+                continue
+            modules[mod.__name__] = Path(mod.__file__)
+            for value in vars(mod).values():
+                dep = value if isinstance(value, types.ModuleType) else sys.modules.get(getattr(value, "__module__", None) or "")
+                if dep is not None and _local_module(dep):
+                    todo_mods.append(dep)
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(sources):
+        h.update(name.encode("utf-8"))
+        h.update(sources[name].encode("utf-8"))
+    for name in sorted(modules):
+        h.update(name.encode("utf-8"))
+        h.update(modules[name].read_bytes())
+    return h.hexdigest()
+
+# ------------------------ Αποθήκη ------------------------
+
+def _private_dir(path: Path) -> None:
+    """Δημιουργεί τον φάκελο με 0o700· υπάρχων φάκελος άλλου χρήστη ή εγγράψιμος από άλλους → ValueError."""
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if os.name != "posix":
+        return
+    st = path.stat()
+    if st.st_uid != os.getuid():
+        raise ValueError(f"Ο φάκελος checkpoints {path} ανήκει σε άλλο χρήστη.")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+
+class CheckpointStore:
+    """
+    Αντικείμενα (pickle) ανά κλειδί σε <root>/<κλειδί[:2]>/<κλειδί>.pkl· εγγραφή ατομική.
+    max_bytes: όταν ένα put ξεπεράσει το όριο, διαγράφονται τα αρχεία με την παλαιότερη χρήση (mtime· το
+    get το ανανεώνει). Το σύνολο κρατιέται στη μνήμη και ο φάκελος σαρώνεται μόνο όταν φτάσει το όριο.
+    """
+
+    def __init__(self, root: Union[str, Path], max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._bytes: Optional[int] = None
+        _private_dir(self.root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pkl"
+
+    def __contains__(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)   # πρόσφατη χρήση (για το όριο max_bytes)
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def put(self, key: str, value: Any) -> None:
+        path = self.path(key)
+        _private_dir(path.parent)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        if self.max_bytes is not None:
+            size = path.stat().st_size
+            if self._bytes is None or self._bytes + size > self.max_bytes:
+                self.prune(self.max_bytes)
+            else:
+                self._bytes += size
+
+    def prune(self, max_bytes: int) -> int:
+        """Διαγράφει τα λιγότερο πρόσφατα χρησιμοποιημένα ώσπου το σύνολο ≤ max_bytes· επιστρέφει πόσα."""
+        files = []
+        for path in self.root.glob("*/*.pkl"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._bytes = total
+        return removed
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.root.glob("*/*.pkl")) if self.root.is_dir() else 0
+
+# ------------------------ Stages ------------------------
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Ένας κόμβος του γράφου· ακριβώς ένα από compute / per_scenario.
+    early_stop (μόνο ανά σενάριο): (αποτελέσματα ως τώρα) → μήνυμα για να σταματήσει το stage, ή None.
+    """
+    name: str
+    inputs: Tuple[str, ...] = ()
+    params: Tuple[Tuple[str, Any], ...] = ()
+    compute: Optional[Callable] = None
+    per_scenario: Optional[Callable] = None
+    early_stop: Optional[Callable] = None
+
+    def __post_init__(self):
+        if (self.compute is None) == (self.per_scenario is None):
+            raise ValueError(f"Το stage '{self.name}' θέλει ακριβώς ένα από compute / per_scenario.")
+        if self.per_scenario is not None and len(self.inputs) != 1:
+            raise ValueError(f"Το stage '{self.name}' (ανά σενάριο) θέλει ακριβώς μία είσοδο.")
+        if self.early_stop is not None and self.per_scenario is None:
+            raise ValueError(f"Το early_stop του stage '{self.name}' ισχύει μόνο για stage ανά σενάριο.")
+
+def pipeline_graph() -> "StageGraph":
+    """Τα Βήματα του pipeline ως γράφος: step1 → step2 → step3 → step4 → final (5–7)."""
+    stages = [Stage('step1', params=STEP_PARAMS['step1'], compute=compute_step1)]
+    for prev, step in zip(STEP_ORDER, STEP_ORDER[1:]):
+        stages.append(Stage(step, inputs=(prev,), params=STEP_PARAMS[step], per_scenario=SCENARIO_STEP[step],
+                            early_stop=final_early_stop if step == 'final' else None))
+    return StageGraph(stages)
+
+# Στις διεργασίες του pool: το roster στέλνεται μία φορά ανά worker (initializer), όχι ανά σενάριο
+_WORKER_ROSTER: Optional[pd.DataFrame] = None
+
+def _init_worker(roster: pd.DataFrame) -> None:
+    global _WORKER_ROSTER
+    _WORKER_ROSTER = roster
+
+def _scenario_task(fn: Callable, name: str, packed: Dict[str, Any], params: Dict[str, Any]):
+    entry = expand_results({name: packed}, _WORKER_ROSTER)[name]
+    result, messages = fn(name, entry, None, **params)
+    return (None if result is None else compact_results({name: result}, _WORKER_ROSTER)[name]), messages
+
+class StageGraph:
+    """DAG από Stage· run() εκτελεί σε τοπολογική σειρά με checkpoints και pool ανά σενάριο."""
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Διπλό stage '{stage.name}'.")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for dep in stage.inputs:
+                if dep not in self.stages:
+                    raise ValueError(f"Το stage '{stage.name}' εξαρτάται από άγνωστο stage '{dep}'.")
+        self.order = self._toposort()
+        self.last_stats: Dict[str, Dict[str, Any]] = {}
+
+    def _toposort(self) -> List[str]:
+        order, state = [], {}
+        def visit(name, path=()):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "active":
+                raise ValueError(f"Κύκλος στον γράφο: {' → '.join(path + (name,))}.")
+            state[name] = "active"
+            for dep in self.stages[name].inputs:
+                visit(dep, path + (name,))
+            state[name] = "done"
+            order.append(name)
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def downstream(self, name: str) -> List[str]:
+        """Το stage και όσα εξαρτώνται (άμεσα ή έμμεσα) από αυτό, σε τοπολογική σειρά."""
+        if name not in self.stages:
+            raise ValueError(f"Άγνωστο stage '{name}'.")
+        hit = {name}
+        for other in self.order:
+            if any(dep in hit for dep in self.stages[other].inputs):
+                hit.add(other)
+        return [s for s in self.order if s in hit]
+
+    def _upstream(self, name: str) -> List[str]:
+        if name not in self.stages:
+            raise ValueError(f"Άγνωστο stage '{name}'.")
+        need = {name}
+        for other in reversed(self.order):
+            if other in need:
+                need.update(self.stages[other].inputs)
+        return [s for s in self.order if s in need]
+
+    def run(self, roster: pd.DataFrame, *, store: Optional[CheckpointStore] = None,
+            params: Optional[Dict[str, Dict[str, Any]]] = None, stop: Optional[str] = None,
+            rerun_from: Optional[str] = None, workers: int = 1,
+            progress: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Tuple[Dict, List]]:
+        """
+        Εκτελεί τα stages μέχρι και το stop (default: όλα). Επιστρέφει {stage: (αποτελέσματα, μηνύματα)}.
+        params: {stage: {παράμετρος: τιμή}} πάνω από τις προεπιλογές του κάθε Stage.
+        progress(info) ανά σενάριο με {step, done, total, cached}· True → JobCancelled.
+        """
+        names = self._upstream(stop) if stop is not None else list(self.order)
+        fresh = set(self.downstream(rerun_from)) if rerun_from is not None else set()
+        roster_key = frame_fingerprint(roster)
+        outputs, keys = {}, {}
+        self.last_stats = {}
+        pool = None
+        try:
+            for name in names:
+                stage = self.stages[name]
+                kwargs = dict(stage.params)
+                kwargs.update((params or {}).get(name, {}))
+                code_key = code_fingerprint([fn for fn in (stage.compute, stage.per_scenario, stage.early_stop) if fn])
+                t0 = time.perf_counter()
+                if stage.compute is not None:
+                    results, messages, keys[name], cached = self._run_whole(
+                        stage, code_key, roster, roster_key, kwargs, outputs, keys, store, name in fresh, progress)
+                else:
+                    if pool is None and workers > 1:
+                        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                   initargs=(roster,))
+                    results, messages, keys[name], cached = self._run_each(
+                        stage, code_key, roster, kwargs, outputs, keys, store, name in fresh, pool, progress)
+                outputs[name] = (results, messages)
+                self.last_stats[name] = {"scenarios": len(results), "cached": cached,
+                                         "seconds": round(time.perf_counter() - t0, 3)}
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return outputs
+
+    def _run_whole(self, stage, code_key, roster, roster_key, kwargs, outputs, keys, store, fresh, progress):
+        key = _digest(GRAPH_VERSION, code_key, stage.name, kwargs, roster_key, [sorted(keys[d].items()) for d in stage.inputs])
+        hit = None if (store is None or fresh) else store.get(key)
+        if hit is not None:
+            packed, messages = hit
+            results = expand_results(packed, roster)
+        else:
+            inputs = [outputs[d][0] for d in stage.inputs]
+            results, messages = stage.compute(roster, *inputs, progress, **kwargs)
+            if store is not None and results and not any(kind == 'error' for kind, _ in messages):
+                store.put(key, (compact_results(results, roster), messages))
+        _tick(progress, {'step': stage.name, 'done': len(results), 'total': len(results), 'cached': hit is not None})
+        return results, messages, {name: _digest(key, name) for name in results}, int(hit is not None)
+
+    def _run_each(self, stage, code_key, roster, kwargs, outputs, keys, store, fresh, pool, progress):
+        source = stage.inputs[0]
+        prev, prev_keys = outputs[source][0], keys[source]
+        total = len(prev)
+        done = {}   # όνομα → (packed ή None, μηνύματα)
+        own_keys = {name: _digest(GRAPH_VERSION, code_key, stage.name, kwargs, prev_keys[name]) for name in prev}
+
+        def finish(name, packed, messages, cached):
+            done[name] = (packed, messages)
+            _tick(progress, {'step': stage.name, 'done': len(done), 'total': total, 'cached': cached})
+
+        todo = []
+        for name in prev:
+            hit = None if (store is None or fresh) else store.get(own_keys[name])
+            if hit is not None:
+                finish(name, *hit, True)
+            else:
+                todo.append(name)
+        cached = len(done)
+
+        def save(name, packed, messages):
+            if store is not None and packed is not None:
+                store.put(own_keys[name], (packed, messages))
+            finish(name, packed, messages, False)
+
+        stop_message = None
+        if pool is None or len(todo) <= 1:
+            entries = {}   # όνομα → πλήρες αποτέλεσμα (μόνο για το early_stop)
+            for name in todo:
+                if stage.early_stop is not None:
+                    for other in prev:
+                        if other not in entries and other in done and done[other][0] is not None:
+                            entries[other] = expand_results({other: done[other][0]}, roster)[other]
+                    stop_message = stage.early_stop({n: entries[n] for n in prev if n in entries})
+                    if stop_message is not None:
+                        break
+                def inner(info):
+                    # Πρόοδος μέσα στο σενάριο (Βήμα 4: κόμβοι DFS)· True → το βήμα σταματά
+                    return progress is not None and progress({
+                        'step': stage.name, 'done': len(done), 'total': total, 'cached': False,
+                        'nodes': info['nodes'], 'max_nodes': kwargs.get('max_nodes'),
+                        'elapsed': info['elapsed'], 'time_budget': kwargs.get('time_budget')})
+                result, messages = stage.per_scenario(name, prev[name], inner, **kwargs)
+                packed = None if result is None else compact_results({name: result}, roster)[name]
+                save(name, packed, messages)
+        else:
+            packed_prev = compact_results({name: prev[name] for name in todo}, roster)
+            futures = {pool.submit(_scenario_task, stage.per_scenario, name, packed_prev[name], kwargs): name
+                       for name in todo}
+            try:
+                pending = set(futures)
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        save(futures[future], *future.result())
+            except JobCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # Σειρά σεναρίων όπως στην είσοδο, ανεξάρτητα από τη σειρά ολοκλήρωσης
+        results, messages = {}, []
+        for name in prev:
+            if name not in done:   # παραλείφθηκε από το early_stop
+                continue
+            packed, msgs = done[name]
+            messages += msgs
+            if packed is not None:
+                results[name] = expand_results({name: packed}, roster)[name]
+        if stop_message is not None:
+            messages.append(stop_message)
+        return results, messages, {name: own_keys[name] for name in results}, cached
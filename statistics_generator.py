@@ -1,48 +1,112 @@
+import numpy as np
 import pandas as pd
 from io import BytesIO
 
+# (στήλη εξόδου, στήλη δεδομένων, τιμή) — ακριβής σύγκριση, όπως πάντα
+STAT_FIELDS = [
+    ("ΑΓΟΡΙΑ", "ΦΥΛΟ", "Α"),
+    ("ΚΟΡΙΤΣΙΑ", "ΦΥΛΟ", "Κ"),
+    ("ΕΚΠΑΙΔΕΥΤΙΚΟΙ", "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ", "Ν"),
+    ("ΖΩΗΡΟΙ", "ΖΩΗΡΟΣ", "Ν"),
+    ("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "Ν"),
+    ("ΓΝΩΣΗ ΕΛΛ.", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "Ν"),
+]
+STAT_COLUMNS = [name for name, _, _ in STAT_FIELDS] + ["ΣΥΝΟΛΟ"]
 
-def generate_statistics_table(df):
+# BITS[m] = (χαρακτηριστικά..., 1) για κάθε bitmask m των έξι χαρακτηριστικών
+_BITS = np.array([[(m >> k) & 1 for k in range(len(STAT_FIELDS))] + [1]
+                  for m in range(1 << len(STAT_FIELDS))], dtype=np.int64)
+
+
+def _attribute_masks(df):
+    """Ένας ακέραιος ανά μαθητή: bit k = ισχύει το k-οστό χαρακτηριστικό του STAT_FIELDS."""
+    mask = np.zeros(len(df), dtype=np.int64)
+    for k, (_, col, value) in enumerate(STAT_FIELDS):
+        mask |= (df[col] == value).to_numpy(dtype=np.int64) << k
+    return mask
+
+
+def _class_order(labels):
+    """Ταξινόμηση τμημάτων όπως πριν: λεξικογραφικά (groupby) και μετά κατά αριθμό (Α1, Α2, ..., Α10)."""
+    idx = pd.Index(sorted(labels))
+    if len(idx) == 0:
+        return idx
+    return idx[np.argsort(idx.astype(str).str.extract(r'(\d+)', expand=False).astype(float).to_numpy(),
+                          kind="stable")]
+
+
+def _aggregate(masks, labels, scenario_names):
     """
-    Δημιουργεί ενιαίο πίνακα στατιστικών ανά τμήμα.
-    Περιλαμβάνει μόνο όσους έχουν Ν ή Α/Κ στα αντίστοιχα πεδία.
+    Κοινός πυρήνας: masks (bitmask ανά γραμμή), labels (τμήμα) και scenario_names (σενάριο), ίδιου μήκους.
+    Ένα bincount πάνω στα (ομάδα, bitmask) → όλα τα πλήθη όλων των σεναρίων μαζί.
     """
-    df = df.copy()
+    labels = np.asarray(labels, dtype=object)
+    ok = pd.notna(labels)
+    scenario_names = np.asarray(scenario_names, dtype=object)[ok]
+    if not ok.any():
+        return pd.DataFrame(np.zeros((0, len(STAT_COLUMNS)), dtype=int), columns=STAT_COLUMNS,
+                            index=pd.MultiIndex.from_arrays([[], []], names=["ΣΕΝΑΡΙΟ", "ΤΜΗΜΑ"]))
+    codes, groups = pd.factorize(pd.MultiIndex.from_arrays([scenario_names, labels[ok]]))
+    hist = np.bincount(codes * len(_BITS) + masks[ok], minlength=len(groups) * len(_BITS))
+    counts = hist.reshape(len(groups), len(_BITS)) @ _BITS
+    table = pd.DataFrame(counts, index=pd.MultiIndex.from_tuples(list(groups)), columns=STAT_COLUMNS)
+
+    parts, keys = [], []
+    for scen in pd.unique(scenario_names):
+        part = table.xs(scen, level=0)
+        part = part.loc[_class_order(part.index)]
+        part.index.name = "ΤΜΗΜΑ"
+        parts.append(part)
+        keys.append(scen)
+    return pd.concat(parts, keys=keys, names=["ΣΕΝΑΡΙΟ"]).astype(int)
 
-    # Κανονικοποίηση φύλου: Α / Κ
-    boys = df[df["ΦΥΛΟ"] == "Α"].groupby("ΤΜΗΜΑ").size()
-    girls = df[df["ΦΥΛΟ"] == "Κ"].groupby("ΤΜΗΜΑ").size()
 
-    # Ναι = Ν για τα υπόλοιπα χαρακτηριστικά
-    educators = df[df["ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ"] == "Ν"].groupby("ΤΜΗΜΑ").size()
-    energetic = df[df["ΖΩΗΡΟΣ"] == "Ν"].groupby("ΤΜΗΜΑ").size()
-    special = df[df["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"] == "Ν"].groupby("ΤΜΗΜΑ").size()
-    greek = df[df["ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"] == "Ν"].groupby("ΤΜΗΜΑ").size()
-    total = df.groupby("ΤΜΗΜΑ").size()
+def generate_multi_statistics(df, scenario_cols):
+    """
+    Στατιστικά ανά (σενάριο, τμήμα) για ΠΟΛΛΕΣ στήλες σεναρίων του ίδιου DataFrame, σε ένα πέρασμα.
+    Μη τοποθετημένοι (NaN) σε κάποιο σενάριο απλώς δεν μετρούν σε αυτό.
+    """
+    scenario_cols = list(scenario_cols)
+    masks = _attribute_masks(df)
+    labels = np.concatenate([df[c].to_numpy(dtype=object) for c in scenario_cols]) if scenario_cols \
+        else np.empty(0, dtype=object)
+    names = np.repeat(np.array(scenario_cols, dtype=object), len(df))
+    return _aggregate(np.tile(masks, len(scenario_cols)), labels, names)
+
 
-    # Ενοποίηση
-    stats = pd.DataFrame({
-        "ΑΓΟΡΙΑ": boys,
-        "ΚΟΡΙΤΣΙΑ": girls,
-        "ΕΚΠΑΙΔΕΥΤΙΚΟΙ": educators,
-        "ΖΩΗΡΟΙ": energetic,
-        "ΙΔΙΑΙΤΕΡΟΤΗΤΑ": special,
-        "ΓΝΩΣΗ ΕΛΛ.": greek,
-        "ΣΥΝΟΛΟ": total
-    }).fillna(0).astype(int)
+def scenario_statistics(results):
+    """
+    Όπως το generate_multi_statistics, όταν κάθε σενάριο έχει δικό του DataFrame:
+    results = {όνομα σεναρίου: (df, στήλη τμήματος)}.
+    """
+    masks, labels, names = [], [], []
+    for name, (df, col) in results.items():
+        masks.append(_attribute_masks(df))
+        labels.append(df[col].to_numpy(dtype=object))
+        names.append(np.full(len(df), name, dtype=object))
+    if not masks:
+        return _aggregate(np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=object))
+    return _aggregate(np.concatenate(masks), np.concatenate(labels), np.concatenate(names))
 
-    # Ταξινόμηση ΤΜΗΜΑτων αν είναι Α1, Α2, ...
-    stats = stats.sort_index(key=lambda x: x.str.extract(r'(\d+)').astype(float))
 
-    return stats
+def generate_statistics_table(df):
+    """
+    Δημιουργεί ενιαίο πίνακα στατιστικών ανά τμήμα.
+    Περιλαμβάνει μόνο όσους έχουν Ν ή Α/Κ στα αντίστοιχα πεδία.
+    """
+    stats = generate_multi_statistics(df, ["ΤΜΗΜΑ"])
+    if len(stats) == 0:
+        return stats.droplevel("ΣΕΝΑΡΙΟ")
+    return stats.xs("ΤΜΗΜΑ", level="ΣΕΝΑΡΙΟ")
 
 
-def export_statistics_to_excel(stats_df):
+def export_statistics_to_excel(stats_df, sheet_name='Στατιστικά'):
     """
     Επιστρέφει BytesIO αντικείμενο με τα στατιστικά σε μορφή Excel.
+    Πίνακας με MultiIndex (ΣΕΝΑΡΙΟ, ΤΜΗΜΑ) γράφεται ολόκληρος στο ίδιο φύλλο.
     """
     output = BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        stats_df.to_excel(writer, index=True, sheet_name='Στατιστικά')
+        stats_df.to_excel(writer, index=True, sheet_name=sheet_name)
     output.seek(0)
     return output
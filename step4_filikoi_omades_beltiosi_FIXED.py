@@ -5,10 +5,12 @@ Change: gender_diff_max default from 3 → 4 (reject only if gender diff > 4)
 """
 
 import itertools
+import time
 from collections import defaultdict
-from copy import deepcopy
 import pandas as pd
 
+from class_balance import ClassBalance, frame_vectors, sum_vectors
+
 # -------------------- Utilities --------------------
 
 def is_fully_mutual(group, df):
@@ -27,30 +29,60 @@ def is_fully_mutual(group, df):
             return False
     return True
 
+def _friend_sets(df):
+    """ΟΝΟΜΑ → set(ΦΙΛΟΙ) από την ΠΡΩΤΗ γραμμή κάθε ονόματος (όπως το is_fully_mutual)."""
+    out = {}
+    for name, friends in zip(df['ΟΝΟΜΑ'].astype(str), df['ΦΙΛΟΙ']):
+        if name not in out:
+            out[name] = set(friends) if isinstance(friends, (list, tuple, set)) else set()
+    return out
+
 def create_fully_mutual_groups(df, assigned_column):
-    """Build disjoint triads first, then pairs, only among unassigned students with non-empty friend lists."""
+    """Build disjoint triads first, then pairs, only among unassigned students with non-empty friend lists.
+
+    Same greedy lexicographic order as scanning itertools.combinations(names, k) with is_fully_mutual,
+    but over a mutual-adjacency map (O(n·deg²) instead of O(n³) DataFrame lookups).
+    """
     unassigned = df[df[assigned_column].isna()].copy()
     unassigned = unassigned[unassigned['ΦΙΛΟΙ'].map(lambda x: isinstance(x, list) and len(x) > 0)]
     names = list(unassigned['ΟΝΟΜΑ'].astype(str).unique())
 
+    fr = _friend_sets(df)
+    pos = {n: k for k, n in enumerate(names)}
+    # later mutual partners of each name, in names order
+    later = {n: sorted((m for m in fr.get(n, ()) if m in pos and pos[m] > pos[n] and n in fr.get(m, ())),
+                       key=pos.get)
+             for n in names}
+
     used = set()
     groups = []
 
     # 1) triads
-    for g in itertools.combinations(names, 3):
-        if set(g) & used:
+    for a in names:
+        if a in used:
             continue
-        if is_fully_mutual(g, df):
-            groups.append(list(g))
-            used |= set(g)
+        cand = [b for b in later[a] if b not in used]
+        found = None
+        for j, b in enumerate(cand):
+            for c in cand[j+1:]:
+                if c in later[b]:
+                    found = [a, b, c]
+                    break
+            if found:
+                break
+        if found:
+            groups.append(found)
+            used |= set(found)
 
     # 2) pairs
-    for g in itertools.combinations(names, 2):
-        if set(g) & used:
+    for a in names:
+        if a in used:
             continue
-        if is_fully_mutual(g, df):
-            groups.append(list(g))
-            used |= set(g)
+        for b in later[a]:
+            if b not in used:
+                groups.append([a, b])
+                used |= {a, b}
+                break
 
     return groups
 
@@ -74,22 +106,27 @@ def categorize_groups(groups, df):
         cat[get_group_characteristics(g, df)].append(g)
     return cat
 
+
 # -------------------- Scoring & acceptance --------------------
 
-def _counts_from(df, placed_dict, assigned_column, classes):
-    cnt = {c: int((df[assigned_column] == c).sum()) for c in classes}
-    good= {c: int(((df[assigned_column] == c) & (df['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ']=='Ν')).sum()) for c in classes}
-    boys= {c: int(((df[assigned_column] == c) & (df['ΦΥΛΟ']=='Α')).sum()) for c in classes}
-    girls={c: int(((df[assigned_column] == c) & (df['ΦΥΛΟ']=='Κ')).sum()) for c in classes}
-    # apply placed
+def _group_vector(df, group, vectors=None):
+    """Attribute vector (cnt, boys, girls, good, z, i) of a group; cnt is the group size."""
+    if vectors is None:
+        vectors = frame_vectors(df)
+    m = df['ΟΝΟΜΑ'].isin(group).to_numpy()
+    v = list(sum_vectors(vectors[m]))
+    v[0] = len(group)
+    return tuple(v)
+
+def _balance_from(df, placed_dict, assigned_column, classes):
+    vectors = frame_vectors(df)
+    bal = ClassBalance.from_frame(df, assigned_column, classes, vectors=vectors)
     for g, c in placed_dict.items():
-        size = len(g)
-        sub = df[df['ΟΝΟΜΑ'].isin(g)]
-        cnt[c]   += size
-        good[c]  += int((sub['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ']=='Ν').sum())
-        boys[c]  += int((sub['ΦΥΛΟ']=='Α').sum())
-        girls[c] += int((sub['ΦΥΛΟ']=='Κ').sum())
-    return cnt, good, boys, girls
+        bal.add(c, _group_vector(df, g, vectors))
+    return bal
+
+def _counts_from(df, placed_dict, assigned_column, classes):
+    return _balance_from(df, placed_dict, assigned_column, classes).as_dicts()
 
 def accept(cnt, good, boys, girls, cap=25, pop_diff_max=2, good_diff_max=4, gender_diff_max=4):
     """
@@ -107,94 +144,142 @@ def accept(cnt, good, boys, girls, cap=25, pop_diff_max=2, good_diff_max=4, gend
     if max(girls.values()) - min(girls.values()) > gender_diff_max: return False
     return True
 
+def accept_balance(bal, cap=25, pop_diff_max=2, good_diff_max=4, gender_diff_max=4):
+    """Same rules as accept(), read directly from a ClassBalance (no dict rebuilds)."""
+    return (bal.max('cnt') <= cap
+            and bal.spread('cnt') <= pop_diff_max
+            and bal.spread('good') <= good_diff_max
+            and bal.spread('boys') <= gender_diff_max
+            and bal.spread('girls') <= gender_diff_max)
+
 def penalty(cnt, good, boys, girls, classes):
-    # penalties only beyond (1,2,1,1)
-    p  = max(0, abs(cnt[classes[0]] - cnt[classes[1]]) - 1)
-    p += max(0, abs(good[classes[0]] - good[classes[1]]) - 2)
-    p += max(0, abs(boys[classes[0]] - boys[classes[1]]) - 1)
-    p += max(0, abs(girls[classes[0]] - girls[classes[1]]) - 1)
+    # penalties only beyond (1,2,1,1); max−min over ALL classes (== |Α1−Α2| for two classes)
+    spread = lambda d: max(d[c] for c in classes) - min(d[c] for c in classes)
+    p  = max(0, spread(cnt) - 1)
+    p += max(0, spread(good) - 2)
+    p += max(0, spread(boys) - 1)
+    p += max(0, spread(girls) - 1)
     return p
 
+def penalty_balance(bal):
+    return (max(0, bal.spread('cnt') - 1) + max(0, bal.spread('good') - 2)
+            + max(0, bal.spread('boys') - 1) + max(0, bal.spread('girls') - 1))
+
+# -------------------- Search budgets --------------------
+
+# Shared by every caller, so the UI, the batch driver and ad-hoc runs agree on what "interactive" means.
+INTERACTIVE_MAX_NODES = 50000
+INTERACTIVE_TIME_BUDGET = 0.8    # seconds — keeps a UI click under one second
+BATCH_MAX_NODES = 200000
+BATCH_TIME_BUDGET = None         # nightly/batch runs are bounded by nodes only
+
+PROGRESS_EVERY = 1024            # DFS nodes between deadline checks / progress reports
+
 # -------------------- Main: improved exhaustive with strong pruning --------------------
 
-def apply_step4_strict(df, assigned_column='ΒΗΜΑ3_ΣΕΝΑΡΙΟ_1', num_classes=2, max_results=5, max_nodes=200000):
+def apply_step4_strict(df, assigned_column='ΒΗΜΑ3_ΣΕΝΑΡΙΟ_1', num_classes=2, max_results=5,
+                       max_nodes=BATCH_MAX_NODES, time_budget=BATCH_TIME_BUDGET, deadline=None, progress=None):
     """
     Exhaustively enumerate placements of fully mutual groups, but with strict acceptance and pruning.
+    Class counts live in one ClassBalance that is updated in place (add/remove per group),
+    so scoring is correct for any number of classes.
+
+    Anytime: the search stops at max_nodes, at time_budget seconds, at the absolute
+    time.monotonic() `deadline`, or when `progress` returns True — and in every case returns
+    the best placements found so far (possibly []).
+    progress(info) is called every PROGRESS_EVERY nodes and once at the end, with
+    info = {nodes, max_nodes, results, best_penalty, pruned_fraction, elapsed, done}.
     Returns a list of tuples: (placed_dict, penalty_score)
     """
+    t0 = time.monotonic()
+    if time_budget is not None:
+        budget_end = t0 + float(time_budget)
+        deadline = budget_end if deadline is None else min(deadline, budget_end)
+
     classes = [f'Α{i+1}' for i in range(num_classes)]
-    base_cnt = {c: int((df[assigned_column]==c).sum()) for c in classes}
-    base_good= {c: int(((df[assigned_column]==c) & (df['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ']=='Ν')).sum()) for c in classes}
-    base_boys= {c: int(((df[assigned_column]==c) & (df['ΦΥΛΟ']=='Α')).sum()) for c in classes}
-    base_girls={c: int(((df[assigned_column]==c) & (df['ΦΥΛΟ']=='Κ')).sum()) for c in classes}
+    vectors = frame_vectors(df)
+    bal = ClassBalance.from_frame(df, assigned_column, classes, vectors=vectors)
+
+    results = []
+    nodes = 0
+    branches = 0        # child placements tried
+    pruned = 0          # ... of which cut by the cap / population pre-prune
+    stopped = False
+    best = None
+
+    placed = {}
+
+    def report(done):
+        info = {'nodes': nodes, 'max_nodes': max_nodes, 'results': len(results),
+                'best_penalty': best, 'pruned_fraction': (pruned / branches) if branches else 0.0,
+                'elapsed': time.monotonic() - t0, 'done': done}
+        return bool(progress(info))
 
     groups = create_fully_mutual_groups(df, assigned_column)
     if not groups:
+        if progress is not None:
+            report(True)
         return []
 
+    gvec = {tuple(g): _group_vector(df, g, vectors) for g in groups}
+
     # Heuristic order: larger & more "informative" groups first
     def gkey(g):
-        sub = df[df['ΟΝΟΜΑ'].isin(g)]
-        good = int((sub['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ']=='Ν').sum())
-        boys = int((sub['ΦΥΛΟ']=='Α').sum())
-        girls= int((sub['ΦΥΛΟ']=='Κ').sum())
+        _, boys, girls, good, _, _ = gvec[tuple(g)]
         # prioritize: size desc, |boys-girls| desc, good desc
         return (-len(g), -abs(boys-girls), -good)
     groups = sorted(groups, key=gkey)
 
-    results = []
-    nodes = 0
-
-    placed = {}
-
-    def dfs(idx, cnt, good, boys, girls):
-        nonlocal nodes
+    def dfs(idx):
+        nonlocal nodes, branches, pruned, stopped, best
         nodes += 1
-        if nodes > max_nodes:
+        if nodes > max_nodes or stopped:
             return
+        if not (nodes % PROGRESS_EVERY):
+            if (deadline is not None and time.monotonic() > deadline) or (progress is not None and report(False)):
+                stopped = True
+                return
         # quick cap check
-        if any(v>25 for v in cnt.values()):
+        if bal.max('cnt') > 25:
+            pruned += 1
             return
 
         if idx == len(groups):
-            if accept(cnt, good, boys, girls):
-                p = penalty(cnt, good, boys, girls, classes)
-                results.append((deepcopy(placed), p))
+            if accept_balance(bal):
+                p = penalty_balance(bal)
+                results.append((dict(placed), p))
+                best = p if best is None else min(best, p)
             return
 
         g = groups[idx]
-        sub = df[df['ΟΝΟΜΑ'].isin(g)]
-        gsize = len(g)
-        ggood = int((sub['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ']=='Ν').sum())
-        gboys = int((sub['ΦΥΛΟ']=='Α').sum())
-        ggirls= int((sub['ΦΥΛΟ']=='Κ').sum())
+        key = tuple(g)
+        vec = gvec[key]
 
         # Try target class with lower current population first
-        order = sorted(classes, key=lambda c: (cnt[c], good[c], boys[c]+girls[c]))
+        order = sorted(classes, key=lambda c: (bal.get(c, 'cnt'), bal.get(c, 'good'), bal.get(c, 'boys') + bal.get(c, 'girls')))
 
         for c in order:
             # simulate
-            cnt[c]   += gsize
-            good[c]  += ggood
-            boys[c]  += gboys
-            girls[c] += ggirls
-            placed[tuple(g)] = c
+            bal.add(c, vec)
+            placed[key] = c
+            branches += 1
 
             # fast pre-prune: if pop diff already >2 discard branch
-            if (max(cnt.values()) - min(cnt.values())) <= 2:
-                dfs(idx+1, cnt, good, boys, girls)
+            if bal.spread('cnt') <= 2:
+                dfs(idx+1)
+            else:
+                pruned += 1
 
             # revert
-            placed.pop(tuple(g), None)
-            cnt[c]   -= gsize
-            good[c]  -= ggood
-            boys[c]  -= gboys
-            girls[c] -= ggirls
+            placed.pop(key, None)
+            bal.remove(c, vec)
 
-            if len(results) >= max_results:
+            if len(results) >= max_results or stopped:
                 return
 
-    dfs(0, base_cnt.copy(), base_good.copy(), base_boys.copy(), base_girls.copy())
+    dfs(0)
+    if progress is not None:
+        report(True)
 
     results_sorted = sorted(results, key=lambda t: t[1])[:max_results]
     return results_sorted
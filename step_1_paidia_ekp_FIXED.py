@@ -5,8 +5,11 @@
 - Για μικρό πλήθος παιδιών εκπαιδευτικών (<= 12) κάνει ΕΞΑΝΤΛΗΤΙΚΗ απαρίθμηση όλων των αναθέσεων και κρατά τις top-k.
 - Για μεγαλύτερα πλήθη χρησιμοποιεί greedy με εναλλακτικά seeds + ελέγχει μοναδικότητα με canonical key.
 Έξοδοι: VIMA1_Scenarios_ENUM_CANON.xlsx & VIMA1_Scenarios_ENUM_CANON_Comparison.xlsx
+(οι διαδρομές SRC/OUT/OUT_CMP είναι μόνο προεπιλογές· δίνονται ως ορίσματα ή από τη γραμμή εντολών:
+    python step_1_paidia_ekp_FIXED.py roster.xlsx -o VIMA1.xlsx --out-cmp VIMA1_Comparison.xlsx)
 """
 
+import argparse
 from pathlib import Path
 import pandas as pd, numpy as np, itertools, math, re
 
@@ -18,8 +21,10 @@ def norm_yesno(val):
     s = str(val).strip().upper()
     return "Ν" if s in {"Ν","YES","TRUE","1"} else "Ο"
 
-def load_and_normalize():
-    df0 = pd.read_excel(SRC)
+def load_and_normalize(src=SRC):
+    """Διαβάζει το roster (.xlsx ή .csv) και κανονικοποιεί τις στήλες του Βήματος 1."""
+    src = Path(src)
+    df0 = pd.read_csv(src) if src.suffix.lower() == ".csv" else pd.read_excel(src)
     df = df0.copy()
     # standardize columns
     rename = {}
@@ -96,15 +101,14 @@ def enumerate_all(df, top_k=3):
     sols.sort(key=lambda t: (t[0], canon_tuple(t[1])))
     return sols[:top_k], names
 
-def write_outputs(df, solutions, names):
-    with pd.ExcelWriter(OUT, engine="openpyxl") as w:
+def write_outputs(df, solutions, names, out=OUT, out_cmp=OUT_CMP):
+    with pd.ExcelWriter(out, engine="openpyxl") as w:
         for i, (sc, am, st) in enumerate(solutions, start=1):
-            out = df.copy()
+            sheet_df = df.copy()
             col = f"ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{i}"
-            out[col] = np.nan
-            mask = out["ΟΝΟΜΑ"].isin(names)
-            out.loc[mask, col] = out.loc[mask, "ΟΝΟΜΑ"].map(am)
-            out.to_excel(w, index=False, sheet_name=col)
+            # μόνο τα παιδιά εκπαιδευτικών (κλειδιά του am) τοποθετούνται· οι υπόλοιποι μένουν NaN
+            sheet_df[col] = sheet_df["ΟΝΟΜΑ"].map(am)
+            sheet_df.to_excel(w, index=False, sheet_name=col)
 
     rows=[]
     for i, (sc, am, st) in enumerate(solutions, start=1):
@@ -116,18 +120,29 @@ def write_outputs(df, solutions, names):
                      "Α1_ΜΑΘΗΤΕΣ": ", ".join(sorted([n for n in names if am[n]=='Α1'])),
                      "Α2_ΜΑΘΗΤΕΣ": ", ".join(sorted([n for n in names if am[n]=='Α2']))})
     cmp = pd.DataFrame(rows)
-    with pd.ExcelWriter(OUT_CMP, engine="openpyxl") as w:
+    with pd.ExcelWriter(out_cmp, engine="openpyxl") as w:
         cmp.to_excel(w, index=False, sheet_name="Σύνοψη")
 
-def main():
-    df = load_and_normalize()
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Βήμα 1: σενάρια για τα παιδιά εκπαιδευτικών.")
+    ap.add_argument("src", nargs="?", default=SRC, help="Roster (.xlsx/.csv)")
+    ap.add_argument("-o", "--out", default=None, help="Workbook σεναρίων (default: δίπλα στο src)")
+    ap.add_argument("--out-cmp", default=None, help="Workbook σύγκρισης (default: δίπλα στο src)")
+    ap.add_argument("--top-k", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    src = Path(args.src)
+    out = Path(args.out) if args.out else src.with_name(OUT.name)
+    out_cmp = Path(args.out_cmp) if args.out_cmp else src.with_name(OUT_CMP.name)
+    df = load_and_normalize(src)
     teacher = df[df["ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ"]=="Ν"]
     if len(teacher) <= 12:  # exhaustive safe
-        sols, names = enumerate_all(df, top_k=3)
+        sols, names = enumerate_all(df, top_k=args.top_k)
     else:
         # Fallback to greedy seeds (not needed here)
-        sols, names = enumerate_all(df, top_k=3)
-    write_outputs(df, sols, names)
+        sols, names = enumerate_all(df, top_k=args.top_k)
+    write_outputs(df, sols, names, out, out_cmp)
+    print(out.as_posix())
 
 if __name__ == "__main__":
     main()
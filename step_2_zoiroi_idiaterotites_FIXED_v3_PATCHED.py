@@ -13,58 +13,35 @@ import re
 from step_2_helpers_FIXED import (
     normalize_columns, parse_friends_cell, scope_step2, mutual_pairs_in_scope
 )
+from class_balance import ClassBalance, frame_vectors
+from conflict_kernel import ConflictCounter, pair_penalty as _pair_conflict_penalty, student_type
 
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 
 
-def _pair_conflict_penalty(aZ, aI, bZ, bI) -> int:
-    if aI and bI:
-        return 5
-    if (aI and bZ) or (bI and aZ):
-        return 4
-    if aZ and bZ:
-        return 3
-    return 0
+def _conflict_counter(df: pd.DataFrame, col: str) -> ConflictCounter:
+    """Πλήθη τύπων (Ζ, Ι) ανά τμήμα (str, χωρίς NaN) σε ένα πέρασμα· «Ν» μετά από strip, όπως πριν."""
+    cc = ConflictCounter()
+    if col not in df.columns:
+        return cc
+    flag = lambda c: (df[c].map(lambda v: str(v).strip() == "Ν").tolist() if c in df.columns
+                      else [False] * len(df))
+    for cl, z, i in zip(df[col].tolist(), flag("ΖΩΗΡΟΣ"), flag("ΙΔΙΑΙΤΕΡΟΤΗΤΑ")):
+        if pd.isna(cl):
+            continue
+        cc.add(str(cl), student_type(z, i))
+    return cc
 
 
 def _count_ped_conflicts(df: pd.DataFrame, col: str) -> int:
-    cnt = 0
-    by_class = {}
-    for _, r in df.iterrows():
-        cl = r.get(col)
-        if pd.isna(cl):
-            continue
-        by_class.setdefault(str(cl), []).append(r)
-    for _cl, rows in by_class.items():
-        for i in range(len(rows)):
-            for j in range(i + 1, len(rows)):
-                aZ = str(rows[i].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                aI = str(rows[i].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                bZ = str(rows[j].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                bI = str(rows[j].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                if _pair_conflict_penalty(aZ, aI, bZ, bI) > 0:
-                    cnt += 1
-    return cnt
+    """Πλήθος ζευγών σε σύγκρουση (ποινή > 0) μέσα στα τμήματα."""
+    return _conflict_counter(df, col).total_pairs()
 
 
 def _sum_conflicts(df: pd.DataFrame, col: str) -> int:
-    s = 0
-    by_class = {}
-    for _, r in df.iterrows():
-        cl = r.get(col)
-        if pd.isna(cl):
-            continue
-        by_class.setdefault(str(cl), []).append(r)
-    for _cl, rows in by_class.items():
-        for i in range(len(rows)):
-            for j in range(i + 1, len(rows)):
-                aZ = str(rows[i].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                aI = str(rows[i].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                bZ = str(rows[j].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                bI = str(rows[j].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                s += _pair_conflict_penalty(aZ, aI, bZ, bI)
-    return s
+    """Σ ποινών (3/4/5) των ζευγών μέσα στα τμήματα."""
+    return _conflict_counter(df, col).total()
 
 
 def _broken_mutual_pairs(df: pd.DataFrame, col: str, scope: Set[str]) -> int:
@@ -85,21 +62,12 @@ def _compute_targets_global(
     - final_totals = Z_step1_total + Z_to_place_total (και αντίστοιχα για Ι).
     - Τελικός στόχος ανά τμήμα: q ή q+1 όπου q,r = divmod(final_total, num_classes).
     """
-    Z_step1 = {cl: 0 for cl in class_labels}
-    I_step1 = {cl: 0 for cl in class_labels}
-    Z_total_step1 = 0
-    I_total_step1 = 0
-    for _, r in df.iterrows():
-        cl = r.get(step1_col)
-        z = str(r.get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-        i = str(r.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-        if not pd.isna(cl):
-            if z:
-                Z_step1[str(cl)] += 1
-                Z_total_step1 += 1
-            if i:
-                I_step1[str(cl)] += 1
-                I_total_step1 += 1
+    bal = ClassBalance.from_frame(df, step1_col, class_labels)
+    Z_step1 = bal.counts("z")
+    I_step1 = bal.counts("i")
+    placed = df[pd.notna(df[step1_col])]
+    Z_total_step1 = int((placed["ΖΩΗΡΟΣ"].astype(str).str.strip() == "Ν").sum())
+    I_total_step1 = int((placed["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].astype(str).str.strip() == "Ν").sum())
 
     to_place = df[pd.isna(df[step1_col])]
     Z_to_place = int((to_place["ΖΩΗΡΟΣ"].astype(str).str.strip() == "Ν").sum())
@@ -120,21 +88,32 @@ def _compute_targets_global(
     }
 
 
-def _prereject(assign_map, next_name, next_cl, df, step1_col, class_labels, targets) -> bool:
-    """Γρήγορο pruning πριν από απόπειρα ανάθεσης."""
-    Zc = targets["Z_step1"].copy()
-    Ic = targets["I_step1"].copy()
-    tmp = assign_map.copy()
-    if next_name and next_cl:
-        tmp[next_name] = next_cl
-
-    # Προσωρινή καταμέτρηση Ζ/Ι αν μπει το next
-    for n, cl in tmp.items():
-        row = df[df["ΟΝΟΜΑ"] == n].iloc[0]
-        if str(row.get("ΖΩΗΡΟΣ", "")).strip() == "Ν":
-            Zc[cl] += 1
-        if str(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν":
-            Ic[cl] += 1
+def _prereject(assign_map, next_name, next_cl, df, step1_col, class_labels, targets, balance=None, vectors=None) -> bool:
+    """Γρήγορο pruning πριν από απόπειρα ανάθεσης.
+    Αν δοθεί balance (ClassBalance με step1 + assign_map ήδη μέσα) και vectors (όνομα → διάνυσμα),
+    οι μετρητές Ζ/Ι διαβάζονται σε O(1) αντί να ξαναμετρηθούν από το DataFrame.
+    """
+    if balance is not None:
+        Zc = balance.counts("z")
+        Ic = balance.counts("i")
+        if next_name and next_cl:
+            v = vectors[next_name]
+            Zc[next_cl] += int(v[4])
+            Ic[next_cl] += int(v[5])
+    else:
+        Zc = targets["Z_step1"].copy()
+        Ic = targets["I_step1"].copy()
+        tmp = assign_map.copy()
+        if next_name and next_cl:
+            tmp[next_name] = next_cl
+
+        # Προσωρινή καταμέτρηση Ζ/Ι αν μπει το next
+        for n, cl in tmp.items():
+            row = df[df["ΟΝΟΜΑ"] == n].iloc[0]
+            if str(row.get("ΖΩΗΡΟΣ", "")).strip() == "Ν":
+                Zc[cl] += 1
+            if str(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν":
+                Ic[cl] += 1
 
     # Upper bounds per targets
     for cl in class_labels:
@@ -145,6 +124,8 @@ def _prereject(assign_map, next_name, next_cl, df, step1_col, class_labels, targ
 
     # Γρήγορος έλεγχος συγκρούσεων με fixed/partial της ίδιας τάξης
     if next_name and next_cl and "ΣΥΓΚΡΟΥΣΗ" in df.columns:
+        tmp = dict(assign_map)
+        tmp[next_name] = next_cl
         mask_next = (df["ΟΝΟΜΑ"] == next_name)
         next_conf_cell = df.loc[mask_next, "ΣΥΓΚΡΟΥΣΗ"]
         toks_next = set(parse_friends_cell(next_conf_cell.values[0] if not next_conf_cell.empty else ""))
@@ -199,6 +180,13 @@ def step2_apply_FIXED_v3(
     best: List[Tuple[pd.DataFrame, int, int, int, int]] = []
     assign: Dict[str, str] = {}
 
+    # Μετρητές ανά τμήμα (step1 + τρέχουσα μερική ανάθεση), ενημερώνονται σε O(1) στο backtracking
+    vectors = frame_vectors(df)
+    vec_of: Dict[str, Tuple[int, ...]] = {}
+    for n, v in zip(df["ΟΝΟΜΑ"].astype(str), vectors):
+        vec_of.setdefault(n, tuple(int(x) for x in v))
+    balance = ClassBalance.from_frame(df, step1_col_name, class_labels, vectors=vectors)
+
     # Σειρά δυσκολίας
     def deg(name: str) -> int:
         row = df[df["ΟΝΟΜΑ"] == name].iloc[0]
@@ -233,22 +221,17 @@ def step2_apply_FIXED_v3(
                 return
 
             # έλεγχος στόχων Ζ/Ι
-            Zc = targets["Z_step1"].copy()
-            Ic = targets["I_step1"].copy()
-            for n, cl in assign.items():
-                row = df[df["ΟΝΟΜΑ"] == n].iloc[0]
-                if str(row.get("ΖΩΗΡΟΣ", "")).strip() == "Ν":
-                    Zc[cl] += 1
-                if str(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν":
-                    Ic[cl] += 1
+            Zc = balance.counts("z")
+            Ic = balance.counts("i")
             for cl in class_labels:
                 if not (targets["Z"]["q"] <= Zc[cl] <= targets["Z"]["max"]):
                     return
                 if not (targets["I"]["q"] <= Ic[cl] <= targets["I"]["max"]):
                     return
 
-            ped_cnt = _count_ped_conflicts(cand, cand_col)
-            conf_sum = _sum_conflicts(cand, cand_col)
+            conflicts = _conflict_counter(cand, cand_col)
+            ped_cnt = conflicts.total_pairs()
+            conf_sum = conflicts.total()
             broken = _broken_mutual_pairs(cand, cand_col, scope)
             total = conf_sum + 5 * broken
             best.append((cand, ped_cnt, broken, total, conf_sum))
@@ -256,10 +239,12 @@ def step2_apply_FIXED_v3(
 
         name = to_place_sorted[i]
         for cl in class_labels:
-            if not _prereject(assign, name, cl, df, step1_col_name, class_labels, targets):
+            if not _prereject(assign, name, cl, df, step1_col_name, class_labels, targets, balance, vec_of):
                 continue
             assign[name] = cl
+            balance.add(cl, vec_of[name])
             backtrack(i + 1)
+            balance.remove(cl, vec_of[name])
             del assign[name]
 
     backtrack(0)
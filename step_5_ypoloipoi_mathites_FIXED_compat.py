@@ -14,10 +14,14 @@ Tip: Αν έχεις ήδη ενσωματώσει το utils/schema.normalize_d
 """
 
 from __future__ import annotations
-import random, re
-from typing import List, Dict, Tuple, Any, Optional
+import os, random, re, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional, Union
+import numpy as np
 import pandas as pd
 
+from class_balance import ClassBalance, frame_vectors
+
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 
@@ -66,25 +70,17 @@ def calculate_penalty_score(df: pd.DataFrame, senario_col: str, num_classes: Opt
     if num_classes is None:
         num_classes = len(labs)
 
+    # Όλοι οι μετρητές ανά τμήμα σε ένα πέρασμα
+    bal = ClassBalance.from_frame(df, senario_col, labs)
+
     # --- Ισορροπία Γνώσης Ελληνικών (ανά τμήμα) ---
-    greek_counts = []
-    for lab in labs:
-        sub = df[df[senario_col] == lab].copy()
-        greek_counts.append(int(sub.apply(_is_good_greek, axis=1).sum()))
-    greek_diff = max(greek_counts) - min(greek_counts) if greek_counts else 0
-    penalty = max(0, greek_diff - 2) * 1
+    penalty = max(0, bal.spread("good") - 2) * 1
 
     # --- Ισορροπία Πληθυσμού ---
-    class_sizes = [int((df[senario_col] == lab).sum()) for lab in labs]
-    pop_diff = max(class_sizes) - min(class_sizes) if class_sizes else 0
-    penalty += max(0, pop_diff - 1) * 3  # βάρη σύμφωνα με Step 6/7
+    penalty += max(0, bal.spread("cnt") - 1) * 3  # βάρη σύμφωνα με Step 6/7
 
     # --- Ισορροπία Φύλου (αγόρια/κορίτσια) ---
-    boys_counts  = [int(((df[senario_col] == lab) & (df["ΦΥΛΟ"].astype(str).str.upper()=="Α")).sum()) for lab in labs]
-    girls_counts = [int(((df[senario_col] == lab) & (df["ΦΥΛΟ"].astype(str).str.upper()=="Κ")).sum()) for lab in labs]
-    boys_diff = max(boys_counts) - min(boys_counts) if boys_counts else 0
-    girls_diff = max(girls_counts) - min(girls_counts) if girls_counts else 0
-    penalty += max(0, boys_diff - 1) * 2 + max(0, girls_diff - 1) * 2
+    penalty += max(0, bal.spread("boys") - 1) * 2 + max(0, bal.spread("girls") - 1) * 2
 
     # --- Σπασμένες Πλήρως Αμοιβαίες Φιλίες ---
     if "ΣΠΑΣΜΕΝΗ_ΦΙΛΙΑ" in df.columns:
@@ -93,73 +89,191 @@ def calculate_penalty_score(df: pd.DataFrame, senario_col: str, num_classes: Opt
 
     return int(penalty)
 
-def step5_filikoi_omades(df: pd.DataFrame, senario_col: str, num_classes: Optional[int]=None):
+CAP = 25
+
+def _water_fill(base: List[int], ub: List[int], total: int, order: Optional[List[int]] = None) -> List[int]:
+    """
+    Ακέραιο «water-filling» με άνω όρια: μοιράζει `total` μονάδες ανεβάζοντας πρώτα τα χαμηλότερα
+    επίπεδα (base[c] → ≤ ub[c]). Ισοδύναμο με το να δίνεις μία-μία μονάδα στο τμήμα με το μικρότερο
+    επίπεδο, αλλά σε O(C·log range): δυαδική αναζήτηση της στάθμης L και τα υπόλοιπα με σειρά `order`.
+    Αν total > χωρητικότητα, γεμίζουν όλα ως το ub.
+    """
+    C = len(base)
+    cap = sum(u - b for b, u in zip(base, ub))
+    if total >= cap:
+        return list(ub)
+    if total <= 0:
+        return list(base)
+    fill = lambda L: sum(min(max(L, b), u) - b for b, u in zip(base, ub))
+    lo, hi = min(base), max(ub)
+    while lo < hi:   # μέγιστο L με fill(L) ≤ total
+        mid = (lo + hi + 1) // 2
+        if fill(mid) <= total:
+            lo = mid
+        else:
+            hi = mid - 1
+    level = [min(max(lo, b), u) for b, u in zip(base, ub)]
+    rest = total - fill(lo)
+    for c in (order if order is not None else range(C)):
+        if rest == 0:
+            break
+        if level[c] == lo and lo < ub[c]:
+            level[c] += 1
+            rest -= 1
+    return level
+
+def _step5_mask(df: pd.DataFrame, senario_col: str) -> pd.Series:
+    """Μη τοποθετημένοι ΚΑΙ (χωρίς φίλους ή όχι-αμοιβαίοι ή σπασμένη φιλία)."""
+    friends_list = df["ΦΙΛΟΙ"].map(_parse_list_cell) if "ΦΙΛΟΙ" in df.columns else pd.Series([[]]*len(df), index=df.index)
+    fully_mut = df["ΠΛΗΡΩΣ_ΑΜΟΙΒΑΙΑ"].apply(_is_yes) if "ΠΛΗΡΩΣ_ΑΜΟΙΒΑΙΑ" in df.columns else pd.Series([False]*len(df), index=df.index)
+    broken    = df["ΣΠΑΣΜΕΝΗ_ΦΙΛΙΑ"].apply(_is_yes) if "ΣΠΑΣΜΕΝΗ_ΦΙΛΙΑ" in df.columns else pd.Series([False]*len(df), index=df.index)
+    return df[senario_col].isna() & ((friends_list.map(len) == 0) | (~fully_mut) | (broken))
+
+def solve_step5_categories(bal: ClassBalance, cat_counts: Dict[Tuple[str, int], int],
+                           rng: Optional[random.Random] = None) -> Dict[Tuple[str, int], Dict[str, int]]:
+    """
+    Κατανομή ΠΛΗΘΩΝ ανά κατηγορία (φύλο, καλή_γνώση) στα τμήματα, σε O(κατηγορίες × τμήματα):
+      1) πληθυσμός: water-fill ως CAP (ίδια τελικά πλήθη με το «πάντα στο μικρότερο τμήμα»),
+      2) αγόρια/κορίτσια μέσα στις θέσεις κάθε τμήματος (ισορροπία φύλου· κρατείται η καλύτερη
+         από τις δύο σειρές γεμίσματος),
+      3) καλή γνώση μέσα σε κάθε φύλο (ισορροπία γλώσσας).
+    cat_counts: {("Α"|"Κ"|"", good 0/1): πλήθος}. Επιστρέφει {κατηγορία: {τμήμα: πλήθος}}.
+    """
+    rng = rng or random
+    labs = list(bal.classes)
+    C = len(labs)
+    order = list(range(C))
+    rng.shuffle(order)   # τυχαία ισοβαθμία, όπως το random.choice του άπληστου
+
+    cnt = [bal.get(l, "cnt") for l in labs]
+    pop = _water_fill(cnt, [max(c, CAP) for c in cnt], sum(cat_counts.values()), order)
+    room = [p - c for p, c in zip(pop, cnt)]
+
+    def allocate(genders):
+        r = list(room)
+        good = [bal.get(l, "good") for l in labs]
+        out: Dict[Tuple[str, int], Dict[str, int]] = {}
+        gspread = 0
+        for g, attr in genders:
+            n_g = cat_counts.get((g, 0), 0) + cat_counts.get((g, 1), 0)
+            if attr is not None:
+                cur = [bal.get(l, attr) for l in labs]
+                new = _water_fill(cur, [c + x for c, x in zip(cur, r)], n_g, order)
+                slots = [a - b for a, b in zip(new, cur)]
+                gspread += max(new) - min(new)
+            else:
+                slots = list(r)
+            r = [x - y for x, y in zip(r, slots)]
+            n_good = min(cat_counts.get((g, 1), 0), sum(slots))
+            new_good = _water_fill(good, [a + y for a, y in zip(good, slots)], n_good, order)
+            add_good = [a - b for a, b in zip(new_good, good)]
+            good = new_good
+            out[(g, 1)] = {labs[k]: add_good[k] for k in range(C)}
+            out[(g, 0)] = {labs[k]: slots[k] - add_good[k] for k in range(C)}
+        return gspread, out
+
+    # το φύλο που γεμίζει πρώτο «κλειδώνει» θέσεις → δοκιμάζονται και οι δύο σειρές
+    boys_first = allocate((("Α", "boys"), ("Κ", "girls"), ("", None)))
+    girls_first = allocate((("Κ", "girls"), ("Α", "boys"), ("", None)))
+    return (girls_first if girls_first[0] < boys_first[0] else boys_first)[1]
+
+def step5_filikoi_omades(df: pd.DataFrame, senario_col: str, num_classes: Optional[int]=None,
+                         rng: Optional[random.Random] = None):
     """
-    Τοποθετεί διαδοχικά τους μη τοποθετημένους μαθητές που ΔΕΝ έχουν πλήρως αμοιβαίες φιλίες,
-    με προτεραιότητα: (1) μικρότερος πληθυσμός, (2) ισορροπία φύλου.
+    Τοποθετεί τους μη τοποθετημένους μαθητές που ΔΕΝ έχουν πλήρως αμοιβαίες φιλίες,
+    με προτεραιότητα: (1) μικρότερος πληθυσμός (≤25), (2) ισορροπία φύλου, (3) ισορροπία γλώσσας.
+    Δεν υπάρχουν δεσμευτικές φιλίες, άρα μετρά μόνο η κατηγορία (φύλο, γνώση) κάθε μαθητή:
+    λύνονται τα πλήθη ανά κατηγορία/τμήμα (solve_step5_categories) και γίνεται μία εγγραφή στη στήλη.
+    Αν δεν χωρούν όλοι, μένουν εκτός οι τελευταίοι (σειρά γραμμών).
     """
+    rng = rng or random
     df = df.copy()
     labs = _labels(df, senario_col)
     if num_classes is None:
         num_classes = len(labs)
 
-    classes = {lab: df[df[senario_col] == lab]["ΟΝΟΜΑ"].astype(str).tolist() for lab in labs}
-
-    # --- Mask Step 5: δεν έχουν τοποθέτηση ΚΑΙ (χωρίς φίλους ή όχι-αμοιβαίοι ή σπασμένη φιλία) ---
-    friends_list = df["ΦΙΛΟΙ"].map(_parse_list_cell) if "ΦΙΛΟΙ" in df.columns else pd.Series([[]]*len(df))
-    fully_mut = df["ΠΛΗΡΩΣ_ΑΜΟΙΒΑΙΑ"].apply(_is_yes) if "ΠΛΗΡΩΣ_ΑΜΟΙΒΑΙΑ" in df.columns else pd.Series([False]*len(df))
-    broken    = df["ΣΠΑΣΜΕΝΗ_ΦΙΛΙΑ"].apply(_is_yes) if "ΣΠΑΣΜΕΝΗ_ΦΙΛΙΑ" in df.columns else pd.Series([False]*len(df))
-
-    mask_step5 = (
-        df[senario_col].isna()
-        & ((friends_list.map(len) == 0) | (~fully_mut) | (broken))
-    )
-
-    remaining = df[mask_step5].copy()
-
-    for _, row in remaining.iterrows():
-        name = str(row["ΟΝΟΜΑ"]).strip()
-        gender = str(row["ΦΥΛΟ"]).strip().upper()
-
-        # (1) διάλεξε υποψήφια τμήματα με ελάχιστο πληθυσμό & <25
-        population = {lab: len(classes[lab]) for lab in labs}
-        min_pop = min(population.values())
-        candidates = [lab for lab, cnt in population.items() if cnt == min_pop and cnt < 25]
-        if not candidates:
-            continue
-
-        if len(candidates) == 1:
-            chosen = candidates[0]
-        else:
-            # (2) ισορροπία φύλου — προσομοίωσε την προσθήκη
-            boys = {lab: int(((df[senario_col] == lab) & (df["ΦΥΛΟ"].astype(str).str.upper()=="Α")).sum()) for lab in candidates}
-            girls= {lab: int(((df[senario_col] == lab) & (df["ΦΥΛΟ"].astype(str).str.upper()=="Κ")).sum()) for lab in candidates}
-
-            scores = {}
-            for lab in candidates:
-                pb = boys[lab] + (1 if gender=="Α" else 0)
-                pg = girls[lab]+ (1 if gender=="Κ" else 0)
-                # diff μέσα στους candidates
-                boys_vals  = [pb if x==lab else boys[x]  for x in candidates]
-                girls_vals = [pg if x==lab else girls[x] for x in candidates]
-                scores[lab] = (max(boys_vals)-min(boys_vals)) + (max(girls_vals)-min(girls_vals))
-
-            best = min(scores.values())
-            pool = [lab for lab, sc in scores.items() if sc == best]
-            chosen = random.choice(pool)
-
-        df.loc[df["ΟΝΟΜΑ"] == name, senario_col] = chosen
-        classes[chosen].append(name)
+    vectors = frame_vectors(df)
+    bal = ClassBalance.from_frame(df, senario_col, labs, vectors=vectors)
+
+    pos = np.flatnonzero(_step5_mask(df, senario_col).to_numpy())
+    capacity = sum(max(0, CAP - bal.get(l, "cnt")) for l in labs)
+    pos = pos[:capacity]
+
+    if len(pos):
+        v = vectors[pos]
+        gender = np.where(v[:, 1] == 1, "Α", np.where(v[:, 2] == 1, "Κ", ""))
+        good = v[:, 3].astype(int)
+        members: Dict[Tuple[str, int], List[int]] = {}
+        for p, g, k in zip(pos.tolist(), gender.tolist(), good.tolist()):
+            members.setdefault((g, k), []).append(p)
+        plan = solve_step5_categories(bal, {k: len(m) for k, m in members.items()}, rng)
+
+        labels = np.empty(len(df), dtype=object)
+        for key, rows in members.items():
+            rng.shuffle(rows)
+            it = iter(rows)
+            for lab in labs:
+                for _ in range(plan[key][lab]):
+                    labels[next(it)] = lab
+
+        pos = np.sort(pos)
+        if not (pd.api.types.is_object_dtype(df[senario_col]) or pd.api.types.is_string_dtype(df[senario_col])):
+            df[senario_col] = df[senario_col].astype(object)
+        df.iloc[pos, df.columns.get_loc(senario_col)] = labels[pos]
 
     return df, calculate_penalty_score(df, senario_col, num_classes)
 
-def apply_step5_to_all_scenarios(scenarios_dict: Dict[str, pd.DataFrame], senario_col: str, num_classes: Optional[int]=None):
-    results = {}
-    for scenario_name, scenario_df in scenarios_dict.items():
-        updated_df, score = step5_filikoi_omades(scenario_df, senario_col, num_classes)
-        results[scenario_name] = {"df": updated_df, "penalty_score": score}
+def _step5_task(name: str, df: pd.DataFrame, senario_col: str, num_classes: Optional[int], seed: int) -> Dict[str, Any]:
+    """Ένα σενάριο του batch (top-level ώστε να εκτελείται σε worker διεργασία)."""
+    t0 = time.perf_counter()
+    out, score = step5_filikoi_omades(df, senario_col, num_classes, rng=random.Random(seed))
+    return {"name": name, "column": senario_col, "labels": out[senario_col].to_numpy(dtype=object),
+            "penalty_score": int(score), "elapsed": time.perf_counter() - t0, "seed": seed}
 
-    min_score = min(v["penalty_score"] for v in results.values()) if results else 0
+def step5_batch(scenarios_dict: Dict[str, pd.DataFrame], senario_col: Union[str, Dict[str, str]],
+                num_classes: Optional[int] = None, *, workers: Optional[int] = None,
+                base_seed: int = RANDOM_SEED) -> Dict[str, Dict[str, Any]]:
+    """
+    Βήμα 5 για ΟΛΑ τα σενάρια, σε pool διεργασιών (workers=1 → σειριακά).
+    Το i-οστό σενάριο τρέχει με seed = base_seed + i, άρα το αποτέλεσμα είναι αναπαραγώγιμο
+    ανεξάρτητα από τη σειρά ολοκλήρωσης.
+    senario_col: μία στήλη για όλα ή dict σενάριο → στήλη.
+    Επιστρέφει {σενάριο: {name, column, labels, penalty_score, elapsed, seed}}, όπου labels είναι
+    το διάνυσμα ετικετών (ίδια σειρά γραμμών με το input) — βλ. step5_result_frame.
+    """
+    names = list(scenarios_dict)
+    cols = {n: (senario_col[n] if isinstance(senario_col, dict) else senario_col) for n in names}
+    tasks = [(n, scenarios_dict[n], cols[n], num_classes, base_seed + i) for i, n in enumerate(names)]
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        done = [_step5_task(*t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            done = list(ex.map(_step5_task, *zip(*tasks)))
+    return {r["name"]: r for r in done}
+
+def step5_result_frame(df: pd.DataFrame, result: Dict[str, Any]) -> pd.DataFrame:
+    """Εφαρμόζει τις ετικέτες ενός αποτελέσματος του step5_batch σε αντίγραφο του df."""
+    out = df.copy()
+    out[result["column"]] = result["labels"]
+    return out
+
+def top_step5_results(results: Dict[str, Dict[str, Any]], k: Optional[int] = None) -> List[str]:
+    """Ονόματα σεναρίων ταξινομημένα κατά penalty_score (σταθερή σειρά στις ισοβαθμίες)."""
+    ranked = sorted(results, key=lambda n: results[n]["penalty_score"])
+    return ranked if k is None else ranked[:k]
+
+def apply_step5_to_all_scenarios(scenarios_dict: Dict[str, pd.DataFrame], senario_col: str, num_classes: Optional[int]=None,
+                                 workers: Optional[int] = 1):
+    """
+    Συμβατό API: τρέχει το step5_batch και επιστρέφει (df, penalty_score) του καλύτερου σεναρίου
+    (τυχαία επιλογή ανάμεσα σε ισόβαθμα) ή (None, None) αν δεν δόθηκαν σενάρια.
+    """
+    results = step5_batch(scenarios_dict, senario_col, num_classes, workers=workers)
+    if not results:
+        return None, None
+    min_score = min(v["penalty_score"] for v in results.values())
     best = [k for k, v in results.items() if v["penalty_score"] == min_score]
-    pick = random.choice(best) if best else None
-    return results[pick]["df"] if pick else None
+    pick = random.choice(best)
+    return step5_result_frame(scenarios_dict[pick], results[pick]), min_score
@@ -3,13 +3,21 @@
 from __future__ import annotations
 """
 Patched: dynamic id_col + explicit Step 6 outputs.
+Reentrant: οι στήλες ταξιδεύουν σε ένα Step6Context (καμία module-level μεταβλητή),
+οπότε πολλά σενάρια/συνεδρίες μπορούν να τρέχουν ταυτόχρονα.
 """
-_IDCOL = "ID"
-import itertools
+import bisect
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 import pandas as pd
 import numpy as np
 
+from class_balance import ClassBalance, frame_vectors
+
 # --------------------------
 # Constants / Config
 # --------------------------
@@ -23,12 +31,27 @@ TARGET_POP_DIFF = 2
 TARGET_GENDER_DIFF = 3
 TARGET_LANG_DIFF = 3  # Στόχος: διαφορά γλώσσας ≤3
 
-MAX_ITER = 5
+MAX_ITER = 200   # η κατάσταση ενημερώνεται επί τόπου, άρα κάθε iteration κοστίζει O(#κάδων²·C)
+
+# Tabu search (apply_step6_tabu)
+TABU_TENURE = 7          # iterations που απαγορεύεται να ξαναμπεί ένας κάδος στο τμήμα που μόλις άφησε
+TABU_TIME_BUDGET = 1.0   # δευτερόλεπτα
+TABU_MAX_ITER = 2000
 
 # Αποδεκτές τιμές για στήλη ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ
 STEP4_MARKERS = {4, "4", "Βήμα 4", "Step4", "Step4_Group", "Β4", "Β4_Δυάδα"}
 STEP5_MARKERS = {5, "5", "Βήμα 5", "Step5", "Step5_Solo", "Β5", "Β5_Μεμονωμένος"}
 
+@dataclass(frozen=True)
+class Step6Context:
+    """Ονόματα στηλών μιας εκτέλεσης του Βήματος 6 (αμετάβλητο· περνά σε όλη τη μηχανή)."""
+    class_col: str = "ΤΜΗΜΑ"
+    id_col: str = "ID"
+    gender_col: str = "ΦΥΛΟ"
+    lang_col: str = "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"
+    step_col: str = "ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ"
+    group_col: str = "GROUP_ID"
+
 # --------------------------
 # Helpers
 # --------------------------
@@ -38,28 +61,32 @@ def _classes(df: pd.DataFrame, class_col: str) -> List:
         raise ValueError("Απαιτούνται τουλάχιστον 2 τμήματα.")
     return list(cls)
 
-def _metrics(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str) -> Dict:
+def _balance(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str) -> Optional[ClassBalance]:
+    """Μετρητές ανά τμήμα σε ΕΝΑ πέρασμα (αντί για groupby + μάσκες ανά τμήμα)."""
+    classes = sorted(df[class_col].dropna().unique())
+    if not classes:
+        return None
+    return ClassBalance.from_frame(df, class_col, classes, gender_col=gender_col, lang_col=lang_col)
+
+def _metrics_from_balance(bal: Optional[ClassBalance]) -> Dict:
+    if bal is None:
+        zero = dict(pop=0, boys=0, girls=0, gender=0, lang=0)
+        return dict(per_class={}, deltas=zero, extremes={k: None for k in (
+            "pop_high", "pop_low", "boys_high", "boys_low", "girls_high", "girls_low", "lang_high", "lang_low")})
     per = {}
-    for c, sub in df.groupby(class_col):
-        per[c] = dict(
-            total=len(sub),
-            boys=(sub[gender_col] == BOY).sum(),
-            girls=(sub[gender_col] == GIRL).sum(),
-            good=(sub[lang_col] == GOOD).sum(),
-        )
-    totals = [v["total"] for v in per.values()]
-    boys   = [v["boys"]  for v in per.values()]
-    girls  = [v["girls"] for v in per.values()]
-    good   = [v["good"]  for v in per.values()]
+    for c in bal.classes:
+        r = bal.row(c)
+        per[c] = dict(total=r["cnt"], boys=r["boys"], girls=r["girls"], good=r["good"])
+    sp = bal.spreads()
     deltas = dict(
-        pop   = (max(totals) - min(totals)) if totals else 0,
-        boys  = (max(boys)   - min(boys))   if boys   else 0,
-        girls = (max(girls)  - min(girls))  if girls  else 0,
-        gender= max((max(boys)-min(boys)) if boys else 0, (max(girls)-min(girls)) if girls else 0),
-        lang  = (max(good)   - min(good))  if good   else 0,
+        pop   = sp["cnt"],
+        boys  = sp["boys"],
+        girls = sp["girls"],
+        gender= max(sp["boys"], sp["girls"]),
+        lang  = sp["good"],
     )
-    argmax = lambda s: max(per.keys(), key=lambda k: per[k][s]) if per else None
-    argmin = lambda s: min(per.keys(), key=lambda k: per[k][s]) if per else None
+    argmax = lambda s: max(per.keys(), key=lambda k: per[k][s])
+    argmin = lambda s: min(per.keys(), key=lambda k: per[k][s])
     extremes = dict(
         pop_high = argmax("total"), pop_low  = argmin("total"),
         boys_high= argmax("boys"),  boys_low = argmin("boys"),
@@ -68,6 +95,16 @@ def _metrics(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str) -
     )
     return dict(per_class=per, deltas=deltas, extremes=extremes)
 
+def _metrics(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str) -> Dict:
+    return _metrics_from_balance(_balance(df, class_col, gender_col, lang_col))
+
+def _penalty_from_balance(bal: Optional[ClassBalance]) -> int:
+    if bal is None:
+        return 0
+    boys_over = max(0, bal.spread("boys") - 1)
+    girls_over = max(0, bal.spread("girls") - 1)
+    return 3 * max(0, bal.spread("cnt") - 1) + 1 * max(0, bal.spread("good") - 2) + 2 * (boys_over + girls_over)
+
 def penalty_score(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str) -> int:
     """
     Penalty:
@@ -75,17 +112,13 @@ def penalty_score(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: s
       2) Γλώσσα:    +1 * max(0, Δγλώσσας - 2)
       3) Φύλο:      +2 * (max(0, Δαγοριών-1) + max(0, Δκοριτσιών-1))
     """
-    M = _metrics(df, class_col, gender_col, lang_col)
-    d = M["deltas"]
-    boys_over = max(0, d["boys"] - 1)
-    girls_over = max(0, d["girls"] - 1)
-    return 3 * max(0, d["pop"] - 1) + 1 * max(0, d["lang"] - 2) + 2 * (boys_over + girls_over)
+    return _penalty_from_balance(_balance(df, class_col, gender_col, lang_col))
 
 def _is_step4(val) -> bool: return val in STEP4_MARKERS
 def _is_step5(val) -> bool: return val in STEP5_MARKERS
 
 def _eligible_units(df: pd.DataFrame, class_col: str, step_col: str, group_col: str,
-                    gender_col: str, lang_col: str):
+                    gender_col: str, lang_col: str, id_col: str = "ID"):
     """
     Επιστρέφει (singles, pairs), όπου:
     - singles[c] = IDs μεμονωμένων Βήματος 5 στο τμήμα c
@@ -98,7 +131,7 @@ def _eligible_units(df: pd.DataFrame, class_col: str, step_col: str, group_col:
     # singles: Βήμα 5, χωρίς group
     mask_solo = df[step_col].map(_is_step5) & (df[group_col].isna() | (df[group_col] == ""))
     for c, sub in df[mask_solo].groupby(class_col):
-        singles[c] = sub[_IDCOL].tolist()
+        singles[c] = sub[id_col].tolist()
 
     # pairs: Βήμα 4, με group δύο μελών, όλα στο ίδιο τμήμα
     df_pairs = df[df[step_col].map(_is_step4) & df[group_col].notna()].copy()
@@ -118,45 +151,210 @@ def _eligible_units(df: pd.DataFrame, class_col: str, step_col: str, group_col:
             if langs.count(GOOD) == 2:    lang_kind = "NN"
             elif langs.count(NOTGOOD) == 2: lang_kind = "OO"
             else:                         lang_kind = "N+O"
-            pairs[c].append(dict(group_id=gid, ids=list(g[_IDCOL]), gender_kind=gender_kind, lang_kind=lang_kind))
+            pairs[c].append(dict(group_id=gid, ids=list(g[id_col]), gender_kind=gender_kind, lang_kind=lang_kind))
     return singles, pairs
 
-def _check_size_ok(df: pd.DataFrame, class_col: str) -> bool:
-    return (df[class_col].value_counts() <= MAX_PER_CLASS).all()
-
-def _no_new_broken_friendships(df_before: pd.DataFrame, df_after: pd.DataFrame, class_col: str, group_col: str) -> bool:
-    """Καμία διάσπαση δυάδων Β4 (μένουν στο ίδιο τμήμα)."""
-    if group_col not in df_before.columns: return True
-    b = df_before.dropna(subset=[group_col]).groupby(group_col)[class_col].nunique().le(1).all()
-    a = df_after .dropna(subset=[group_col]).groupby(group_col)[class_col].nunique().le(1).all()
-    return bool(b and a)
-
 # --------------------------
-# Swaps & Candidates (N classes)
+# Persistent state (delta evaluation, χωρίς αντίγραφα DataFrame)
 # --------------------------
-def _apply_swap(df: pd.DataFrame, class_col: str,
-                fromA_ids: List[str], to_class_B,
-                fromB_ids: List[str], to_class_A,
-                reason: str, swap_idx: int,
-                step_col: str, group_col: str) -> pd.DataFrame:
-    """Εφαρμόζει ανταλλαγή ανάμεσα σε δύο ΣΥΓΚΕΚΡΙΜΕΝΑ τμήματα (N-classes safe)."""
-    df = df.copy()
-    if fromA_ids:
-        df.loc[df[_IDCOL].isin(fromA_ids), class_col] = to_class_B
-    if fromB_ids:
-        df.loc[df[_IDCOL].isin(fromB_ids), class_col] = to_class_A
-
-    swap_id = f"SWAP_{swap_idx}"
-    moved_ids = list(fromA_ids) + list(fromB_ids)
-    if moved_ids:
-        m = df[_IDCOL].isin(moved_ids)
-        df.loc[m, "ΒΗΜΑ6_ΚΙΝΗΣΗ"] = swap_id
-        df.loc[m, "ΑΙΤΙΑ_ΑΛΛΑΓΗΣ"] = reason
-        df.loc[m, "ΠΗΓΗ_ΒΗΜΑ"] = np.where(df.loc[m, group_col].notna(), "Β4_Δυάδα", "Β5_Μεμονωμένος")
-    return df
+def _single_key(g, l, grp, v):
+    return (g, l, isinstance(grp, str) and grp == "", int(v[1]), int(v[2]), int(v[3]))
 
-def _rank_candidates(df_before: pd.DataFrame, class_col: str, gender_col: str, lang_col: str,
-                     candidates, objective: str) -> List:
+class Step6State:
+    """
+    Μόνιμη κατάσταση του Βήματος 6, ενημερώνεται ΕΠΙ ΤΟΠΟΥ σε κάθε commit:
+      - labels: τρέχον τμήμα ανά γραμμή και bal: ClassBalance (μετρητές/δ ανά τμήμα)
+      - κινητές μονάδες ανά τμήμα σε κάδους ισοδυναμίας (singles: ID, pairs: dict του _eligible_units)
+      - audit (ΒΗΜΑ6_ΚΙΝΗΣΗ / ΑΙΤΙΑ_ΑΛΛΑΓΗΣ / ΠΗΓΗ_ΒΗΜΑ) ανά γραμμή
+    Κάθε ID συνεισφέρει ένα διάνυσμα (cnt, boys, girls, good, …)· μια ανταλλαγή αξιολογείται
+    μετακινώντας δύο αθροίσματα στο bal (O(C)) και αναιρώντας. Το DataFrame γράφεται μία φορά (write_back).
+
+    Κάδοι: μαθητές με ίδιο (φύλο, γλώσσα) στο ίδιο τμήμα έχουν ΙΔΙΑ επίδραση σε μια ανταλλαγή, άρα αρκεί
+    ένας αντιπρόσωπος ανά κάδο. Οι κάδοι κρατούν τα μέλη τους με τη σειρά της πλήρους απαρίθμησης
+    (θέση γραμμής για singles, σειρά group για pairs), ώστε η κατάταξη να διαλέγει την ίδια ανταλλαγή.
+    """
+
+    def __init__(self, df: pd.DataFrame, ctx: Step6Context):
+        self.ctx = ctx
+        class_col, gender_col, lang_col = ctx.class_col, ctx.gender_col, ctx.lang_col
+        step_col, group_col = ctx.step_col, ctx.group_col
+        self.class_col = class_col
+        self.group_col = group_col
+        self.bal = _balance(df, class_col, gender_col, lang_col)
+        vectors = frame_vectors(df, gender_col, lang_col)
+        self._width = vectors.shape[1]
+        self.labels = df[class_col].to_numpy(dtype=object).copy()
+        self.pos_of: Dict = {}
+        for k, i in enumerate(df[ctx.id_col].tolist()):
+            self.pos_of.setdefault(i, []).append(k)
+        self.first_pos = {i: p[0] for i, p in self.pos_of.items()}
+        self.vec_of = {i: vectors[p].sum(axis=0) for i, p in self.pos_of.items()}
+        # ωμές τιμές (φύλο, γλώσσα, group) ανά ID — για τα φίλτρα και τους κάδους των υποψηφίων
+        g_raw, l_raw = df[gender_col].to_numpy(), df[lang_col].to_numpy()
+        self.groups = df[group_col].to_numpy() if group_col in df.columns else None
+        grp_raw = self.groups if self.groups is not None else np.full(len(df), np.nan, dtype=object)
+        self.attr_of = {i: (g_raw[p[0]], l_raw[p[0]], grp_raw[p[0]]) for i, p in self.pos_of.items()}
+        self.group_pos: Dict = {}
+        if self.groups is not None:
+            for k, g in enumerate(self.groups):
+                if not pd.isna(g):
+                    self.group_pos.setdefault(g, []).append(k)
+        self.groups_intact = all(self._n_classes(self.labels[k] for k in p) <= 1 for p in self.group_pos.values())
+
+        # κινητές μονάδες → κάδοι
+        singles, pairs = _eligible_units(df, class_col, step_col, group_col, gender_col, lang_col, ctx.id_col)
+        self.single_key = {}
+        self.sb: Dict = {c: {} for c in singles}
+        for c, ids in singles.items():
+            for i in ids:
+                g, l, grp = self.attr_of[i]
+                k = self.single_key[i] = _single_key(g, l, grp, self.vec_of[i])
+                self.sb[c].setdefault(k, []).append(i)
+        # σειρά των pairs = σειρά του groupby(group_col) στο _eligible_units (ταξινομημένα group ids)
+        gids = [p["group_id"] for ps in pairs.values() for p in ps]
+        try:
+            gids = sorted(gids)
+        except TypeError:
+            pass
+        self.pair_rank = {g: r for r, g in enumerate(gids)}
+        self.pair_of_id: Dict = {}
+        self.pb: Dict = {c: {} for c in pairs}
+        for c, ps in pairs.items():
+            for p in ps:
+                v = self.vector(p["ids"])
+                closed = len(self.group_pos.get(p["group_id"], ())) == 2
+                p["key"] = (p["gender_kind"], p["lang_kind"], closed, int(v[1]), int(v[2]), int(v[3]))
+                self.pb[c].setdefault(p["key"], []).append(p)
+                for i in p["ids"]:
+                    self.pair_of_id[i] = p
+
+        n = len(df)
+        self.audit_move = np.full(n, None, dtype=object)
+        self.audit_reason = np.full(n, None, dtype=object)
+        self.audit_src = np.full(n, None, dtype=object)
+        self.moved = np.zeros(n, dtype=bool)
+
+    @staticmethod
+    def _n_classes(labels) -> int:
+        return len({c for c in labels if not pd.isna(c)})   # όπως το nunique()
+
+    # ---- ανάγνωση ----
+    def metrics(self) -> Dict:
+        return _metrics_from_balance(self.bal)
+
+    def penalty(self) -> int:
+        return _penalty_from_balance(self.bal)
+
+    def vector(self, ids) -> np.ndarray:
+        v = np.zeros(self._width, dtype=np.int64)
+        for i in set(ids):
+            if i in self.vec_of:
+                v += self.vec_of[i]
+        return v
+
+    def single_buckets(self, c, pred=lambda key: True) -> List[List]:
+        """Κάδοι singles του τμήματος c (λίστες ID), με τη σειρά πρώτης εμφάνισης."""
+        out = [ids for k, ids in self.sb.get(c, {}).items() if ids and pred(k)]
+        out.sort(key=lambda ids: self.first_pos[ids[0]])
+        return out
+
+    def pair_buckets(self, c, pred=lambda key: True) -> List[List]:
+        out = [ps for k, ps in self.pb.get(c, {}).items() if ps and pred(k)]
+        out.sort(key=lambda ps: self.pair_rank[ps[0]["group_id"]])
+        return out
+
+    # ---- αξιολόγηση ----
+    def evaluate(self, fromA, classA, fromB, classB) -> Tuple[bool, Dict, int]:
+        """(size_ok, deltas, penalty) μετά την ανταλλαγή fromA: A→B, fromB: B→A — χωρίς να την εφαρμόσει."""
+        return self.evaluate_moves([(fromA, classA, classB), (fromB, classB, classA)])
+
+    def evaluate_moves(self, moves) -> Tuple[bool, Dict, int]:
+        """Όπως evaluate, για οποιαδήποτε λίστα κινήσεων (ids, src, dst) — π.χ. κυκλική ανταλλαγή."""
+        bal = self.bal
+        vecs = [self.vector(ids) for ids, _, _ in moves]
+        for (ids, src, dst), v in zip(moves, vecs):
+            bal.move(src, dst, v)
+        size_ok = bal.max("cnt") <= MAX_PER_CLASS
+        sp = bal.spreads()
+        pen = _penalty_from_balance(bal)
+        for (ids, src, dst), v in zip(reversed(moves), reversed(vecs)):
+            bal.move(dst, src, v)
+        d = dict(pop=sp["cnt"], boys=sp["boys"], girls=sp["girls"],
+                 gender=max(sp["boys"], sp["girls"]), lang=sp["good"])
+        return size_ok, d, pen
+
+    def keeps_groups(self, fromA, classB, fromB, classA) -> bool:
+        """FRIENDS_OK: καμία διάσπαση group (όλα τα μέλη στο ίδιο τμήμα πριν ΚΑΙ μετά), χωρίς εφαρμογή."""
+        return self.keeps_groups_moves([(fromA, classA, classB), (fromB, classB, classA)])
+
+    def keeps_groups_moves(self, moves) -> bool:
+        if not self.groups_intact:
+            return False
+        if self.groups is None:
+            return True
+        new_label = {}
+        for ids, _, dst in moves:
+            for i in set(ids):
+                for k in self.pos_of.get(i, ()):
+                    new_label[k] = dst
+        touched = {self.groups[k] for k in new_label if not pd.isna(self.groups[k])}
+        for g in touched:
+            if self._n_classes(new_label.get(k, self.labels[k]) for k in self.group_pos[g]) > 1:
+                return False
+        return True
+
+    # ---- commit ----
+    def _move_units(self, ids, src, dst) -> None:
+        done = set()
+        for i in ids:
+            p = self.pair_of_id.get(i)
+            if p is not None:
+                if p["group_id"] in done:
+                    continue
+                done.add(p["group_id"])
+                self.pb[src][p["key"]].remove(p)
+                lst = self.pb[dst].setdefault(p["key"], [])
+                bisect.insort(lst, p, key=lambda q: self.pair_rank[q["group_id"]])
+            elif i in self.single_key:
+                k = self.single_key[i]
+                self.sb[src][k].remove(i)
+                bisect.insort(self.sb[dst].setdefault(k, []), i, key=self.first_pos.__getitem__)
+
+    def apply(self, fromA, classA, fromB, classB, reason: str, swap_idx: int) -> None:
+        """Εφαρμόζει την ανταλλαγή στην κατάσταση (όχι στο DataFrame)."""
+        self.apply_moves([(fromA, classA, classB), (fromB, classB, classA)], reason, f"SWAP_{swap_idx}")
+
+    def apply_moves(self, moves, reason: str, tag: str) -> None:
+        """Εφαρμόζει κινήσεις (ids, src, dst)· tag → ΒΗΜΑ6_ΚΙΝΗΣΗ (π.χ. SWAP_3, CYCLE_7)."""
+        for ids, src, dst in moves:
+            self.bal.move(src, dst, self.vector(ids))
+        for ids, src, dst in moves:
+            self._move_units(ids, src, dst)
+        for ids, _, dst in moves:
+            for i in set(ids):
+                for k in self.pos_of.get(i, ()):
+                    self.labels[k] = dst
+                    self.audit_move[k] = tag
+                    self.audit_reason[k] = reason
+                    in_group = self.groups is not None and not pd.isna(self.groups[k])
+                    self.audit_src[k] = "Β4_Δυάδα" if in_group else "Β5_Μεμονωμένος"
+                    self.moved[k] = True
+
+    def write_back(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Γράφει τμήματα και audit των μετακινημένων γραμμών στο df (μία φορά, στο τέλος)."""
+        if self.moved.any():
+            cc = df.columns.get_loc(self.class_col)
+            rows = np.flatnonzero(self.moved)
+            if not pd.api.types.is_object_dtype(df[self.class_col]):
+                df[self.class_col] = df[self.class_col].astype(object)
+            df.iloc[rows, cc] = self.labels[rows]
+            for col, arr in (("ΒΗΜΑ6_ΚΙΝΗΣΗ", self.audit_move), ("ΑΙΤΙΑ_ΑΛΛΑΓΗΣ", self.audit_reason),
+                             ("ΠΗΓΗ_ΒΗΜΑ", self.audit_src)):
+                df[col] = df[col].astype(object)
+                df.iloc[rows, df.columns.get_loc(col)] = arr[rows]
+        return df
+
+def _rank_candidates(state: Step6State, candidates, objective: str) -> List:
     """
     Κατατάσσει υποψήφιες ανταλλαγές:
       - LANG:  max μείωση Δγλώσσας, μετά Δφύλου, μετά μείωση penalty, μετά λιγότερες κινήσεις
@@ -165,19 +363,16 @@ def _rank_candidates(df_before: pd.DataFrame, class_col: str, gender_col: str, l
     + Πληθυσμός (αυστηροποίηση):
       - Απαιτείται d_pop <= 2 ΠΑΝΤΑ.
       - Αν base_pop <= 2, τότε d_pop <= base_pop (μη επιδείνωση εντός στόχου).
+    Κάθε υποψήφιος αξιολογείται ως διαφορά πάνω στο ClassBalance (Step6State.evaluate).
     """
-    base_M = _metrics(df_before, class_col, gender_col, lang_col)
-    base_d = base_M["deltas"]
-    base_pen = penalty_score(df_before, class_col, gender_col, lang_col)
+    base_d = state.metrics()["deltas"]
+    base_pen = state.penalty()
     ranked = []
 
     for (fromA, classA, fromB, classB, reason) in candidates:
-        tmp = _apply_swap(df_before, class_col, fromA, classB, fromB, classA, reason, 9999,
-                          step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ", group_col="GROUP_ID")
-        if not _check_size_ok(tmp, class_col):
+        size_ok, d, pen = state.evaluate(fromA, classA, fromB, classB)
+        if not size_ok:
             continue
-        M = _metrics(tmp, class_col, gender_col, lang_col)
-        d = M["deltas"]
         # 🔒 Population strictness
         if d["pop"] > TARGET_POP_DIFF:
             continue
@@ -185,7 +380,6 @@ def _rank_candidates(df_before: pd.DataFrame, class_col: str, gender_col: str, l
             # μην επιδεινώνεις όταν ήδη εντός στόχου
             continue
 
-        pen = penalty_score(tmp, class_col, gender_col, lang_col)
         dlang_gain   = base_d["lang"]   - d["lang"]
         dgender_gain = base_d["gender"] - d["gender"]
         pen_gain     = base_pen - pen
@@ -199,55 +393,73 @@ def _rank_candidates(df_before: pd.DataFrame, class_col: str, gender_col: str, l
             key = (-dgender_gain, -dlang_gain, -pen_gain, len(fromA)+len(fromB))
         else:
             key = (-dlang_gain, -dgender_gain, -pen_gain, len(fromA)+len(fromB))
-        ranked.append((key, fromA, classA, fromB, classB, reason))
+        ranked.append((key, pen, fromA, classA, fromB, classB, reason))
     ranked.sort(key=lambda x: x[0])
-    return [(fromA, classA, fromB, classB, reason) for _, fromA, classA, fromB, classB, reason in ranked]
+    return [(pen, fromA, classA, fromB, classB, reason) for _, pen, fromA, classA, fromB, classB, reason in ranked]
 
-def _enum_LANG(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str,
-               step_col: str, group_col: str, top_k:int=2):
+# --------------------------
+# Υποψήφιοι ανά κάδο
+# --------------------------
+# Ένας αντιπρόσωπος (η ΠΡΩΤΗ εμφάνιση) ανά κάδο, με την ίδια σειρά που θα εμφανιζόταν στην πλήρη
+# απαρίθμηση· η σταθερή ταξινόμηση διαλέγει έτσι την ίδια ανταλλαγή, με O(#κάδων²) αντί για O(s²)
+# υποψηφίους ανά ζεύγος τμημάτων.
+
+def _rep_twos(state: Step6State, buckets) -> List[Tuple]:
+    """Αντιπρόσωποι του itertools.combinations(singles, 2) ανά (αδιάτακτο) ζεύγος κάδων, με την ίδια σειρά."""
+    idx = []
+    for n, a in enumerate(buckets):
+        if len(a) >= 2:
+            idx.append((a[0], a[1]))
+        for b in buckets[n+1:]:
+            idx.append((a[0], b[0]))   # οι κάδοι είναι ήδη σε σειρά πρώτης εμφάνισης
+    idx.sort(key=lambda t: (state.first_pos[t[0]], state.first_pos[t[1]]))
+    return idx
+
+def _enum_LANG(state: Step6State, top_k:int=2):
     """Υποψήφιοι swaps για Γλώσσα μεταξύ top_k υψηλών και χαμηλών τμημάτων ως προς 'good'."""
-    M = _metrics(df, class_col, gender_col, lang_col)
-    per = M["per_class"]
+    per = state.metrics()["per_class"]
     # ταξινόμηση κατά good
     classes_sorted = sorted(per.keys(), key=lambda c: per[c]["good"], reverse=True)
     highs = classes_sorted[:top_k]
     lows  = list(reversed(classes_sorted))[:top_k]
 
-    singles, pairs = _eligible_units(df, class_col, step_col, group_col, gender_col, lang_col)
+    lang_is = lambda val: (lambda k: k[1] == val)
+    pair_lang = lambda kind: (lambda k: k[1] == kind)
     cand = []
     for high in highs:
         for low in lows:
             if high == low: continue
             # 1↔1 (Ν ↔ Ο)
-            singles_high_good = df[df[_IDCOL].isin(singles[high]) & (df[lang_col] == GOOD)][_IDCOL].tolist()
-            singles_low_not   = df[df[_IDCOL].isin(singles[low])  & (df[lang_col] == NOTGOOD)][_IDCOL].tolist()
-            for i in singles_high_good:
-                for j in singles_low_not:
-                    cand.append(( [i], high, [j], low, "Language" ))
+            singles_high_good = state.single_buckets(high, lang_is(GOOD))
+            singles_low_not   = state.single_buckets(low, lang_is(NOTGOOD))
+            for bi in singles_high_good:
+                for bj in singles_low_not:
+                    cand.append(( [bi[0]], high, [bj[0]], low, "Language" ))
             # 2↔2 (NN ↔ OO)
-            pairs_high_NN = [p for p in pairs[high] if p["lang_kind"]=="NN"]
-            pairs_low_OO  = [p for p in pairs[low]  if p["lang_kind"]=="OO"]
+            pairs_high_NN = [ps[0] for ps in state.pair_buckets(high, pair_lang("NN"))]
+            pairs_low_OO  = [ps[0] for ps in state.pair_buckets(low, pair_lang("OO"))]
             for pNN in pairs_high_NN:
                 for pOO in pairs_low_OO:
                     cand.append(( pNN["ids"], high, pOO["ids"], low, "Language" ))
             # 2↔1+1 (NN ↔ Ο+Ο)
-            if pairs_high_NN and len(singles_low_not) >= 2:
+            if pairs_high_NN and sum(map(len, singles_low_not)) >= 2:
+                twos = _rep_twos(state, singles_low_not)
                 for pNN in pairs_high_NN:
-                    for two in itertools.combinations(singles_low_not, 2):
+                    for two in twos:
                         cand.append(( pNN["ids"], high, list(two), low, "Language" ))
             # αντίστροφα (OO ↔ Ν+Ν)
-            pairs_high_OO = [p for p in pairs[high] if p["lang_kind"]=="OO"]
-            singles_low_good = df[df[_IDCOL].isin(singles[low]) & (df[lang_col] == GOOD)][_IDCOL].tolist()
-            if pairs_high_OO and len(singles_low_good) >= 2:
+            pairs_high_OO = [ps[0] for ps in state.pair_buckets(high, pair_lang("OO"))]
+            singles_low_good = state.single_buckets(low, lang_is(GOOD))
+            if pairs_high_OO and sum(map(len, singles_low_good)) >= 2:
+                twos = _rep_twos(state, singles_low_good)
                 for pOO in pairs_high_OO:
-                    for two in itertools.combinations(singles_low_good, 2):
+                    for two in twos:
                         cand.append(( list(two), low, pOO["ids"], high, "Language" ))
     return cand
 
-def _enum_GENDER(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str,
-                 step_col: str, group_col: str, top_k:int=2):
+def _enum_GENDER(state: Step6State, top_k:int=2):
     """Υποψήφιοι swaps για Φύλο μεταξύ top_k υψηλών και χαμηλών ως προς target gender."""
-    M = _metrics(df, class_col, gender_col, lang_col)
+    M = state.metrics()
     per = M["per_class"]
     # ποιο φύλο έχει μεγαλύτερη απόκλιση;
     boys_diff = M["deltas"]["boys"]
@@ -259,189 +471,245 @@ def _enum_GENDER(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: st
     highs = classes_sorted[:top_k]
     lows  = list(reversed(classes_sorted))[:top_k]
 
-    singles, pairs = _eligible_units(df, class_col, step_col, group_col, gender_col, lang_col)
     cand = []
     opp_gender = GIRL if target_gender==BOY else BOY
     for high in highs:
         for low in lows:
             if high == low: continue
             # 1↔1 (ίδια γνώση προτιμητέα)
-            ids_high = df[df[_IDCOL].isin(singles[high]) & (df[gender_col] == target_gender)][_IDCOL].tolist()
-            for i in ids_high:
-                lang_i = df.loc[df[_IDCOL]==i, lang_col].iloc[0]
-                same_lang = df[
-                    df[_IDCOL].isin(singles[low]) & (df[gender_col]==opp_gender) & (df[lang_col]==lang_i)
-                ][_IDCOL].tolist()
-                any_lang = df[
-                    df[_IDCOL].isin(singles[low]) & (df[gender_col]==opp_gender)
-                ][_IDCOL].tolist()
+            ids_high = state.single_buckets(high, lambda k: k[0] == target_gender)
+            singles_low_opp = state.single_buckets(low, lambda k: k[0] == opp_gender)
+            any_lang = [b[0] for b in singles_low_opp]
+            for bi in ids_high:
+                i = bi[0]
+                lang_i = state.attr_of[i][1]
+                same_lang = [j for j in any_lang if state.attr_of[j][1] == lang_i]
                 for j in same_lang: cand.append(([i], high, [j], low, "Gender"))
                 for j in any_lang:  cand.append(([i], high, [j], low, "Gender"))
             # 2↔2
-            pairs_high_g = [p for p in pairs[high] if p["gender_kind"]==target_gender]
-            pairs_low_og = [p for p in pairs[low]  if p["gender_kind"]==opp_gender]
+            pairs_high_g = [ps[0] for ps in state.pair_buckets(high, lambda k: k[0] == target_gender)]
+            pairs_low_og = [ps[0] for ps in state.pair_buckets(low, lambda k: k[0] == opp_gender)]
             for p1 in pairs_high_g:
                 for p2 in pairs_low_og:
                     cand.append((p1["ids"], high, p2["ids"], low, "Gender"))
             # 2↔1+1
-            singles_low_opp = df[df[_IDCOL].isin(singles[low]) & (df[gender_col]==opp_gender)][_IDCOL].tolist()
-            for p1 in pairs_high_g:
-                if len(singles_low_opp) >= 2:
-                    for two in itertools.combinations(singles_low_opp, 2):
+            if pairs_high_g and sum(map(len, singles_low_opp)) >= 2:
+                twos = _rep_twos(state, singles_low_opp)
+                for p1 in pairs_high_g:
+                    for two in twos:
                         cand.append((p1["ids"], high, list(two), low, "Gender"))
     return cand
 
-def _enum_BOTH(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str,
-               step_col: str, group_col: str, top_k:int=2):
+def _enum_BOTH(state: Step6State, top_k:int=2):
     cand = []
-    cand += _enum_LANG(df, class_col, gender_col, lang_col, step_col, group_col, top_k=top_k)
-    cand += _enum_GENDER(df, class_col, gender_col, lang_col, step_col, group_col, top_k=top_k)
+    cand += _enum_LANG(state, top_k=top_k)
+    cand += _enum_GENDER(state, top_k=top_k)
     return cand
 
-def _commit_best_swap_if_improves(df: pd.DataFrame, class_col: str, gender_col: str, lang_col: str,
-                                  step_col: str, group_col: str, objective: str, swap_idx: int) -> Tuple[pd.DataFrame, bool]:
-    # Υποψήφιοι
+def _commit_best_swap_if_improves(state: Step6State, objective: str, swap_idx: int) -> bool:
+    # Υποψήφιοι (ένας αντιπρόσωπος ανά κάδο)
     if objective == "LANG":
-        candidates = _enum_LANG(df, class_col, gender_col, lang_col, step_col, group_col)
+        candidates = _enum_LANG(state)
     elif objective == "GENDER":
-        candidates = _enum_GENDER(df, class_col, gender_col, lang_col, step_col, group_col)
+        candidates = _enum_GENDER(state)
     else:
-        candidates = _enum_BOTH(df, class_col, gender_col, lang_col, step_col, group_col)
-
-    ranked = _rank_candidates(df, class_col, gender_col, lang_col, candidates, objective)
-    if not ranked: return df, False
-
-    base_M = _metrics(df, class_col, gender_col, lang_col)
-    base_d = base_M["deltas"]
-    base_pen = penalty_score(df, class_col, gender_col, lang_col)
-
-    for (fromA, classA, fromB, classB, reason) in ranked:
-        tmp = _apply_swap(df, class_col, fromA, classB, fromB, classA, reason, swap_idx, step_col, group_col)
-        # Σκληροί έλεγχοι
-        if not _check_size_ok(tmp, class_col): continue
-        if not _no_new_broken_friendships(df, tmp, class_col, group_col): continue
-        # Πληθυσμός: πάντα <=2 και μη-επιδείνωση όταν ήδη εντός
-        d = _metrics(tmp, class_col, gender_col, lang_col)["deltas"]
-        if d["pop"] > TARGET_POP_DIFF: continue
-        if base_d["pop"] <= TARGET_POP_DIFF and d["pop"] > base_d["pop"]: continue
-        # Μείωση penalty
-        if penalty_score(tmp, class_col, gender_col, lang_col) < base_pen:
-            return tmp, True
-    return df, False
+        candidates = _enum_BOTH(state)
 
-# --------------------------
-# Public API
-# --------------------------
-
-def apply_step6_to_step5_scenarios(step5_outputs: Dict[str, pd.DataFrame],
-                                   *, class_col="ΤΜΗΜΑ", id_col="ID", gender_col="ΦΥΛΟ",
-                                   lang_col="ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ",
-                                   group_col="GROUP_ID", max_iter: int = MAX_ITER) -> Dict[str, Dict]:
-    """
-    Adapter: Τρέχει το Βήμα 6 πάνω σε ΠΟΛΛΑ σενάρια που έρχονται από το Βήμα 5.
-    Είσοδος: dict { "ΣΕΝΑΡΙΟ_1": df5_1, "ΣΕΝΑΡΙΟ_2": df5_2, ... }
-    Έξοδος: dict με ίδια keys και values {"df": df6, "summary": {...}}
-    """
-    results = {}
-    for name, df5 in step5_outputs.items():
-        out = apply_step6(df5.copy(), class_col=class_col, id_col=id_col, gender_col=gender_col,
-                          lang_col=lang_col, step_col=step_col, group_col=group_col, max_iter=max_iter)
-        results[name] = out
-    return results
-
-if __name__ == "__main__":
-    # Optional: quick smoke test with 3 classes
-    data = [
-        [1, "Α1", "Α", "Ν", 4, "G1"],
-        [2, "Α1", "Α", "Ν", 4, "G1"],
-        [3, "Α1", "Κ", "Ο", 5, None],
-        [4, "Α1", "Κ", "Ν", 5, None],
-
-        [5, "Β1", "Κ", "Ο", 4, "G2"],
-        [6, "Β1", "Κ", "Ο", 4, "G2"],
-        [7, "Β1", "Α", "Ν", 5, None],
-        [8, "Β1", "Α", "Ο", 5, None],
-
-        [9,  "Γ1", "Α", "Ν", 5, None],
-        [10, "Γ1", "Κ", "Ν", 5, None],
-    ]
-    df_ex = pd.DataFrame(data, columns=["ID", "ΤΜΗΜΑ", "ΦΥΛΟ", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ", "GROUP_ID"])
-    res = apply_step6(df_ex)
-    print(res["summary"])
+    ranked = _rank_candidates(state, candidates, objective)
+    if not ranked: return False
 
+    base_pen = state.penalty()
 
+    # Οι έλεγχοι μεγέθους/πληθυσμού έγιναν ήδη στο ranking· εδώ μένουν φιλίες και μείωση penalty.
+    for (pen, fromA, classA, fromB, classB, reason) in ranked:
+        if pen >= base_pen: continue
+        if not state.keeps_groups(fromA, classB, fromB, classA): continue
+        state.apply(fromA, classA, fromB, classB, reason, swap_idx)
+        return True
+    return False
 
-def apply_step6(df: pd.DataFrame,
+# --------------------------
+# Κάτω φράγμα εφικτότητας
+# --------------------------
+# Όλες οι κινήσεις του Βήματος 6 (ανταλλαγές, κύκλοι) κρατούν ΣΤΑΘΕΡΟ το πλήθος κάθε τμήματος και το
+# πλήθος κινητών θέσεων s_c σε αυτό. Για ένα χαρακτηριστικό (αγόρια/κορίτσια/καλή γνώση) το τμήμα c
+# καταλήγει με f_c + y_c, όπου f_c = μη κινητοί με το χαρακτηριστικό, 0 ≤ y_c ≤ s_c και Σ y_c = M
+# (κινητοί με το χαρακτηριστικό). Η ελάχιστη διαφορά max−min αυτής της χαλάρωσης (αγνοεί δυάδες και
+# penalty) είναι κάτω φράγμα για ΚΑΘΕ αποτέλεσμα του Βήματος 6.
+
+def _spread_lower_bound(fixed: List[int], slots: List[int], total: int) -> int:
+    """Ελάχιστο D ώστε να υπάρχει παράθυρο [L, L+D] που χωρά όλα τα f_c + y_c (Σ y_c = total)."""
+    lo_all = min(fixed)
+    hi_all = max(f + s for f, s in zip(fixed, slots))
+    for D in range(0, hi_all - lo_all + 1):
+        for L in range(lo_all, hi_all - D + 1):
+            need = got = 0
+            for f, s in zip(fixed, slots):
+                a, b = max(0, L - f), min(s, L + D - f)
+                if a > b:
+                    break
+                need += a
+                got += b
+            else:
+                if need <= total <= got:
+                    return D
+    return hi_all - lo_all
+
+def _bound_from_state(state: Step6State) -> Dict:
+    """Καλύτερα εφικτά δ (κάτω φράγματα) από τους μετρητές κινητών μονάδων ανά τμήμα."""
+    if state.bal is None:
+        return dict(pop=0, boys=0, girls=0, gender=0, lang=0)
+    movable = {c: np.zeros(state._width, dtype=np.int64) for c in state.bal.classes}
+    for c, buckets in state.sb.items():
+        for ids in buckets.values():
+            for i in ids:
+                movable[c] += state.vec_of[i]
+    for c, buckets in state.pb.items():
+        for ps in buckets.values():
+            for p in ps:
+                movable[c] += state.vector(p["ids"])
+    slots = [int(movable[c][0]) for c in state.bal.classes]
+    lb = {}
+    for attr, k in (("boys", 1), ("girls", 2), ("lang", 3)):
+        fixed = [state.bal.get(c, "good" if attr == "lang" else attr) - int(movable[c][k]) for c in state.bal.classes]
+        lb[attr] = _spread_lower_bound(fixed, slots, sum(int(movable[c][k]) for c in state.bal.classes))
+    return dict(pop=state.bal.spread("cnt"), boys=lb["boys"], girls=lb["girls"],
+                gender=max(lb["boys"], lb["girls"]), lang=lb["lang"])
+
+def step6_bound(df: pd.DataFrame,
                 *, class_col="ΤΜΗΜΑ", id_col="ID", gender_col="ΦΥΛΟ",
                 lang_col="ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ",
-                group_col="GROUP_ID", max_iter: int = MAX_ITER) -> Dict:
+                group_col="GROUP_ID") -> Dict:
     """
-    Εφαρμογή Βήματος 6 για N (≥2) τμήματα.
-    Κινήσεις ΜΟΝΟ μεταξύ Β4-δυάδων (αδιαίρετες) και Β5-μεμονωμένων.
-    Δεν αγγίζονται μαθητές Βημάτων 1–3.
-    Targets: Δπληθ ≤2, Δφύλου ≤3, Δγλώσσας ≤3.
+    Γρήγορος έλεγχος πριν από το Βήμα 6 (χωρίς αναζήτηση, δεν αλλάζει το df).
+    Επιστρέφει {"deltas": κάτω φράγματα δ, "reachable": bool}· reachable=False σημαίνει ότι οι στόχοι
+    (Δπληθ ≤2, Δφύλου ≤3, Δγλώσσας ≤3) είναι ΑΠΟΔΕΔΕΙΓΜΕΝΑ ανέφικτοι για το σενάριο.
+    """
+    ctx = Step6Context(class_col=class_col, id_col=id_col, gender_col=gender_col, lang_col=lang_col,
+                       step_col=step_col, group_col=group_col)
+    bound = _bound_from_state(Step6State(_prepare_frame(df.copy(), ctx), ctx))
+    return {"deltas": bound, "reachable": _within_targets(bound)}
 
-    Όταν οι αποκλίσεις είναι ήδη εντός στόχων (Δπληθ ≤2, Δφύλου ≤3, Γλώσσας ≤3),
-    ο αλγόριθμος δεν σταματά αμέσως· δοκιμάζει επιπλέον έγκυρες ανταλλαγές που:
-      • μειώνουν το συνολικό penalty,
-      • δεν χειροτερεύουν τον άλλο δείκτη (φύλο/γλώσσα),
-      • τηρούν SIZE_OK (≤25), FRIENDS_OK (δεν σπάει δυάδες), SCOPE_OK (μόνο Β4-δυάδες/Β5-μεμονωμένοι),
-      • δεν αυξάνουν τη διαφορά πληθυσμού (και πάντα κρατούν Δπληθ ≤2).
-    Σταματά όταν δεν υπάρχει καλύτερη ανταλλαγή ή φτάσει ≤5 iterations.
+# --------------------------
+# Cyclic exchange (A→B→C→…→A)
+# --------------------------
+# Γράφος βελτίωσης: κόμβος = (τμήμα, κάδος μονάδων ίδιου μεγέθους), με έναν αντιπρόσωπο ανά κάδο.
+# Ακμή u→v (διαφορετικά τμήματα): η μονάδα του u μπαίνει στο τμήμα του v και η μονάδα του v φεύγει
+# (προς τον επόμενο κόμβο του κύκλου). Ένας κύκλος με ΔΙΑΦΟΡΕΤΙΚΑ τμήματα και μονάδες ίδιου μεγέθους
+# κρατά τους πληθυσμούς αμετάβλητους, και κάθε τμήμα αλλάζει μόνο από τη δική του ακμή εισόδου.
+# Κόστος ακμής = μεταβολή του Σ x² (x = αγόρια/κορίτσια/καλή γνώση του τμήματος), ακριβής για τον κύκλο·
+# τα σύνολα δεν αλλάζουν, άρα αρνητικός κύκλος ⇔ μικρότερη διασπορά ανάμεσα στα τμήματα.
+
+_CYCLE_ATTRS = (1, 2, 3)   # boys, girls, good στο διάνυσμα του ClassBalance
+
+def _surrogate(state: Step6State) -> int:
+    return sum(state.bal.get(c, a) ** 2 for c in state.bal.classes for a in ("boys", "girls", "good"))
+
+def _cycle_nodes(state: Step6State) -> Dict[int, List[Tuple]]:
+    """{μέγεθος μονάδας: [(τμήμα, ids αντιπροσώπου, διάνυσμα), …]}"""
+    nodes: Dict[int, List[Tuple]] = {1: [], 2: []}
+    for c in state.bal.classes:
+        for ids in state.single_buckets(c):
+            nodes[1].append((c, [ids[0]], state.vector([ids[0]])[list(_CYCLE_ATTRS)]))
+        for ps in state.pair_buckets(c):
+            nodes[2].append((c, list(ps[0]["ids"]), state.vector(ps[0]["ids"])[list(_CYCLE_ATTRS)]))
+    return nodes
+
+def _negative_cycles(state: Step6State, nodes: List[Tuple], max_len: int) -> List[Tuple[int, Tuple]]:
     """
-    # --- Patched prologue ---
-    global _IDCOL
-    _IDCOL = id_col
+    Label-correcting αναζήτηση αρνητικών κύκλων με ξένα τμήματα (Thompson–Orlin):
+    σε κάθε επίπεδο k κρατάμε για κάθε κόμβο τη φθηνότερη διαδρομή k ακμών που δεν ξαναπερνά από τμήμα,
+    και κλείνουμε κύκλο προς την αρχή της. O(max_len · N²) ανά κλήση.
+    """
+    n = len(nodes)
+    if n < 2:
+        return []
+    x = {c: np.array([state.bal.get(c, a) for a in ("boys", "girls", "good")]) for c in state.bal.classes}
+    w = {}
+    for u, (cu, _, vu) in enumerate(nodes):
+        for v, (cv, _, vv) in enumerate(nodes):
+            if cu == cv:
+                continue
+            d = vu - vv
+            if d.any():
+                w[u, v] = int(2 * (x[cv] @ d) + d @ d)
+    out = {}
+    labels = {u: (0, (u,)) for u in range(n)}
+    for _ in range(1, max_len):
+        nxt = {}
+        for u, (cost, path) in labels.items():
+            used = {nodes[p][0] for p in path}
+            for v in range(n):
+                if nodes[v][0] in used or (u, v) not in w:
+                    continue
+                c2 = cost + w[u, v]
+                if (v, path[0]) in w:
+                    total = c2 + w[v, path[0]]
+                    if total < 0:
+                        cyc = path + (v,)
+                        k = cyc.index(min(cyc))
+                        cyc = cyc[k:] + cyc[:k]
+                        out[cyc] = total
+                if v not in nxt or c2 < nxt[v][0]:
+                    nxt[v] = (c2, path + (v,))
+        if not nxt:
+            break
+        labels = nxt
+    return sorted(((t, cyc) for cyc, t in out.items()), key=lambda tc: (tc[0], tc[1]))
+
+def _commit_best_cycle_if_improves(state: Step6State, swap_idx: int, max_len: Optional[int] = None) -> bool:
+    """
+    Εφαρμόζει τον καλύτερο κυκλικό μετασχηματισμό (μονάδες ίδιου μεγέθους, ≥2 τμήματα) που
+    μειώνει τη διασπορά ΧΩΡΙΣ να αυξάνει το penalty και τηρεί SIZE/FRIENDS/Δπληθ ≤2.
+    """
+    if state.bal is None:
+        return False
+    max_len = max_len or len(state.bal.classes)
+    base_pen = state.penalty()
+    for size, nodes in _cycle_nodes(state).items():
+        for total, cyc in _negative_cycles(state, nodes, max_len):
+            # κόμβος cyc[j] → τμήμα του cyc[j+1]
+            moves = [(nodes[u][1], nodes[u][0], nodes[cyc[(j + 1) % len(cyc)]][0]) for j, u in enumerate(cyc)]
+            size_ok, d, pen = state.evaluate_moves(moves)
+            if not size_ok or d["pop"] > TARGET_POP_DIFF or pen > base_pen:
+                continue
+            if not state.keeps_groups_moves(moves):
+                continue
+            state.apply_moves(moves, "Cycle", f"CYCLE_{swap_idx}")
+            return True
+    return False
+
+# --------------------------
+# Public API
+# --------------------------
+
+def _prepare_frame(df: pd.DataFrame, ctx: Step6Context) -> pd.DataFrame:
+    """Κοινός πρόλογος των μηχανών: snapshot «πριν», έλεγχος στηλών, στήλες audit."""
     # BEFORE snapshot for auditing
-    if "ΤΜΗΜΑ_ΠΡΙΝ_ΒΗΜΑ6" not in df.columns and class_col in df.columns:
-        df["ΤΜΗΜΑ_ΠΡΙΝ_ΒΗΜΑ6"] = df[class_col]
+    if "ΤΜΗΜΑ_ΠΡΙΝ_ΒΗΜΑ6" not in df.columns and ctx.class_col in df.columns:
+        df["ΤΜΗΜΑ_ΠΡΙΝ_ΒΗΜΑ6"] = df[ctx.class_col]
 
     # Έλεγχοι βασικών στηλών
-    for col in [id_col, class_col, gender_col, lang_col, step_col]:
+    for col in [ctx.id_col, ctx.class_col, ctx.gender_col, ctx.lang_col, ctx.step_col]:
         if col not in df.columns:
             raise ValueError(f"Λείπει η στήλη '{col}'.")
-    if group_col not in df.columns:
+    if ctx.group_col not in df.columns:
         df = df.copy()
-        df[group_col] = np.nan
+        df[ctx.group_col] = np.nan
 
     # Audit columns
     for c in ["ΒΗΜΑ6_ΚΙΝΗΣΗ", "ΑΙΤΙΑ_ΑΛΛΑΓΗΣ", "ΠΗΓΗ_ΒΗΜΑ"]:
         if c not in df.columns:
             df[c] = None
+    return df
 
-    # Iterations
-    iterations = 0
-    status = "VALID"
-    while iterations < max_iter:
-        iterations += 1
-        d = _metrics(df, class_col, gender_col, lang_col)["deltas"]
-        within_targets = (d["pop"] <= TARGET_POP_DIFF) and (d["gender"] <= TARGET_GENDER_DIFF) and (d["lang"] <= TARGET_LANG_DIFF)
-
-        # Triggers
-        if not within_targets:
-            if (d["gender"] <= TARGET_GENDER_DIFF) and (d["lang"] > TARGET_LANG_DIFF):
-                objective = "LANG"
-            elif (d["lang"] <= TARGET_LANG_DIFF) and (d["gender"] > TARGET_GENDER_DIFF):
-                objective = "GENDER"
-            else:
-                objective = "BOTH"
-        else:
-            # Εντός στόχων: προσπάθησε να μειώσεις περαιτέρω το penalty χωρίς να χαλάς τίποτα
-            objective = "BOTH"
-
-        df2, changed = _commit_best_swap_if_improves(df, class_col, gender_col, lang_col, step_col, group_col, objective, iterations)
-        if not changed:
-            # Δεν υπάρχει καλύτερη ανταλλαγή — τερματισμός
-            break
-        df = df2
+def _within_targets(d: Dict) -> bool:
+    return (d["pop"] <= TARGET_POP_DIFF) and (d["gender"] <= TARGET_GENDER_DIFF) and (d["lang"] <= TARGET_LANG_DIFF)
 
-    final_M = _metrics(df, class_col, gender_col, lang_col)
-    final_pen = penalty_score(df, class_col, gender_col, lang_col)
-    final_ok = (final_M["deltas"]["pop"] <= TARGET_POP_DIFF) and \
-               (final_M["deltas"]["gender"] <= TARGET_GENDER_DIFF) and \
-               (final_M["deltas"]["lang"] <= TARGET_LANG_DIFF)
-    if not final_ok:
-        status = "IMPOSSIBLE"
+def _finish(df: pd.DataFrame, ctx: Step6Context, iterations: int, final_M: Dict, final_pen: int) -> Dict:
+    """Κοινός επίλογος: summary + ρητές στήλες εξόδου του Βήματος 6."""
+    class_col = ctx.class_col
+    status = "VALID" if _within_targets(final_M["deltas"]) else "IMPOSSIBLE"
 
     summary = dict(
         iterations=iterations,
@@ -455,7 +723,6 @@ def apply_step6(df: pd.DataFrame,
     if "ΤΜΗΜΑ_ΜΕΤΑ_ΒΗΜΑ6" not in df.columns and class_col in df.columns:
         df["ΤΜΗΜΑ_ΜΕΤΑ_ΒΗΜΑ6"] = df[class_col]
     try:
-        import numpy as np
         df["ΜΕΤΑΒΟΛΗ_ΤΜΗΜΑΤΟΣ"] = np.where(
             df["ΤΜΗΜΑ_ΠΡΙΝ_ΒΗΜΑ6"].astype(str) == df["ΤΜΗΜΑ_ΜΕΤΑ_ΒΗΜΑ6"].astype(str),
             "STAY",
@@ -466,12 +733,236 @@ def apply_step6(df: pd.DataFrame,
     df["ΒΗΜΑ6_ΤΜΗΜΑ"] = df.get("ΤΜΗΜΑ_ΜΕΤΑ_ΒΗΜΑ6", df.get(class_col))
     # Scenario-specific ΒΗΜΑ6_ΣΕΝΑΡΙΟ_N__1 if we detect N from Step 5 columns
     scen_num = None
-    import re as _re
     for c in df.columns:
-        m = _re.match(r"ΒΗΜΑ5_ΣΕΝΑΡΙΟ_(\d+)__1$", str(c))
+        m = re.match(r"ΒΗΜΑ5_ΣΕΝΑΡΙΟ_(\d+)__1$", str(c))
         if m:
             scen_num = m.group(1)
             break
     if scen_num and f"ΒΗΜΑ6_ΣΕΝΑΡΙΟ_{scen_num}__1" not in df.columns:
         df[f"ΒΗΜΑ6_ΣΕΝΑΡΙΟ_{scen_num}__1"] = df["ΒΗΜΑ6_ΤΜΗΜΑ"]
-    return {"df": df, "summary": summary}
\ No newline at end of file
+    return {"df": df, "summary": summary}
+
+def apply_step6(df: pd.DataFrame,
+                *, class_col="ΤΜΗΜΑ", id_col="ID", gender_col="ΦΥΛΟ",
+                lang_col="ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ",
+                group_col="GROUP_ID", max_iter: int = MAX_ITER, cycles: bool = True,
+                skip_impossible: bool = False) -> Dict:
+    """
+    Εφαρμογή Βήματος 6 για N (≥2) τμήματα.
+    Κινήσεις ΜΟΝΟ μεταξύ Β4-δυάδων (αδιαίρετες) και Β5-μεμονωμένων.
+    Δεν αγγίζονται μαθητές Βημάτων 1–3.
+    Targets: Δπληθ ≤2, Δφύλου ≤3, Δγλώσσας ≤3.
+
+    Όταν οι αποκλίσεις είναι ήδη εντός στόχων (Δπληθ ≤2, Δφύλου ≤3, Γλώσσας ≤3),
+    ο αλγόριθμος δεν σταματά αμέσως· δοκιμάζει επιπλέον έγκυρες ανταλλαγές που:
+      • μειώνουν το συνολικό penalty,
+      • δεν χειροτερεύουν τον άλλο δείκτη (φύλο/γλώσσα),
+      • τηρούν SIZE_OK (≤25), FRIENDS_OK (δεν σπάει δυάδες), SCOPE_OK (μόνο Β4-δυάδες/Β5-μεμονωμένοι),
+      • δεν αυξάνουν τη διαφορά πληθυσμού (και πάντα κρατούν Δπληθ ≤2).
+    Όταν καμία ανταλλαγή ανά ζεύγος δεν βελτιώνει και cycles=True, δοκιμάζεται κυκλική ανταλλαγή
+    A→B→C→…→A (βλ. _commit_best_cycle_if_improves): μειώνει τη διασπορά χωρίς να αυξάνει το penalty,
+    άρα το ζεύγος (penalty, διασπορά) μειώνεται αυστηρά και ο βρόχος τερματίζει.
+    Σταματά όταν δεν υπάρχει καλύτερη ανταλλαγή ή φτάσει max_iter (MAX_ITER) iterations.
+
+    summary["bound"]: κάτω φράγματα των δ (βλ. step6_bound). Με skip_impossible=True, αν οι στόχοι είναι
+    αποδεδειγμένα ανέφικτοι, δεν γίνεται αναζήτηση: το df μένει ως έχει, status="IMPOSSIBLE", iterations=0.
+    """
+    # --- Patched prologue ---
+    ctx = Step6Context(class_col=class_col, id_col=id_col, gender_col=gender_col, lang_col=lang_col,
+                       step_col=step_col, group_col=group_col)
+    df = _prepare_frame(df, ctx)
+
+    # Iterations — πάνω στη μόνιμη κατάσταση· το df γράφεται μία φορά στο τέλος
+    state = Step6State(df, ctx)
+    bound = _bound_from_state(state)
+    if skip_impossible and not _within_targets(bound):
+        max_iter = 0
+    iterations = 0
+    while iterations < max_iter:
+        iterations += 1
+        d = state.metrics()["deltas"]
+        within_targets = _within_targets(d)
+
+        # Triggers
+        if not within_targets:
+            if (d["gender"] <= TARGET_GENDER_DIFF) and (d["lang"] > TARGET_LANG_DIFF):
+                objective = "LANG"
+            elif (d["lang"] <= TARGET_LANG_DIFF) and (d["gender"] > TARGET_GENDER_DIFF):
+                objective = "GENDER"
+            else:
+                objective = "BOTH"
+        else:
+            # Εντός στόχων: προσπάθησε να μειώσεις περαιτέρω το penalty χωρίς να χαλάς τίποτα
+            objective = "BOTH"
+
+        changed = _commit_best_swap_if_improves(state, objective, iterations)
+        if not changed and cycles and state.penalty() > 0:
+            changed = _commit_best_cycle_if_improves(state, iterations)
+        if not changed:
+            # Δεν υπάρχει καλύτερη ανταλλαγή — τερματισμός
+            break
+
+    df = state.write_back(df)
+    out = _finish(df, ctx, iterations, state.metrics(), state.penalty())
+    out["summary"]["bound"] = bound
+    return out
+
+def _violation(d: Dict) -> int:
+    """Πόσο απέχουν τα δ από τους στόχους (0 = εντός στόχων)."""
+    return (max(0, d["pop"] - TARGET_POP_DIFF) + max(0, d["gender"] - TARGET_GENDER_DIFF)
+            + max(0, d["lang"] - TARGET_LANG_DIFF))
+
+def _unit_keys(state: Step6State, ids) -> List:
+    """Κάδοι των μονάδων που μετακινούνται (μία φορά ανά δυάδα)."""
+    keys, seen = [], set()
+    for i in ids:
+        p = state.pair_of_id.get(i)
+        if p is not None:
+            if p["group_id"] not in seen:
+                seen.add(p["group_id"])
+                keys.append(("Β4",) + p["key"])
+        else:
+            keys.append(("Β5",) + state.single_key[i])
+    return keys
+
+def apply_step6_tabu(df: pd.DataFrame,
+                     *, class_col="ΤΜΗΜΑ", id_col="ID", gender_col="ΦΥΛΟ",
+                     lang_col="ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ",
+                     group_col="GROUP_ID", max_iter: int = TABU_MAX_ITER,
+                     time_budget: float = TABU_TIME_BUDGET, tenure: int = TABU_TENURE,
+                     skip_impossible: bool = False) -> Dict:
+    """
+    Εναλλακτική μηχανή Βήματος 6: tabu search στην ΙΔΙΑ γειτονιά ανταλλαγών (1↔1, 2↔2, 2↔1+1)
+    ανάμεσα σε ΟΛΑ τα ζεύγη τμημάτων, με τους ίδιους σκληρούς κανόνες (μόνο Β4-δυάδες/Β5-μεμονωμένοι,
+    δυάδες αδιαίρετες, ≤25 ανά τμήμα, Δπληθ ≤2 πάντα).
+    Σε κάθε βήμα εφαρμόζεται η καλύτερη μη-tabu ανταλλαγή ΑΚΟΜΗ κι αν χειροτερεύει προσωρινά το κόστος
+    (έτσι ξεφεύγει από τοπικά ελάχιστα). Κόστος = (απόσταση από στόχους, penalty), λεξικογραφικά.
+    Tabu: ένας κάδος που έφυγε από ένα τμήμα δεν ξαναμπαίνει εκεί για `tenure` βήματα, εκτός αν η κίνηση
+    δίνει νέο καλύτερο (aspiration).
+    Σταματά σε time_budget δευτερόλεπτα, max_iter βήματα, κόστος (0, 0) ή όταν δεν υπάρχει έγκυρη κίνηση,
+    και επιστρέφει την ΚΑΛΥΤΕΡΗ κατάσταση που βρέθηκε.
+    skip_impossible: όπως στο apply_step6.
+    Έξοδος: όπως το apply_step6, με επιπλέον "trace" (ένα dict ανά βήμα).
+    """
+    ctx = Step6Context(class_col=class_col, id_col=id_col, gender_col=gender_col, lang_col=lang_col,
+                       step_col=step_col, group_col=group_col)
+    df = _prepare_frame(df, ctx)
+    state = Step6State(df, ctx)
+    bound = _bound_from_state(state)
+    if skip_impossible and not _within_targets(bound):
+        max_iter = 0
+    deadline = time.monotonic() + float(time_budget)
+    n_classes = len(state.bal.classes) if state.bal is not None else 0
+
+    labels0 = state.labels.copy()
+    d = state.metrics()["deltas"]
+    cur = (_violation(d), state.penalty())
+    best, best_iter = cur, 0
+    snap = (state.labels.copy(), state.audit_move.copy(), state.audit_reason.copy(),
+            state.audit_src.copy(), state.moved.copy())
+    tabu: Dict = {}
+    trace = []
+    iterations = 0
+
+    while iterations < max_iter and best != (0, 0) and time.monotonic() < deadline:
+        iterations += 1
+        candidates = _enum_LANG(state, top_k=n_classes) + _enum_GENDER(state, top_k=n_classes)
+        choice = None
+        for (fromA, classA, fromB, classB, reason) in candidates:
+            size_ok, d, pen = state.evaluate(fromA, classA, fromB, classB)
+            if not size_ok or d["pop"] > TARGET_POP_DIFF:
+                continue
+            cost = (_violation(d), pen)
+            if choice is not None and cost >= choice[0]:
+                continue
+            entering = [(k, classB) for k in _unit_keys(state, fromA)] + [(k, classA) for k in _unit_keys(state, fromB)]
+            if any(tabu.get(m, 0) >= iterations for m in entering) and not cost < best:
+                continue
+            if not state.keeps_groups(fromA, classB, fromB, classA):
+                continue
+            choice = (cost, d, fromA, classA, fromB, classB, reason)
+        if choice is None:
+            break
+
+        cost, d, fromA, classA, fromB, classB, reason = choice
+        for k in _unit_keys(state, fromA):
+            tabu[(k, classA)] = iterations + tenure
+        for k in _unit_keys(state, fromB):
+            tabu[(k, classB)] = iterations + tenure
+        state.apply(fromA, classA, fromB, classB, reason, iterations)
+        cur = cost
+        if cur < best:
+            best, best_iter = cur, iterations
+            snap = (state.labels.copy(), state.audit_move.copy(), state.audit_reason.copy(),
+                    state.audit_src.copy(), state.moved.copy())
+        trace.append(dict(iteration=iterations, reason=reason, moved=len(fromA) + len(fromB),
+                          violation=cur[0], penalty=cur[1], deltas=d,
+                          best_violation=best[0], best_penalty=best[1]))
+
+    # Επαναφορά της καλύτερης κατάστασης· «μετακινημένοι» = όσοι κατέληξαν σε άλλο τμήμα
+    state.labels, state.audit_move, state.audit_reason, state.audit_src, moved = snap
+    state.moved = moved & (state.labels != labels0)
+    df = state.write_back(df)
+    bal = _balance(df, class_col, gender_col, lang_col)
+    out = _finish(df, ctx, iterations, _metrics_from_balance(bal), _penalty_from_balance(bal))
+    out["summary"]["best_iteration"] = best_iter
+    out["summary"]["bound"] = bound
+    out["trace"] = trace
+    return out
+
+ENGINES = {"hill": "apply_step6", "tabu": "apply_step6_tabu"}
+
+def _step6_task(name: str, df5: pd.DataFrame, kwargs: Dict, engine: str = "hill") -> Tuple[str, Dict]:
+    """Ένα σενάριο (top-level ώστε να εκτελείται σε worker διεργασία)."""
+    return name, globals()[ENGINES[engine]](df5.copy(), **kwargs)
+
+def apply_step6_to_step5_scenarios(step5_outputs: Dict[str, pd.DataFrame],
+                                   *, class_col="ΤΜΗΜΑ", id_col="ID", gender_col="ΦΥΛΟ",
+                                   lang_col="ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", step_col="ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ",
+                                   group_col="GROUP_ID", max_iter: Optional[int] = None,
+                                   workers: Optional[int] = 1, engine: str = "hill",
+                                   skip_impossible: bool = False) -> Dict[str, Dict]:
+    """
+    Adapter: Τρέχει το Βήμα 6 πάνω σε ΠΟΛΛΑ σενάρια που έρχονται από το Βήμα 5.
+    Είσοδος: dict { "ΣΕΝΑΡΙΟ_1": df5_1, "ΣΕΝΑΡΙΟ_2": df5_2, ... }
+    Έξοδος: dict με ίδια keys (ίδια σειρά) και values {"df": df6, "summary": {...}}
+    workers > 1 (ή None = #CPU): σενάρια σε pool διεργασιών. Το αποτέλεσμα είναι ντετερμινιστικό,
+    αφού κάθε σενάριο εξαρτάται μόνο από το δικό του df.
+    engine: "hill" (apply_step6) ή "tabu" (apply_step6_tabu)· max_iter=None → default της μηχανής.
+    skip_impossible=True: σενάρια με αποδεδειγμένα ανέφικτους στόχους επιστρέφονται χωρίς αναζήτηση.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Άγνωστη μηχανή Βήματος 6: '{engine}'.")
+    kwargs = dict(class_col=class_col, id_col=id_col, gender_col=gender_col, lang_col=lang_col,
+                  step_col=step_col, group_col=group_col, skip_impossible=skip_impossible)
+    if max_iter is not None:
+        kwargs["max_iter"] = max_iter
+    names = list(step5_outputs)
+    if workers is None:
+        workers = min(len(names), os.cpu_count() or 1)
+    if workers <= 1 or len(names) <= 1:
+        return dict(_step6_task(n, step5_outputs[n], kwargs, engine) for n in names)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        done = dict(ex.map(_step6_task, names, [step5_outputs[n] for n in names], [kwargs] * len(names),
+                           [engine] * len(names)))
+    return {n: done[n] for n in names}
+
+if __name__ == "__main__":
+    # Optional: quick smoke test with 3 classes
+    data = [
+        [1, "Α1", "Α", "Ν", 4, "G1"],
+        [2, "Α1", "Α", "Ν", 4, "G1"],
+        [3, "Α1", "Κ", "Ο", 5, None],
+        [4, "Α1", "Κ", "Ν", 5, None],
+
+        [5, "Β1", "Κ", "Ο", 4, "G2"],
+        [6, "Β1", "Κ", "Ο", 4, "G2"],
+        [7, "Β1", "Α", "Ν", 5, None],
+        [8, "Β1", "Α", "Ο", 5, None],
+
+        [9,  "Γ1", "Α", "Ν", 5, None],
+        [10, "Γ1", "Κ", "Ν", 5, None],
+    ]
+    df_ex = pd.DataFrame(data, columns=["ID", "ΤΜΗΜΑ", "ΦΥΛΟ", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΒΗΜΑ_ΤΟΠΟΘΕΤΗΣΗΣ", "GROUP_ID"])
+    res = apply_step6(df_ex)
+    print(res["summary"])
@@ -24,12 +24,18 @@ best = pick_best_scenario(df, ['ΒΗΜΑ6_ΣΕΝΑΡΙΟ_1','ΒΗΜΑ6_ΣΕΝΑ
 Αλλιώς, αν δεν δοθεί, ανιχνεύονται όλες οι *πλήρως αμοιβαίες δυάδες* από τη στήλη «ΦΙΛΟΙ».
 """
 from __future__ import annotations
+import hashlib
 import random
+import threading
+from collections import OrderedDict
 from typing import Iterable, List, Tuple, Dict, Any, Optional
 import pandas as pd
 import numpy as np
 import re
 
+from conflict_kernel import (pair_penalty as _pair_conflict_penalty, student_type, class_conflict_sum, conflict_sum,
+                             conflict_components, CONFLICT_WEIGHTS, ConflictCounter)
+
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 
@@ -109,22 +115,10 @@ def _good_greek_filter(row) -> bool:
     # fallback: not available → False
     return False
 
-def _pair_conflict_penalty(aZ, aI, bZ, bI) -> int:
-    if aI and bI: return 5
-    if (aI and bZ) or (bI and aZ): return 4
-    if aZ and bZ: return 3
-    return 0
-
 def _class_conflict_sum(class_df: pd.DataFrame) -> int:
-    s = 0
-    rows = class_df[['ΖΩΗΡΟΣ','ΙΔΙΑΙΤΕΡΟΤΗΤΑ']].fillna("").to_dict('records')
-    for i in range(len(rows)):
-        for j in range(i+1, len(rows)):
-            a = rows[i]; b = rows[j]
-            aZ = _is_yes(a.get('ΖΩΗΡΟΣ')); aI = _is_yes(a.get('ΙΔΙΑΙΤΕΡΟΤΗΤΑ'))
-            bZ = _is_yes(b.get('ΖΩΗΡΟΣ')); bI = _is_yes(b.get('ΙΔΙΑΙΤΕΡΟΤΗΤΑ'))
-            s += _pair_conflict_penalty(aZ, aI, bZ, bI)
-    return s
+    """Σ ποινών (3/4/5) όλων των ζευγών του τμήματος — κλειστή μορφή από τα πλήθη (Ζ, Ι) (conflict_kernel)."""
+    zi = class_df[['ΖΩΗΡΟΣ','ΙΔΙΑΙΤΕΡΟΤΗΤΑ']].fillna("")
+    return class_conflict_sum(student_type(z, i) for z, i in zip(zi['ΖΩΗΡΟΣ'].map(_is_yes), zi['ΙΔΙΑΙΤΕΡΟΤΗΤΑ'].map(_is_yes)))
 
 def _all_conflicts_sum(df: pd.DataFrame, scenario_col: str) -> int:
     s = 0
@@ -135,19 +129,17 @@ def _all_conflicts_sum(df: pd.DataFrame, scenario_col: str) -> int:
     return s
 
 def _mutual_pairs(df: pd.DataFrame) -> List[Tuple[str,str]]:
-    """Βρίσκει όλες τις *πλήρως αμοιβαίες* δυάδες από «ΦΙΛΟΙ»."""
+    """Βρίσκει όλες τις *πλήρως αμοιβαίες* δυάδες από «ΦΙΛΟΙ» — O(n·βαθμός), όχι O(n²)."""
     if "ΦΙΛΟΙ" not in df.columns:
         return []
+    names = df["ΟΝΟΜΑ"] if "ΟΝΟΜΑ" in df.columns else pd.Series([None] * len(df), index=df.index)
     name2friends = {}
-    for _, r in df.iterrows():
-        name = str(r.get("ΟΝΟΜΑ")).strip()
-        friends = set(_parse_friends_cell(r.get("ΦΙΛΟΙ")))
-        name2friends[name] = friends
+    for name, cell in zip(names.tolist(), df["ΦΙΛΟΙ"].tolist()):
+        name2friends[str(name).strip()] = set(_parse_friends_cell(cell))
     pairs = set()
-    names = sorted(name2friends.keys())
-    for i, a in enumerate(names):
-        for b in names[i+1:]:
-            if a in name2friends.get(b, set()) and b in name2friends.get(a, set()):
+    for a, fa in name2friends.items():
+        for b in fa:
+            if b != a and a in name2friends.get(b, ()):
                 pairs.add(tuple(sorted((a,b))))
     return sorted(pairs)
 
@@ -233,25 +225,300 @@ def score_one_scenario(df: pd.DataFrame, scenario_col: str, num_classes: Optiona
         "total_score": int(total),
     }
 
+# ------------------------ Batch scoring (πολλά σενάρια μαζί) ------------------------
+#
+# Ό,τι δεν εξαρτάται από το σενάριο υπολογίζεται ΜΙΑ φορά: φύλο / καλή γνώση / Ζ-Ι ως πίνακες, αμοιβαίες
+# δυάδες ως ζεύγη δεικτών γραμμών. Οι στήλες σεναρίων στοιβάζονται σε πίνακα κωδικών τμήματος
+# (μαθητές × σενάρια, int8) και όλοι οι μετρητές βγαίνουν με ένα np.bincount ανά χαρακτηριστικό.
+# Τα αποτελέσματα είναι ίδια με του score_one_scenario (ίδιοι κανόνες κανονικοποίησης).
+
+_CLASS_RE = re.compile(r"^Α\d+$")
+
+def _good_greek_mask(df: pd.DataFrame) -> np.ndarray:
+    """Διανυσματική εκδοχή του _good_greek_filter."""
+    if "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ" in df.columns:
+        return df["ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"].map(_is_yes).to_numpy(dtype=bool)
+    if "ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ" in df.columns:
+        return df["ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ"].map(lambda v: _norm_str(v) in {"ΚΑΛΗ", "Ν", "GOOD"}).to_numpy(dtype=bool)
+    return np.zeros(len(df), dtype=bool)
+
+def _pair_rows(df: pd.DataFrame, critical_pairs: Optional[List[Tuple[str,str]]]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """(γραμμές a, γραμμές b, #δυάδων με άγνωστο όνομα) — όπως το name2class του _broken_friendships_count."""
+    if critical_pairs is None:
+        pairs = _mutual_pairs(df)
+    else:
+        pairs = [tuple(sorted((str(a).strip(), str(b).strip()))) for a,b in critical_pairs]
+    row_of = {str(n).strip(): k for k, n in enumerate(df["ΟΝΟΜΑ"].tolist())}   # τελευταία εμφάνιση κερδίζει
+    ia, ib, missing = [], [], 0
+    for a, b in pairs:
+        if a in row_of and b in row_of:
+            ia.append(row_of[a]); ib.append(row_of[b])
+        else:
+            missing += 1
+    return np.asarray(ia, dtype=np.int64), np.asarray(ib, dtype=np.int64), missing
+
+def _score_block(df: pd.DataFrame, cols: List[str], num_classes: Optional[int],
+                 critical_pairs: Optional[List[Tuple[str,str]]],
+                 count_unassigned_as_broken: bool, conflict_split: Optional[List] = None) -> List[Dict[str, Any]]:
+    """Ο πυρήνας του score_scenarios_batch (χωρίς cache). conflict_split: λίστα που δέχεται (ΖΖ, ΖΙ, ΙΙ) ανά σενάριο."""
+    n, S = len(df), len(cols)
+
+    # --- Αναλλοίωτα του roster ---
+    gender = df["ΦΥΛΟ"].map(_norm_str).to_numpy() if "ΦΥΛΟ" in df.columns else np.full(n, "NONE", dtype=object)
+    weights = {"pop": np.ones(n, dtype=np.int64),
+               "boys": (gender == "Α").astype(np.int64),
+               "girls": (gender == "Κ").astype(np.int64),
+               "good": _good_greek_mask(df).astype(np.int64)}
+
+    # --- Ένα factorize για όλο το μπλοκ σεναρίων· οι κανόνες εφαρμόζονται ανά ΜΟΝΑΔΙΚΗ τιμή ---
+    raw = df[cols].to_numpy(dtype=object)
+    ucode, uniq = pd.factorize(raw.ravel())            # NaN/None → -1
+    ucode = ucode.reshape(n, S)
+    ustr = [str(u) for u in uniq]
+    is_label = np.array([bool(_CLASS_RE.match(t)) for t in ustr] + [False], dtype=bool)   # [-1] → False
+    labels = sorted({t for t, ok in zip(ustr, is_label) if ok})
+    pos = {lab: k for k, lab in enumerate(labels)}
+    L = max(len(labels), 1)
+    # «== lab» ταιριάζει μόνο σε strings (όπως το df[col] == lab του _counts_per_class)
+    lut = np.array([pos[t] if ok and isinstance(u, str) else -1 for u, t, ok in zip(uniq, ustr, is_label)] + [-1])
+    codes = lut[ucode].astype(np.int8 if L < 127 else np.int16)   # μαθητές × σενάρια
+    seen = np.zeros((S, len(uniq) + 1), dtype=bool)
+    seen[np.broadcast_to(np.arange(S), (n, S)), ucode] = True
+    col_labels = [sorted({ustr[u] for u in np.flatnonzero(seen[j, :-1] & is_label[:-1])}) for j in range(S)]
+
+    valid = codes >= 0
+    flat = (np.arange(S)[None, :] * L + codes.astype(np.int64))[valid]
+    rows = np.nonzero(valid)[0]
+    counts = {k: np.bincount(flat, weights=w[rows], minlength=S * L).astype(np.int64).reshape(S, L)
+              for k, w in weights.items()}
+
+    # --- Συγκρούσεις: πλήθη τύπων (κανένα/Ζ/Ι/Ζ+Ι) ανά (σενάριο, τμήμα) → κλειστή μορφή του conflict_kernel ---
+    conflicts = np.zeros(S, dtype=np.int64)
+    if labels:
+        zi = df[["ΖΩΗΡΟΣ", "ΙΔΙΑΙΤΕΡΟΤΗΤΑ"]].fillna("")
+        ctype = (zi["ΖΩΗΡΟΣ"].map(_is_yes).to_numpy(dtype=np.int64)
+                 | (zi["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].map(_is_yes).to_numpy(dtype=np.int64) << 1))
+        nt = np.bincount(flat * 4 + ctype[rows], minlength=S * L * 4).reshape(S, L, 4)
+        conflicts = conflict_sum(nt[..., 1], nt[..., 2], nt[..., 3]).sum(axis=1)
+        if conflict_split is not None:
+            conflict_split.extend(np.stack([c.sum(axis=1) for c in conflict_components(nt[..., 1], nt[..., 2], nt[..., 3])],
+                                           axis=1).tolist())
+    elif conflict_split is not None:
+        conflict_split.extend([[0, 0, 0]] * S)
+
+    # --- Σπασμένες φιλίες: σύγκριση str(τμήματος) ανά ζεύγος γραμμών, για όλα τα σενάρια μαζί ---
+    ia, ib, missing = _pair_rows(df, critical_pairs)
+    broken = np.zeros(S, dtype=np.int64)
+    if len(ia) or missing:
+        slut = np.append(pd.factorize(np.array(ustr, dtype=object))[0], -1) if ustr else np.array([-1])
+        scodes = slut[ucode]                            # ίδιο str(τμήμα) ⇔ ίδιος κωδικός, NaN → -1
+        A, B = scodes[ia], scodes[ib]
+        unassigned = (A < 0) | (B < 0)
+        broken = (~unassigned & (A != B)).sum(axis=0)
+        if count_unassigned_as_broken:
+            broken = broken + unassigned.sum(axis=0) + missing
+
+    # --- max−min ανά σενάριο μόνο στα τμήματα που εμφανίζονται στη στήλη ---
+    present = np.zeros((S, L), dtype=bool)
+    for j, labs in enumerate(col_labels):
+        present[j, [pos[lab] for lab in labs]] = True
+    has = present.any(axis=1)
+    diffs = {k: np.where(has, np.where(present, m, np.iinfo(np.int64).min).max(axis=1)
+                         - np.where(present, m, np.iinfo(np.int64).max).min(axis=1), 0)
+             for k, m in counts.items()}
+
+    out = []
+    for j, c in enumerate(cols):
+        idx = [pos[lab] for lab in col_labels[j]]
+        per = {k: dict(zip(col_labels[j], m[j, idx].tolist())) for k, m in counts.items()}
+        diff = {k: int(d[j]) for k, d in diffs.items()}
+        population_penalty = max(0, diff["pop"] - 1) * 3
+        gender_penalty = max(0, diff["boys"] - 1) * 2 + max(0, diff["girls"] - 1) * 2
+        greek_penalty = max(0, diff["good"] - 2) * 1
+        conflict_penalty = int(conflicts[j])
+        b = int(broken[j])
+        total = population_penalty + gender_penalty + greek_penalty + conflict_penalty + 5 * b
+        out.append({
+            "scenario_col": c,
+            "num_classes": num_classes if num_classes is not None else (len(col_labels[j]) or 2),
+            "population_counts": per["pop"],
+            "boys_counts": per["boys"],
+            "girls_counts": per["girls"],
+            "good_greek_counts": per["good"],
+            "diff_population": diff["pop"],
+            "diff_gender": max(diff["boys"], diff["girls"]),
+            "diff_greek": diff["good"],
+            "population_penalty": int(population_penalty),
+            "gender_penalty": int(gender_penalty),
+            "greek_penalty": int(greek_penalty),
+            "conflict_penalty": conflict_penalty,
+            "broken_friendships": b,
+            "broken_friendships_penalty": 5 * b,
+            "total_score": int(total),
+        })
+    return out
+
+# ------------------------ Score cache (ίδια ανάθεση → ίδιο score) ------------------------
+#
+# Σενάρια από διαφορετικούς κλάδους των Βημάτων 1/2 συχνά καταλήγουν στην ΙΔΙΑ ανάθεση μετά τα Βήματα 5–6,
+# συχνά με άλλα ονόματα τμημάτων (Α1↔Α2). Όλα τα μεγέθη του score πλην των μετρητών ανά label είναι
+# αναλλοίωτα σε μετάθεση labels, άρα κλειδί = (roster, κανονική ανάθεση, επιλογές):
+#   - κανονική ανάθεση: τιμές της στήλης → κωδικοί με σειρά ΠΡΩΤΗΣ εμφάνισης (ίδιοι για κάθε μετάθεση)
+#   - roster_fingerprint: hash των στηλών που διαβάζει το score (ΟΝΟΜΑ, ΦΥΛΟ, γνώση, Ζ/Ι, ΦΙΛΟΙ)
+# Αποθηκεύεται η κανονική μορφή (μετρητές ανά κωδικό) και στο hit ξαναγράφεται με τα labels της στήλης.
+
+_ROSTER_COLS = ("ΟΝΟΜΑ", "ΦΥΛΟ", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΖΩΗΡΟΣ", "ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "ΦΙΛΟΙ")
+_COUNT_KEYS = ("population_counts", "boys_counts", "girls_counts", "good_greek_counts")
+
+def roster_fingerprint(df: pd.DataFrame) -> str:
+    """Hash (hex) των στηλών του roster που επηρεάζουν το score, με τη σειρά των γραμμών."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(len(df)).encode())
+    for c in _ROSTER_COLS:
+        if c in df.columns:
+            h.update(c.encode())
+            h.update(pd.util.hash_pandas_object(df[c].map(str), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _assignment_keys(df: pd.DataFrame, cols: List[str]) -> List[Tuple[bytes, Dict[str, int]]]:
+    """Ανά στήλη: (κλειδί κανονικής ανάθεσης, label → κανονικός κωδικός)."""
+    raw = df[cols].to_numpy(dtype=object)
+    na = pd.isna(raw)
+    sc, sstr = pd.factorize(np.where(na, None, raw.astype(str)).ravel())
+    sc = sc.reshape(raw.shape)
+    # είδος τιμής: 0 = άλλη, 1 = label τμήματος (μετράει στο «== lab» μόνο αν είναι string), 3 = NaN
+    kind = np.array([int(bool(_CLASS_RE.match(t))) for t in sstr] + [3], dtype=np.int8)
+    all_str = np.array([isinstance(v, str) for v in raw[~na]]).all() if (~na).any() else True
+    out = []
+    for j in range(len(cols)):
+        canon, first = pd.factorize(sc[:, j])
+        h = hashlib.blake2b(canon.astype(np.int32).tobytes(), digest_size=16)
+        h.update(kind[first].tobytes())
+        h.update(b"s" if all_str else b"o")
+        out.append((h.digest(), {sstr[u]: k for k, u in enumerate(first) if u >= 0}))
+    return out
+
+class ScoreCache:
+    """LRU cache για τα αποτελέσματα του Βήματος 7, με μετρητές hits/misses (thread-safe)."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = int(maxsize)
+        self._data: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            val = self._data.get(key)
+            if val is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return val
+
+    def put(self, key, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+SCORE_CACHE = ScoreCache()
+
+def _to_canonical(score: Dict[str, Any], relabel: Dict[str, int]) -> Dict[str, Any]:
+    out = {k: v for k, v in score.items() if k != "scenario_col"}
+    for k in _COUNT_KEYS:
+        out[k] = {relabel[lab]: v for lab, v in score[k].items()}
+    return out
+
+def _from_canonical(entry: Dict[str, Any], scenario_col: str, relabel: Dict[str, int]) -> Dict[str, Any]:
+    inv = {k: lab for lab, k in relabel.items()}
+    out = {"scenario_col": scenario_col}
+    for k, v in entry.items():
+        out[k] = dict(sorted((inv[c], x) for c, x in v.items())) if k in _COUNT_KEYS else v
+    return out
+
+def score_scenarios_batch(df: pd.DataFrame, scenario_cols: List[str], num_classes: Optional[int]=None,
+                          critical_pairs: Optional[List[Tuple[str,str]]]=None,
+                          count_unassigned_as_broken: bool=False,
+                          cache: Optional[ScoreCache]=SCORE_CACHE) -> List[Dict[str, Any]]:
+    """
+    Βαθμολογεί ΟΛΕΣ τις στήλες scenario_cols (όσες υπάρχουν στο df) σε ένα πέρασμα.
+    Επιστρέφει λίστα dict, ένα ανά στήλη με τη σειρά του scenario_cols — ίδια με score_one_scenario.
+    num_classes=None → συμπεραίνεται ανά στήλη (όπως στο score_one_scenario).
+    cache: ScoreCache (default SCORE_CACHE)· None → χωρίς cache. Υπολογίζονται μόνο τα misses.
+    """
+    cols = [c for c in scenario_cols if c in df.columns]
+    if not cols:
+        return []
+    if cache is None:
+        return _score_block(df, cols, num_classes, critical_pairs, count_unassigned_as_broken)
+
+    opts = (num_classes,
+            None if critical_pairs is None else tuple(tuple(str(x) for x in p) for p in critical_pairs),
+            bool(count_unassigned_as_broken))
+    fp = roster_fingerprint(df)
+    akeys = _assignment_keys(df, cols)
+    out: List[Optional[Dict[str, Any]]] = [None] * len(cols)
+    miss: Dict[bytes, List[int]] = {}      # ίδια ανάθεση μέσα στο ίδιο batch → υπολογίζεται μία φορά
+    for j, (c, (akey, relabel)) in enumerate(zip(cols, akeys)):
+        if akey in miss:
+            miss[akey].append(j)
+            continue
+        hit = cache.get((fp, akey, opts))
+        if hit is None:
+            miss[akey] = [j]
+        else:
+            out[j] = _from_canonical(hit, c, relabel)
+    if miss:
+        first = [js[0] for js in miss.values()]
+        fresh = _score_block(df, [cols[j] for j in first], num_classes, critical_pairs, count_unassigned_as_broken)
+        for js, sc in zip(miss.values(), fresh):
+            akey, relabel = akeys[js[0]]
+            entry = _to_canonical(sc, relabel)
+            cache.put((fp, akey, opts), entry)
+            out[js[0]] = sc
+            for j in js[1:]:
+                out[j] = _from_canonical(entry, cols[j], akeys[j][1])
+    return out
+
 def pick_best_scenario(df: pd.DataFrame, scenario_cols: List[str], num_classes: Optional[int]=None,
                        critical_pairs: Optional[List[Tuple[str,str]]]=None,
                        count_unassigned_as_broken: bool=False,
-                       k_best: int=1, random_seed: int=42) -> Dict[str, Any]:
+                       k_best: int=1, random_seed: int=42,
+                       cache: Optional[ScoreCache]=SCORE_CACHE, mode: str="total") -> Dict[str, Any]:
     """Βαθμολογεί και επιλέγει βέλτιστο σενάριο με ιεραρχία:
        1) χαμηλότερο total_score
        2) μικρότερη diff_population
        3) μικρότερη diff_gender
        4) μικρότερη diff_greek
        5) τυχαία επιλογή μεταξύ ισάξιων
+    mode="pareto": επιπλέον κλειδί "pareto" με τα μη-κυριαρχούμενα σενάρια (pareto_front)·
+    το "best" ανήκει πάντα σε αυτά.
     """
+    if mode not in ("total", "pareto"):
+        raise ValueError(f"Άγνωστο mode '{mode}' (αναμένεται 'total' ή 'pareto').")
     if num_classes is None and scenario_cols:
         num_classes = _infer_num_classes_from_values(df[scenario_cols[0]].values)
 
-    scores = [score_one_scenario(df, c, num_classes, critical_pairs, count_unassigned_as_broken)
-              for c in scenario_cols if c in df.columns]
+    scores = score_scenarios_batch(df, scenario_cols, num_classes, critical_pairs, count_unassigned_as_broken,
+                                   cache=cache)
 
     if not scores:
-        return {"best": None, "scores": []}
+        return {"best": None, "scores": []} if mode == "total" else {"best": None, "scores": [], "pareto": []}
 
     # Ταξινόμηση με βάση την ιεραρχία
     scores_sorted = sorted(
@@ -273,16 +540,445 @@ def pick_best_scenario(df: pd.DataFrame, scenario_cols: List[str], num_classes:
     random.seed(random_seed)
     best = random.choice(top)
 
+    if mode == "pareto":
+        return {"best": best, "scores": scores_sorted[:max(k_best,1)], "pareto": pareto_front(scores_sorted)}
     return {"best": best, "scores": scores_sorted[:max(k_best,1)]}
 
+# ------------------------ Pareto skyline ------------------------
+#
+# Αντί για ένα total_score: τα σενάρια που δεν κυριαρχούνται στις πέντε ποινές. Το total_score είναι το
+# άθροισμά τους, άρα με ταξινόμηση κατά άθροισμα (Sort-Filter-Skyline) κάθε «κυρίαρχο» σενάριο έρχεται
+# ΠΡΙΝ από όσα κυριαρχεί· ένα πέρασμα με σύγκριση μόνο με το τρέχον skyline αρκεί.
+
+PARETO_KEYS = ("population_penalty", "gender_penalty", "greek_penalty", "conflict_penalty",
+               "broken_friendships_penalty")
+
+def pareto_front(scores: List[Dict[str, Any]], keys: Tuple[str, ...] = PARETO_KEYS) -> List[Dict[str, Any]]:
+    """
+    Μη-κυριαρχούμενα scores (μικρότερο = καλύτερο σε κάθε key). Ίσα διανύσματα κρατιούνται όλα.
+    Σειρά εξόδου: αύξον άθροισμα των keys, μετά λεξικογραφικά, μετά αρχική σειρά.
+    """
+    if not scores:
+        return []
+    M = np.array([[s[k] for k in keys] for s in scores], dtype=np.int64)
+    order = np.lexsort(tuple(M[:, ::-1].T) + (M.sum(axis=1),))
+    sky = np.empty_like(M)
+    front: List[int] = []
+    for p in order:
+        W = sky[:len(front)]
+        if len(front) and ((W <= M[p]).all(axis=1) & (W < M[p]).any(axis=1)).any():
+            continue
+        sky[len(front)] = M[p]
+        front.append(int(p))
+    return [scores[p] for p in front]
+
+# ------------------------ What-if: αυξητικό score ενός σεναρίου ------------------------
+
+class ScenarioScore:
+    """
+    Score ενός σεναρίου με αυξητικές ενημερώσεις, για χειροκίνητες διορθώσεις:
+    move(μαθητής, τμήμα) / swap(α, β) / undo() ενημερώνουν ΟΛΑ τα μεγέθη του score_one_scenario
+    σε O(βαθμός φιλιών) — μετρητές ανά τμήμα, ConflictCounter (Ζ/Ι) και κατάσταση ανά αμοιβαία δυάδα —
+    και το score() κοστίζει O(#τμημάτων). Κανένα αντίγραφο του DataFrame.
+
+    score() == score_one_scenario(df με την τρέχουσα ανάθεση, scenario_col, ...).
+    Μαθητής = ΟΝΟΜΑ· γραμμές με ίδιο όνομα μετακινούνται μαζί. Τμήμα None/NaN = «χωρίς τμήμα».
+    """
+
+    def __init__(self, df: pd.DataFrame, scenario_col: str, num_classes: Optional[int]=None,
+                 critical_pairs: Optional[List[Tuple[str,str]]]=None,
+                 count_unassigned_as_broken: bool=False):
+        n = len(df)
+        self.scenario_col = scenario_col
+        self._index = df.index
+        self._num_classes = num_classes
+        self._count_unassigned = bool(count_unassigned_as_broken)
+        self._val: List[Any] = df[scenario_col].tolist()
+        self._rows_of: Dict[str, List[int]] = {}
+        for k, nm in enumerate(df["ΟΝΟΜΑ"].tolist()):
+            self._rows_of.setdefault(str(nm).strip(), []).append(k)
+
+        gender = df["ΦΥΛΟ"].map(_norm_str).to_numpy() if "ΦΥΛΟ" in df.columns else np.full(n, "NONE", dtype=object)
+        self._vec = np.stack([np.ones(n, dtype=np.int64), gender == "Α", gender == "Κ", _good_greek_mask(df)],
+                             axis=1).astype(np.int64).tolist()
+        zi = df[["ΖΩΗΡΟΣ", "ΙΔΙΑΙΤΕΡΟΤΗΤΑ"]].fillna("")
+        self._type = [student_type(z, i) for z, i in zip(zi["ΖΩΗΡΟΣ"].map(_is_yes), zi["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].map(_is_yes))]
+
+        # Μετρητές ανά τμήμα: παρουσία label (όπως _counts_per_class), [πληθ, αγ, κορ, καλή] και Ζ/Ι
+        self._present: Dict[str, int] = {}
+        self._cnt: Dict[str, List[int]] = {}
+        self._conf = ConflictCounter()
+        for k in range(n):
+            self._add_row(k, +1)
+
+        # Αμοιβαίες δυάδες (ή critical_pairs) → κατάσταση ανά δυάδα, ευρετήριο ανά όνομα
+        if critical_pairs is None:
+            pairs = _mutual_pairs(df)
+        else:
+            pairs = [tuple(sorted((str(a).strip(), str(b).strip()))) for a, b in critical_pairs]
+        self._pairs = [(a, b) for a, b in pairs if a in self._rows_of and b in self._rows_of]
+        self._missing = len(pairs) - len(self._pairs)
+        self._inc: Dict[str, List[int]] = {}
+        for p, (a, b) in enumerate(self._pairs):
+            self._inc.setdefault(a, []).append(p)
+            self._inc.setdefault(b, []).append(p)
+        self._broken = self._unassigned = 0
+        for p in range(len(self._pairs)):
+            self._pair_status(p, +1)
+        self.history: List[List[Tuple[str, List[Any]]]] = []
+
+    @classmethod
+    def from_auto(cls, df: pd.DataFrame, scenario_col: str | None = None, **kwargs) -> "ScenarioScore":
+        """Με την κανονικοποίηση του score_one_scenario_auto (στήλη, Α/A labels, προαιρετικές στήλες)."""
+        df = df.copy()
+        if scenario_col is None:
+            scenario_col = _find_scenario_col_auto(df)
+        if scenario_col is None:
+            raise ValueError("Δεν βρέθηκε κατάλληλη στήλη τμήματος για το Βήμα 7.")
+        _normalize_class_labels(df, scenario_col)
+        _ensure_optional_cols(df)
+        return cls(df, scenario_col, **kwargs)
+
+    # ---- εσωτερικές ενημερώσεις ----
+    @staticmethod
+    def _label(v) -> Optional[str]:
+        if v is None or (not isinstance(v, str) and pd.isna(v)):
+            return None
+        t = str(v)
+        return t if _CLASS_RE.match(t) else None
+
+    def _add_row(self, k: int, sign: int) -> None:
+        v = self._val[k]
+        lab = self._label(v)
+        if lab is None:
+            return
+        left = self._present.get(lab, 0) + sign
+        if left:
+            self._present[lab] = left
+        else:
+            del self._present[lab]
+        if isinstance(v, str):                                  # «df[col] == lab» μετρά μόνο strings
+            row = self._cnt.setdefault(lab, [0, 0, 0, 0])
+            for q, x in enumerate(self._vec[k]):
+                row[q] += sign * x
+        if sign > 0:
+            self._conf.add(lab, self._type[k])
+        else:
+            self._conf.remove(lab, self._type[k])
+
+    def _class_of_name(self, name: str):
+        return self._val[self._rows_of[name][-1]]                # τελευταία εμφάνιση, όπως το name2class
+
+    def _pair_status(self, p: int, sign: int) -> None:
+        a, b = self._pairs[p]
+        ca, cb = self._class_of_name(a), self._class_of_name(b)
+        if pd.isna(ca) or pd.isna(cb):
+            self._unassigned += sign
+        elif str(ca) != str(cb):
+            self._broken += sign
+
+    def _set_rows(self, name: str, values: List[Any]) -> None:
+        inc = self._inc.get(name, ())
+        for p in inc:
+            self._pair_status(p, -1)
+        for k, v in zip(self._rows_of[name], values):
+            self._add_row(k, -1)
+            self._val[k] = v
+            self._add_row(k, +1)
+        for p in inc:
+            self._pair_status(p, +1)
+
+    def _rows(self, name: str) -> List[int]:
+        key = str(name).strip()
+        if key not in self._rows_of:
+            raise ValueError(f"Άγνωστος μαθητής '{name}'.")
+        return self._rows_of[key]
+
+    # ---- what-if ----
+    def move(self, student: str, to_class) -> Dict[str, Any]:
+        """Μετακινεί τον μαθητή στο to_class και επιστρέφει το νέο score."""
+        key = str(student).strip()
+        rows = self._rows(key)
+        self.history.append([(key, [self._val[k] for k in rows])])
+        self._set_rows(key, [to_class] * len(rows))
+        return self.score()
+
+    def swap(self, a: str, b: str) -> Dict[str, Any]:
+        """Ανταλλάσσει τα τμήματα δύο μαθητών (μία κίνηση για το undo)."""
+        ka, kb = str(a).strip(), str(b).strip()
+        ra, rb = self._rows(ka), self._rows(kb)
+        ca, cb = self._class_of_name(ka), self._class_of_name(kb)
+        self.history.append([(ka, [self._val[k] for k in ra]), (kb, [self._val[k] for k in rb])])
+        self._set_rows(ka, [cb] * len(ra))
+        self._set_rows(kb, [ca] * len(rb))
+        return self.score()
+
+    def undo(self) -> Dict[str, Any]:
+        """Αναιρεί την τελευταία move/swap."""
+        if not self.history:
+            raise ValueError("Δεν υπάρχει κίνηση για αναίρεση.")
+        for name, values in reversed(self.history.pop()):
+            self._set_rows(name, values)
+        return self.score()
+
+    # ---- queries ----
+    def class_of(self, student: str):
+        self._rows(student)
+        return self._class_of_name(str(student).strip())
+
+    def students(self) -> List[str]:
+        return list(self._rows_of)
+
+    def classes(self) -> List[str]:
+        return sorted(self._present)
+
+    def assignment(self) -> pd.Series:
+        return pd.Series(self._val, index=self._index, name=self.scenario_col, dtype=object)
+
+    def score(self) -> Dict[str, Any]:
+        labels = sorted(self._present)
+        zero = [0, 0, 0, 0]
+        per = [{lab: int(self._cnt.get(lab, zero)[q]) for lab in labels} for q in range(4)]
+        diff = [(max(d.values()) - min(d.values())) if d else 0 for d in per]
+        population_penalty = max(0, diff[0] - 1) * 3
+        gender_penalty = max(0, diff[1] - 1) * 2 + max(0, diff[2] - 1) * 2
+        greek_penalty = max(0, diff[3] - 2) * 1
+        conflict_penalty = sum(self._conf.class_sum(lab) for lab in labels)
+        broken = self._broken + ((self._unassigned + self._missing) if self._count_unassigned else 0)
+        total = population_penalty + gender_penalty + greek_penalty + conflict_penalty + 5 * broken
+        return {
+            "scenario_col": self.scenario_col,
+            "num_classes": self._num_classes if self._num_classes is not None else (len(labels) or 2),
+            "population_counts": per[0],
+            "boys_counts": per[1],
+            "girls_counts": per[2],
+            "good_greek_counts": per[3],
+            "diff_population": int(diff[0]),
+            "diff_gender": int(max(diff[1], diff[2])),
+            "diff_greek": int(diff[3]),
+            "population_penalty": int(population_penalty),
+            "gender_penalty": int(gender_penalty),
+            "greek_penalty": int(greek_penalty),
+            "conflict_penalty": int(conflict_penalty),
+            "broken_friendships": int(broken),
+            "broken_friendships_penalty": int(5 * broken),
+            "total_score": int(total),
+        }
+
+# ------------------------ Ευαισθησία βαρών ------------------------
+#
+# Το total_score είναι ΓΡΑΜΜΙΚΟ στα βάρη: total = Σ_k w_k · component_k, με components ανά σενάριο
+#   population_excess = max(0, Δπληθ−1)          (w=3)
+#   gender_excess     = Σ max(0, Δαγ/κορ −1)     (w=2)
+#   greek_excess      = max(0, Δγνώσης−2)        (w=1)
+#   conflict_zz / _zi / _ii = #ζευγών Ζ–Ζ / Ζ–Ι / Ι–Ι στο ίδιο τμήμα (w=3/4/5)
+#   broken_friendships                            (w=5)
+# Ο πίνακας (σενάρια × components) υπολογίζεται ΜΙΑ φορά· χιλιάδες διανύσματα βαρών = ένα γινόμενο πινάκων.
+
+COMPONENTS = ("population_excess", "gender_excess", "greek_excess",
+              "conflict_zz", "conflict_zi", "conflict_ii", "broken_friendships")
+DEFAULT_WEIGHTS = (3, 2, 1) + CONFLICT_WEIGHTS + (5,)
+
+def score_components(df: pd.DataFrame, scenario_cols: List[str], num_classes: Optional[int]=None,
+                     critical_pairs: Optional[List[Tuple[str,str]]]=None,
+                     count_unassigned_as_broken: bool=False) -> pd.DataFrame:
+    """
+    Πίνακας components (index = στήλες σεναρίων, στήλες = COMPONENTS) + diff_population/diff_gender/diff_greek
+    για το tie-break. Με DEFAULT_WEIGHTS: components @ w == total_score του score_one_scenario.
+    """
+    cols = [c for c in scenario_cols if c in df.columns]
+    split: List = []
+    scores = _score_block(df, cols, num_classes, critical_pairs, count_unassigned_as_broken, conflict_split=split)
+    rows = []
+    for sc, (zz, zi, ii) in zip(scores, split):
+        rows.append({
+            "population_excess": sc["population_penalty"] // 3,
+            "gender_excess": sc["gender_penalty"] // 2,
+            "greek_excess": sc["greek_penalty"],
+            "conflict_zz": zz, "conflict_zi": zi, "conflict_ii": ii,
+            "broken_friendships": sc["broken_friendships"],
+            "diff_population": sc["diff_population"],
+            "diff_gender": sc["diff_gender"],
+            "diff_greek": sc["diff_greek"],
+        })
+    return pd.DataFrame(rows, index=pd.Index(cols, name="SCENARIO"),
+                        columns=list(COMPONENTS) + ["diff_population", "diff_gender", "diff_greek"])
+
+def perturbed_weights(n: int, spread: float = 0.5, base=DEFAULT_WEIGHTS, seed: int = RANDOM_SEED) -> np.ndarray:
+    """n διανύσματα βαρών: base · U(1−spread, 1+spread) ανά component (πρώτη γραμμή = base)."""
+    rng = np.random.default_rng(seed)
+    w = np.asarray(base, dtype=float) * rng.uniform(1 - spread, 1 + spread, size=(n, len(base)))
+    if n:
+        w[0] = base
+    return w
+
+def _winners(totals: np.ndarray, tie_rank: np.ndarray) -> np.ndarray:
+    """Νικητής ανά γραμμή: ελάχιστο total, ισοπαλία → μικρότερο tie_rank (diff πληθ → φύλου → γνώσης → σειρά)."""
+    best = totals.min(axis=1, keepdims=True)
+    return np.where(np.isclose(totals, best), tie_rank[None, :], len(tie_rank)).argmin(axis=1)
+
+def weight_sweep(components: pd.DataFrame, weights, base=DEFAULT_WEIGHTS) -> Dict[str, Any]:
+    """
+    Αξιολογεί ΟΛΑ τα διανύσματα βαρών (W × K, στη σειρά των COMPONENTS) σε ένα γινόμενο πινάκων.
+    Επιστρέφει:
+      totals  : W × S πίνακας συνολικών score
+      winner  : νικητής ανά διάνυσμα βαρών (όνομα σεναρίου)
+      wins    : πόσες φορές κερδίζει κάθε σενάριο (και share)
+      flips   : τα διανύσματα βαρών όπου ο νικητής ΔΙΑΦΕΡΕΙ από αυτόν με τα base βάρη
+      baseline: νικητής με τα base βάρη
+    Οι ισοπαλίες λύνονται όπως στο pick_best_scenario (χωρίς το τυχαίο τελευταίο βήμα: σειρά στηλών).
+    """
+    names = list(components.index)
+    C = components[list(COMPONENTS)].to_numpy(dtype=float)
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    if W.shape[1] != len(COMPONENTS):
+        raise ValueError(f"Αναμένονται {len(COMPONENTS)} βάρη ανά διάνυσμα ({', '.join(COMPONENTS)}).")
+    order = np.lexsort((np.arange(len(names)), components["diff_greek"].to_numpy(),
+                        components["diff_gender"].to_numpy(), components["diff_population"].to_numpy()))
+    tie_rank = np.empty(len(names), dtype=np.int64)
+    tie_rank[order] = np.arange(len(names))
+
+    totals = W @ C.T
+    win = _winners(totals, tie_rank)
+    base_win = int(_winners(np.asarray(base, dtype=float)[None, :] @ C.T, tie_rank)[0])
+    counts = np.bincount(win, minlength=len(names))
+    wins = pd.DataFrame({"wins": counts, "share": counts / max(len(W), 1)}, index=components.index)
+    flip_idx = np.flatnonzero(win != base_win)
+    flips = pd.DataFrame(W[flip_idx], columns=list(COMPONENTS))
+    flips.insert(0, "winner", [names[k] for k in win[flip_idx]])
+    flips.index = pd.Index(flip_idx, name="weight_vector")
+    return {"totals": totals, "winner": [names[k] for k in win], "wins": wins.sort_values("wins", ascending=False),
+            "flips": flips, "baseline": names[base_win]}
+
+def flip_points(components: pd.DataFrame, component: str, values, base=DEFAULT_WEIGHTS) -> pd.DataFrame:
+    """
+    Σάρωση ενός βάρους (τα υπόλοιπα = base): για κάθε τιμή ο νικητής, και οι τιμές όπου ο νικητής αλλάζει.
+    Επιστρέφει DataFrame (weight, winner, flip=True στο πρώτο σημείο κάθε αλλαγής).
+    """
+    if component not in COMPONENTS:
+        raise ValueError(f"Άγνωστο component '{component}'.")
+    values = np.asarray(list(values), dtype=float)
+    W = np.tile(np.asarray(base, dtype=float), (len(values), 1))
+    W[:, COMPONENTS.index(component)] = values
+    winner = weight_sweep(components, W, base=base)["winner"]
+    flip = [False] + [a != b for a, b in zip(winner[1:], winner[:-1])]
+    return pd.DataFrame({"weight": values, "winner": winner, "flip": flip})
+
+# ------------------------ Κάτω φράγμα score από το roster ------------------------
+#
+# Για ΚΑΘΕ πλήρη ανάθεση των μαθητών σε num_classes τμήματα (≤ MAX_PER_CLASS το καθένα) ισχύει
+# total_score ≥ score_lower_bound(...)["total_score"]. Κάθε όρος φράσσεται χωριστά (το άθροισμα των
+# ελαχίστων είναι ≤ του ελαχίστου του αθροίσματος):
+#   - πληθυσμός / φύλο / γνώση: Δ ≥ 1 αν το πλήθος δεν διαιρείται με τα τμήματα, αλλιώς ≥ 0
+#   - συγκρούσεις: ακριβές ελάχιστο του Σ conflict_sum πάνω σε ΟΛΕΣ τις κατανομές των (μόνο Ζ, Ι/Ζ+Ι)
+#     στα τμήματα (DP, pigeonhole: με περισσότερους «σημαδεμένους» από τμήματα κάποια ζεύγη είναι αναπόφευκτα)
+#   - φιλίες: συνεκτική συνιστώσα αμοιβαίων φίλων μεγέθους s > χωρητικότητας σπάει σε ≥ ⌈s/cap⌉ κομμάτια,
+#     άρα ≥ ⌈s/cap⌉−1 σπασμένες δυάδες
+# Όταν ένα σενάριο φτάσει το φράγμα, κανένα άλλο πλήρες σενάριο δεν μπορεί να το νικήσει.
+
+MAX_PER_CLASS = 25
+
+def _min_conflicts(z: int, j: int, num_classes: int, cap: int) -> int:
+    """min Σ_τμήματα conflict_sum(z_c, j_c, 0) με Σz_c = z, Σj_c = j, z_c + j_c ≤ cap (j = Ι ή Ζ+Ι)."""
+    a = np.arange(z + 1)[:, None]
+    b = np.arange(j + 1)[None, :]
+    q = conflict_sum(a, b, 0).astype(float)
+    q[a + b > cap] = np.inf
+    best = q.copy()                     # best[z', j'] = ελάχιστο για z', j' σε k τμήματα
+    for _ in range(num_classes - 1):
+        nxt = np.full_like(best, np.inf)
+        for da in range(z + 1):
+            for db in range(j + 1):
+                if not np.isfinite(q[da, db]):
+                    continue
+                cand = best[:z + 1 - da, :j + 1 - db] + q[da, db]
+                np.minimum(nxt[da:, db:], cand, out=nxt[da:, db:])
+        best = nxt
+    return int(best[z, j]) if np.isfinite(best[z, j]) else 0
+
+def _min_broken(pairs: List[Tuple[str, str]], cap: int) -> int:
+    """Σ (⌈s/cap⌉ − 1) πάνω στις συνεκτικές συνιστώσες του γράφου αμοιβαίων φίλων."""
+    parent: Dict[str, str] = {}
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[ra] = rb
+    sizes: Dict[str, int] = {}
+    for x in parent:
+        r = find(x)
+        sizes[r] = sizes.get(r, 0) + 1
+    return sum(-(-s // cap) - 1 for s in sizes.values())
+
+def score_lower_bound(df: pd.DataFrame, num_classes: Optional[int]=None,
+                      critical_pairs: Optional[List[Tuple[str,str]]]=None,
+                      capacity: int = MAX_PER_CLASS) -> Dict[str, Any]:
+    """
+    Κάτω φράγμα του total_score για οποιαδήποτε πλήρη ανάθεση του roster (μόνο από τα πλήθη, σε ms).
+    num_classes=None → ⌈#μαθητών / capacity⌉ (τουλάχιστον 2, όπως το _infer_num_classes_from_values).
+    Επιστρέφει dict με τα ελάχιστα diff_*, τις ελάχιστες ποινές ανά όρο και το total_score.
+    """
+    n = len(df)
+    if num_classes is None:
+        num_classes = max(2, -(-n // capacity))
+    if num_classes < 1:
+        raise ValueError("Το num_classes πρέπει να είναι ≥ 1.")
+    gender = df["ΦΥΛΟ"].map(_norm_str) if "ΦΥΛΟ" in df.columns else pd.Series([""] * n, index=df.index)
+    boys, girls = int((gender == "Α").sum()), int((gender == "Κ").sum())
+    good = int(_good_greek_mask(df).sum())
+
+    def floor(count: int) -> int:
+        return int(count % num_classes != 0)
+    diff_pop, diff_boys, diff_girls, diff_good = floor(n), floor(boys), floor(girls), floor(good)
+
+    z = df["ΖΩΗΡΟΣ"].map(_is_yes).to_numpy(dtype=bool) if "ΖΩΗΡΟΣ" in df.columns else np.zeros(n, dtype=bool)
+    i = (df["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].map(_is_yes).to_numpy(dtype=bool) if "ΙΔΙΑΙΤΕΡΟΤΗΤΑ" in df.columns
+         else np.zeros(n, dtype=bool))
+    conflicts = _min_conflicts(int((z & ~i).sum()), int(i.sum()), num_classes, capacity)
+
+    if critical_pairs is None:
+        pairs = _mutual_pairs(df)
+    else:
+        pairs = [tuple(sorted((str(a).strip(), str(b).strip()))) for a, b in critical_pairs]
+    broken = _min_broken(pairs, capacity)
+
+    population_penalty = max(0, diff_pop - 1) * 3
+    gender_penalty = max(0, diff_boys - 1) * 2 + max(0, diff_girls - 1) * 2
+    greek_penalty = max(0, diff_good - 2) * 1
+    total = population_penalty + gender_penalty + greek_penalty + conflicts + 5 * broken
+    return {
+        "num_classes": num_classes,
+        "capacity": capacity,
+        "feasible": n <= num_classes * capacity,
+        "diff_population": diff_pop,
+        "diff_boys": diff_boys,
+        "diff_girls": diff_girls,
+        "diff_gender": max(diff_boys, diff_girls),
+        "diff_greek": diff_good,
+        "population_penalty": population_penalty,
+        "gender_penalty": gender_penalty,
+        "greek_penalty": greek_penalty,
+        "conflict_penalty": conflicts,
+        "broken_friendships": broken,
+        "broken_friendships_penalty": 5 * broken,
+        "total_score": int(total),
+    }
+
+def reaches_bound(score: Dict[str, Any], bound: Dict[str, Any]) -> bool:
+    """True αν το score (score_one_scenario/pick_best) έχει ήδη πιάσει το κάτω φράγμα → βέλτιστο."""
+    return score is not None and int(score["total_score"]) <= int(bound["total_score"])
+
 # ------------------------ Convenience: score many & to Excel ------------------------
 
 def score_to_dataframe(df: pd.DataFrame, scenario_cols: List[str], **kwargs) -> pd.DataFrame:
     rows = []
-    for c in scenario_cols:
-        if c not in df.columns:
-            continue
-        s = score_one_scenario(df, c, **kwargs)
+    for s in score_scenarios_batch(df, scenario_cols, **kwargs):
+        c = s["scenario_col"]
         rows.append({
             "SCENARIO": c,
             "TOTAL": s["total_score"],
@@ -336,7 +1032,9 @@ def _ensure_optional_cols(df: pd.DataFrame):
         if k not in df.columns:
             df[k] = v
 
-def score_one_scenario_auto(df: pd.DataFrame, scenario_col: str | None = None, **kwargs):
+def score_one_scenario_auto(df: pd.DataFrame, scenario_col: str | None = None,
+                            cache: Optional[ScoreCache] = SCORE_CACHE, **kwargs):
+    """Όπως score_one_scenario, με αυτόματη στήλη/κανονικοποίηση· περνά από το cache (None → χωρίς cache)."""
     df = df.copy()
     if scenario_col is None:
         scenario_col = _find_scenario_col_auto(df)
@@ -344,4 +1042,6 @@ def score_one_scenario_auto(df: pd.DataFrame, scenario_col: str | None = None, *
         raise ValueError("Δεν βρέθηκε κατάλληλη στήλη τμήματος για το Βήμα 7.")
     _normalize_class_labels(df, scenario_col)
     _ensure_optional_cols(df)
-    return score_one_scenario(df, scenario_col, **kwargs)
+    if cache is None:
+        return score_one_scenario(df, scenario_col, **kwargs)
+    return score_scenarios_batch(df, [scenario_col], cache=cache, **kwargs)[0]
@@ -11,6 +11,8 @@ import zipfile
 import io
 import tempfile
 import os
+import time
+import uuid
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 import traceback
@@ -33,19 +35,23 @@ except ImportError:
 
 # Import των modules (θα πρέπει να είναι στον ίδιο φάκελο)
 try:
-    from step_1_paidia_ekp_FIXED import load_and_normalize, enumerate_all, write_outputs
-    from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
+    from step_1_paidia_ekp_FIXED import load_and_normalize, write_outputs
     from step3_amivaia_filia_FIXED import step3_run_all_from_step2
-    from step4_filikoi_omades_beltiosi_FIXED import apply_step4_strict
-    from step_5_ypoloipoi_mathites_FIXED_compat import apply_step5_to_all_scenarios
-    from step_6_final_check_and_fix_PATCHED import apply_step6_to_step5_scenarios
-    from step_7_final_score_FIXED_PATCHED import score_one_scenario_auto, pick_best_scenario
+    from step_7_final_score_FIXED_PATCHED import (pick_best_scenario, SCORE_CACHE, ScenarioScore,
+                                                  pareto_front)
     from friendship_filters_fixed import filter_scenarios_fixed
-    from statistics_generator import generate_statistics_table, export_statistics_to_excel
+    from statistics_generator import generate_statistics_table, export_statistics_to_excel, scenario_statistics
+    from result_store import frame_fingerprint
+    from pipeline import step_params_chain, normalize_roster
+    from stage_graph import CheckpointStore, pipeline_graph
+    from pipeline_jobs import JobManager, PENDING, RUNNING, FAILED, CANCELLED
 except ImportError as e:
     st.error(f"Σφάλμα εισαγωγής modules: {e}")
     st.stop()
 
+# Όριο εγγραφών ανά cached συνάρτηση (παλαιότερες εγγραφές απομακρύνονται)
+CACHE_MAX_ENTRIES = 32
+
 # Streamlit configuration
 st.set_page_config(
     page_title="Σύστημα Ανάθεσης Μαθητών",
@@ -62,51 +68,34 @@ def init_session_state():
         st.session_state.step_results = {}
     if 'current_step' not in st.session_state:
         st.session_state.current_step = 1
+    if 'active_job' not in st.session_state:
+        st.session_state.active_job = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _read_uploaded(data, file_name):
+    """Ανάγνωση αρχείου από τα bytes του (ίδιο περιεχόμενο → ίδια εγγραφή cache)."""
+    if file_name.endswith('.xlsx'):
+        return pd.read_excel(io.BytesIO(data))
+    return pd.read_csv(io.BytesIO(data))
 
 def load_data(uploaded_file):
     """Φόρτωση και κανονικοποίηση δεδομένων"""
     try:
-        if uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
-        elif uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
+        if uploaded_file.name.endswith(('.xlsx', '.csv')):
+            df = _read_uploaded(uploaded_file.getvalue(), uploaded_file.name)
         else:
             st.error("Υποστηρίζονται μόνο αρχεία .xlsx και .csv")
             return None
         
-        # Κανονικοποίηση στηλών
-        rename_map = {}
-        for col in df.columns:
-            col_str = str(col).strip().upper()
-            if any(x in col_str for x in ['ΟΝΟΜΑ', 'NAME', 'ΜΑΘΗΤΗΣ']):
-                rename_map[col] = 'ΟΝΟΜΑ'
-            elif any(x in col_str for x in ['ΦΥΛΟ', 'GENDER']):
-                rename_map[col] = 'ΦΥΛΟ'
-            elif 'ΓΝΩΣΗ' in col_str and 'ΕΛΛΗΝΙΚ' in col_str:
-                rename_map[col] = 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'
-            elif 'ΠΑΙΔΙ' in col_str and 'ΕΚΠΑΙΔΕΥΤΙΚ' in col_str:
-                rename_map[col] = 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'
-            elif 'ΦΙΛΟΙ' in col_str or 'FRIEND' in col_str:
-                rename_map[col] = 'ΦΙΛΟΙ'
-        
-        if rename_map:
-            df = df.rename(columns=rename_map)
-        
-        # Κανονικοποίηση τιμών
-        if 'ΦΥΛΟ' in df.columns:
-            df['ΦΥΛΟ'] = df['ΦΥΛΟ'].astype(str).str.upper().map({'Α':'Α', 'Κ':'Κ', 'ΑΓΟΡΙ':'Α', 'ΚΟΡΙΤΣΙ':'Κ'}).fillna('Α')
-        
-        for col in ['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ', 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ']:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.upper().map({'ΝΑΙ':'Ν', 'ΟΧΙ':'Ο', 'YES':'Ν', 'NO':'Ο', '1':'Ν', '0':'Ο'}).fillna('Ο')
-        
-        return df
+        return normalize_roster(df)
     except Exception as e:
         st.error(f"Σφάλμα φόρτωσης αρχείου: {e}")
         return None
 
-def display_scenario_statistics(df, scenario_col, scenario_name):
-    """Εμφάνιση στατιστικών για ένα σενάριο"""
+def display_scenario_statistics(df, scenario_col, scenario_name, stats_df=None):
+    """Εμφάνιση στατιστικών για ένα σενάριο (stats_df: ήδη υπολογισμένα, π.χ. από scenario_statistics)"""
     try:
         # Έλεγχος ότι η στήλη υπάρχει
         if scenario_col not in df.columns:
@@ -130,7 +119,8 @@ def display_scenario_statistics(df, scenario_col, scenario_name):
             return None
         
         # Δημιουργία στατιστικών
-        stats_df = generate_statistics_table(df_assigned)
+        if stats_df is None:
+            stats_df = generate_statistics_table(df_assigned)
         
         st.subheader(f"📊 Στατιστικά {scenario_name}")
         st.dataframe(stats_df, use_container_width=True)
@@ -272,55 +262,122 @@ def display_scenario_statistics(df, scenario_col, scenario_name):
         )
         st.plotly_chart(fig, use_container_width=True)
 
-def run_step1(df):
-    """Εκτέλεση Βήματος 1 - Παιδιά Εκπαιδευτικών"""
-    st.subheader("🎯 Βήμα 1: Ανάθεση Παιδιών Εκπαιδευτικών")
+# ------------------------ Υπολογισμοί βημάτων: background jobs + cache ------------------------
+#
+# Η αλυσίδα των βημάτων ορίζεται ΜΙΑ φορά, στο stage_graph.pipeline_graph() (ίδια με το batch_runner).
+# Κάθε κουμπί τρέχει graph.run(roster, stop=βήμα) σε background thread (pipeline_jobs.JobManager, ένας
+# ανά διεργασία μέσω st.cache_resource)· τα προηγούμενα βήματα διαβάζονται από τα checkpoints
+# (CHECKPOINT_DIR, κλειδί = hash roster + παράμετροι ανά βήμα), οπότε ίδιο roster από δύο χρήστες → ένας
+# υπολογισμός. Η συνεδρία κρατά μόνο το id του ενεργού job, οπότε reruns της σελίδας δεν το διακόπτουν·
+# η σελίδα ξαναζωγραφίζεται κάθε JOB_POLL_SECONDS με την πραγματική πρόοδο.
+
+JOB_WORKERS = 2
+JOB_POLL_SECONDS = 0.5
+# Checkpoints των βημάτων: ιδιωτικός φάκελος της εφαρμογής (0o700) με όριο μεγέθους (LRU)·
+# ρυθμίζονται με CLASS_ASSIGNMENT_CHECKPOINTS / CLASS_ASSIGNMENT_CHECKPOINTS_MB.
+CHECKPOINT_DIR = Path(os.environ.get("CLASS_ASSIGNMENT_CHECKPOINTS")
+                      or Path.home() / ".cache" / "class_assignment" / "checkpoints")
+CHECKPOINT_MAX_BYTES = int(os.environ.get("CLASS_ASSIGNMENT_CHECKPOINTS_MB", "512")) * 2**20
+
+STEP_LABELS = {
+    'step1': "Βήμα 1",
+    'step2': "Βήμα 2",
+    'step3': "Βήμα 3",
+    'step4': "Βήμα 4",
+    'final': "Βήματα 5-7",
+}
+NEXT_STEP = {'step1': 2, 'step2': 3, 'step3': 4, 'step4': 5, 'final': 6}
+
+@st.cache_resource
+def get_checkpoint_store():
+    return CheckpointStore(CHECKPOINT_DIR, max_bytes=CHECKPOINT_MAX_BYTES)
+
+def _job_step(step, roster, store, progress=None):
+    """Σώμα του background job: graph ως και το βήμα (τα προηγούμενα από checkpoints) → (αποτελέσματα, μηνύματα)."""
+    outputs = pipeline_graph().run(roster, store=store, stop=step, progress=progress)
+    return outputs[step]
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager(max_workers=JOB_WORKERS)
+
+def start_step_job(step):
+    """Υποβάλλει ένα βήμα για το τρέχον roster· ίδιο roster + παράμετροι → το ίδιο job για όλους."""
+    roster = st.session_state.data
+    if st.session_state.get('roster_key') is None:
+        st.session_state.roster_key = frame_fingerprint(roster)
+    chain = step_params_chain(step)
+    job = get_job_manager().submit(_job_step, step, roster, get_checkpoint_store(),
+                                   key=(st.session_state.roster_key, chain), label=STEP_LABELS[step],
+                                   subscriber=st.session_state.session_id)
+    st.session_state.active_job = {'id': job.id, 'step': step}
+    return job
+
+def show_messages(messages):
+    for kind, text in messages:
+        getattr(st, kind)(text)
+
+def _progress_caption(info):
+    parts = []
+    if info.get('total'):
+        parts.append(f"Σενάρια: {info.get('done', 0)}/{info['total']}")
+    if 'nodes' in info:
+        parts.append(f"Κόμβοι DFS: {info['nodes']:,}")
+    if 'elapsed' in info:
+        parts.append(f"{info['elapsed']:.1f}s")
+    return " · ".join(parts)
+
+def poll_active_job():
+    """
+    Ελέγχει το ενεργό job της συνεδρίας. Όσο τρέχει: πρόοδος + κουμπί ακύρωσης + αυτόματο rerun.
+    Όταν τελειώσει: αποθηκεύει τα αποτελέσματα, προχωρά το current_step και τα εμφανίζει μία φορά.
+    """
+    active = st.session_state.get('active_job')
+    if not active:
+        return
+    job = get_job_manager().get(active['id'])
+    step = active['step']
+    if job is None:
+        st.session_state.active_job = None
+        st.warning(f"Το job του {STEP_LABELS[step]} δεν βρέθηκε (επανεκκίνηση διακομιστή;). Εκτελέστε το ξανά.")
+        return
+    
+    snap = job.snapshot()
+    if snap['status'] in (PENDING, RUNNING):
+        st.subheader(f"⏳ {STEP_LABELS[step]} σε εξέλιξη")
+        st.progress(min(100, int(100 * snap['fraction'])))
+        st.caption(_progress_caption(snap['progress']) or "Αναμονή για διαθέσιμο worker...")
+        if snap['cancel_requested']:
+            st.info("Ζητήθηκε ακύρωση...")
+        elif st.button("⏹️ Ακύρωση", key=f"cancel_{job.id}"):
+            # Κοινό job: η συνεδρία αποσυνδέεται· ακυρώνεται μόνο αν δεν το περιμένει άλλος χρήστης
+            get_job_manager().release(job.id, st.session_state.session_id)
+            st.session_state.active_job = None
+            st.warning(f"⏹️ {STEP_LABELS[step]}: ακυρώθηκε.")
+            return
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
     
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    st.session_state.active_job = None
+    if snap['status'] == CANCELLED:
+        st.warning(f"⏹️ {STEP_LABELS[step]}: ακυρώθηκε.")
+        return
+    if snap['status'] == FAILED:
+        st.error(f"Σφάλμα στο {STEP_LABELS[step]}: {snap['error']}")
+        return
+    
+    results, messages = job.result
+    if results:
+        st.session_state.step_results[step] = results
+        st.session_state.current_step = NEXT_STEP[step]
+    DISPLAY[step](results, messages)
+
+def display_step1(step1_results, messages):
+    """Αποτελέσματα Βήματος 1 - Παιδιά Εκπαιδευτικών"""
+    st.subheader("🎯 Βήμα 1: Ανάθεση Παιδιών Εκπαιδευτικών")
+    show_messages(messages)
     
     try:
-        status_text.text("Φόρτωση και κανονικοποίηση δεδομένων...")
-        progress_bar.progress(25)
-        
-        # Απαρίθμηση σεναρίων
-        status_text.text("Δημιουργία σεναρίων...")
-        progress_bar.progress(50)
-        
-        teacher_kids = df[df['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'] == 'Ν']
-        if len(teacher_kids) <= 12:
-            sols, names = enumerate_all(df, top_k=3)
-        else:
-            st.warning("Πολλά παιδιά εκπαιδευτικών (>12). Χρήση greedy approach.")
-            sols, names = enumerate_all(df, top_k=3)  # fallback
-        
-        status_text.text("Εγγραφή αποτελεσμάτων...")
-        progress_bar.progress(75)
-        
-        # Δημιουργία DataFrames για κάθε σενάριο
-        step1_results = {}
-        for i, (score, assign_map, state) in enumerate(sols, 1):
-            df_scenario = df.copy()
-            col_name = f"ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{i}"
-            df_scenario[col_name] = np.nan
-            
-            # Ανάθεση παιδιών εκπαιδευτικών
-            for name, section in assign_map.items():
-                mask = df_scenario['ΟΝΟΜΑ'] == name
-                df_scenario.loc[mask, col_name] = section
-            
-            step1_results[f"ΣΕΝΑΡΙΟ_{i}"] = {
-                'df': df_scenario,
-                'score': score,
-                'assignments': assign_map,
-                'state': state,
-                'column': col_name
-            }
-        
-        progress_bar.progress(100)
-        status_text.text("✅ Βήμα 1 ολοκληρώθηκε επιτυχώς!")
-        
-        # Εμφάνιση αποτελεσμάτων
         st.success(f"Δημιουργήθηκαν {len(step1_results)} σενάρια")
         
         # Πίνακας σύγκρισης
@@ -344,210 +401,50 @@ def run_step1(df):
         # Στατιστικά για κάθε σενάριο
         st.subheader("📈 Αναλυτικά Στατιστικά Σεναρίων")
         for name, result in step1_results.items():
-            display_scenario_statistics(result['df'], result['column'], name)
-        
-        return step1_results
+            display_scenario_statistics(result['scenario'].frame(), result['column'], name)
         
     except Exception as e:
         st.error(f"Σφάλμα στο Βήμα 1: {e}")
         st.code(traceback.format_exc())
-        return None
 
-def run_step2(step1_results):
-    """Εκτέλεση Βήματος 2 - Ζωηροί & Ιδιαιτερότητες"""
+def display_step2(step2_results, messages):
+    """Αποτελέσματα Βήματος 2 - Ζωηροί & Ιδιαιτερότητες"""
     st.subheader("⚡ Βήμα 2: Ανάθεση Ζωηρών & Ιδιαιτεροτήτων")
-    
-    step2_results = {}
-    
-    for scenario_name, step1_data in step1_results.items():
-        st.write(f"**Επεξεργασία {scenario_name}**")
-        
-        progress_bar = st.progress(0)
-        
-        try:
-            df = step1_data['df']
-            step1_col = step1_data['column']
-            
-            progress_bar.progress(50)
-            
-            # Εκτέλεση Step 2
-            results = step2_apply_FIXED_v3(
-                df, 
-                num_classes=2, 
-                step1_col_name=step1_col,
-                max_results=5
-            )
-            
-            progress_bar.progress(100)
-            
-            if results:
-                # Επιλογή καλύτερου αποτελέσματος
-                best_result = results[0]  # Το πρώτο είναι συνήθως το καλύτερο
-                step2_results[scenario_name] = {
-                    'df': best_result[1],
-                    'metrics': best_result[2],
-                    'column': best_result[1].columns[-1]  # Η νέα στήλη
-                }
-                
-                st.success(f"✅ {scenario_name}: {len(results)} αποτελέσματα")
-                st.json(best_result[2])
-            else:
-                st.warning(f"⚠️ {scenario_name}: Δεν βρέθηκαν λύσεις")
-                
-        except Exception as e:
-            st.error(f"Σφάλμα στο {scenario_name}: {e}")
-    
-    return step2_results
+    show_messages(messages)
+    for scenario_name, result in step2_results.items():
+        st.write(f"**{scenario_name}**")
+        st.json(result['metrics'])
 
-def run_step3(step2_results):
-    """Εκτέλεση Βήματος 3 - Αμοιβαία Φιλία"""
+def display_step3(step3_results, messages):
+    """Αποτελέσματα Βήματος 3 - Αμοιβαία Φιλία"""
     st.subheader("👫 Βήμα 3: Ανάθεση Αμοιβαίων Φιλιών")
-    
-    step3_results = {}
-    
-    for scenario_name, step2_data in step2_results.items():
-        st.write(f"**Επεξεργασία {scenario_name}**")
-        
-        try:
-            df = step2_data['df']
-            step2_col = step2_data['column']
-            
-            # Προσομοίωση Step 3 (χρήση του υπάρχοντος module)
-            from step_3_helpers_FIXED import apply_step3_on_sheet
-            
-            df_step3, metrics = apply_step3_on_sheet(df, step2_col, num_classes=2)
-            
-            step3_results[scenario_name] = {
-                'df': df_step3,
-                'metrics': metrics,
-                'column': step2_col.replace('ΒΗΜΑ2', 'ΒΗΜΑ3')
-            }
-            
-            st.success(f"✅ {scenario_name} ολοκληρώθηκε")
-            st.json(metrics)
-            
-        except Exception as e:
-            st.error(f"Σφάλμα στο {scenario_name}: {e}")
-    
-    return step3_results
+    show_messages(messages)
+    for scenario_name, result in step3_results.items():
+        st.write(f"**{scenario_name}**")
+        st.json(result['metrics'])
 
-def run_step4(step3_results):
-    """Εκτέλεση Βήματος 4 - Φιλικές Ομάδες"""
+def display_step4(step4_results, messages):
+    """Αποτελέσματα Βήματος 4 - Φιλικές Ομάδες"""
     st.subheader("👥 Βήμα 4: Ανάθεση Φιλικών Ομάδων")
-    
-    step4_results = {}
-    
-    for scenario_name, step3_data in step3_results.items():
-        st.write(f"**Επεξεργασία {scenario_name}**")
-        
-        try:
-            df = step3_data['df']
-            step3_col = step3_data['column']
-            
-            progress_bar = st.progress(0)
-            
-            # Εκτέλεση Step 4
-            results = apply_step4_strict(
-                df, 
-                assigned_column=step3_col, 
-                num_classes=2,
-                max_results=3,
-                max_nodes=50000
-            )
-            
-            progress_bar.progress(100)
-            
-            if results:
-                best_placement, best_penalty = results[0]
-                
-                # Εφαρμογή ανάθεσης
-                df_step4 = df.copy()
-                step4_col = step3_col.replace('ΒΗΜΑ3', 'ΒΗΜΑ4')
-                df_step4[step4_col] = df_step4[step3_col]
-                
-                # Ανάθεση ομάδων
-                for group, class_assigned in best_placement.items():
-                    for student in group:
-                        mask = df_step4['ΟΝΟΜΑ'] == student
-                        df_step4.loc[mask, step4_col] = class_assigned
-                
-                step4_results[scenario_name] = {
-                    'df': df_step4,
-                    'penalty': best_penalty,
-                    'column': step4_col
-                }
-                
-                st.success(f"✅ {scenario_name}: Penalty = {best_penalty}")
-            else:
-                st.warning(f"⚠️ {scenario_name}: Δεν βρέθηκαν λύσεις")
-                
-        except Exception as e:
-            st.error(f"Σφάλμα στο {scenario_name}: {e}")
-    
-    return step4_results
+    show_messages(messages)
 
-def run_steps_5_6_7(step4_results):
-    """Εκτέλεση Βημάτων 5, 6, 7 - Τελικοποίηση"""
+def display_steps_5_6_7(final_results, messages):
+    """Αποτελέσματα Βημάτων 5, 6, 7 - Τελικοποίηση"""
     st.subheader("🏁 Βήματα 5-7: Τελικοποίηση Ανάθεσης")
-    
-    final_results = {}
-    
-    for scenario_name, step4_data in step4_results.items():
-        st.write(f"**Τελικοποίηση {scenario_name}**")
-        
-        try:
-            df = step4_data['df']
-            step4_col = step4_data['column']
-            
-            # Step 5: Υπόλοιποι μαθητές
-            df_step5, penalty5 = apply_step5_to_all_scenarios(
-                {scenario_name: df}, 
-                step4_col, 
-                num_classes=2
-            )
-            if df_step5 is not None:
-                df = df_step5
-            
-            # Step 6: Τελικός έλεγχος
-            step5_col = step4_col.replace('ΒΗΜΑ4', 'ΒΗΜΑ5')
-            if step5_col not in df.columns:
-                df[step5_col] = df[step4_col]
-            
-            step6_output = apply_step6_to_step5_scenarios(
-                {scenario_name: df},
-                class_col=step5_col
-            )
-            
-            if scenario_name in step6_output:
-                df_final = step6_output[scenario_name]['df']
-                summary6 = step6_output[scenario_name]['summary']
-            else:
-                df_final = df
-                summary6 = {}
-            
-            # Step 7: Τελικό σκορ
-            step6_col = 'ΒΗΜΑ6_ΤΜΗΜΑ'
-            if step6_col not in df_final.columns:
-                step6_col = step5_col
-            
-            final_score = score_one_scenario_auto(df_final, step6_col)
-            
-            final_results[scenario_name] = {
-                'df': df_final,
-                'step5_penalty': penalty5 if 'penalty5' in locals() else 0,
-                'step6_summary': summary6,
-                'final_score': final_score,
-                'final_column': step6_col
-            }
-            
-            st.success(f"✅ {scenario_name} ολοκληρώθηκε")
-            st.write(f"**Τελικό Score:** {final_score['total_score']}")
-            
-        except Exception as e:
-            st.error(f"Σφάλμα στην τελικοποίηση {scenario_name}: {e}")
-            st.code(traceback.format_exc())
-    
-    return final_results
+    show_messages(messages)
+
+DISPLAY = {
+    'step1': display_step1,
+    'step2': display_step2,
+    'step3': display_step3,
+    'step4': display_step4,
+    'final': display_steps_5_6_7,
+}
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _final_statistics(roster_key, params_chain, _final_results):
+    return scenario_statistics({name: (result['scenario'].frame(), result['final_column'])
+                                for name, result in _final_results.items()})
 
 def display_final_results(final_results):
     """Εμφάνιση τελικών αποτελεσμάτων"""
@@ -555,6 +452,7 @@ def display_final_results(final_results):
     
     # Σύγκριση σεναρίων
     comparison_data = []
+    front = {id(s) for s in pareto_front([r['final_score'] for r in final_results.values()])}
     for name, result in final_results.items():
         score = result['final_score']
         comparison_data.append({
@@ -563,15 +461,22 @@ def display_final_results(final_results):
             'Διαφορά Πληθυσμού': score['diff_population'],
             'Διαφορά Φύλου': score['diff_gender'],
             'Διαφορά Γνώσης': score['diff_greek'],
-            'Σπασμένες Φιλίες': score['broken_friendships']
+            'Σπασμένες Φιλίες': score['broken_friendships'],
+            'Pareto': id(score) in front
         })
     
     comparison_df = pd.DataFrame(comparison_data)
-    st.dataframe(comparison_df, use_container_width=True)
+    if st.checkbox("Μόνο μη-κυριαρχούμενα σενάρια (Pareto)", key="pareto_only"):
+        st.dataframe(comparison_df[comparison_df['Pareto']], use_container_width=True)
+    else:
+        st.dataframe(comparison_df, use_container_width=True)
     
     # Καλύτερο σενάριο
     best_scenario = min(comparison_data, key=lambda x: x['Συνολικό Score'])
     st.success(f"🥇 **Καλύτερο Σενάριο:** {best_scenario['Σενάριο']} (Score: {best_scenario['Συνολικό Score']})")
+    cache_stats = SCORE_CACHE.stats()
+    st.caption(f"Cache Βήματος 7: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+               f"({cache_stats['size']} αναθέσεις)")
     
     # Γράφημα σύγκρισης
     if PLOTLY_AVAILABLE:
@@ -597,28 +502,63 @@ def display_final_results(final_results):
     
     # Αναλυτικά στατιστικά για κάθε σενάριο
     st.subheader("📊 Αναλυτικά Στατιστικά Τελικών Σεναρίων")
+    # ένα πέρασμα για ΟΛΑ τα σενάρια (cached ανά roster + παραμέτρους)· κάθε σενάριο παίρνει το κομμάτι του
+    all_stats = _final_statistics(st.session_state.get('roster_key'), step_params_chain('final'), final_results)
     for name, result in final_results.items():
-        display_scenario_statistics(result['df'], result['final_column'], f"Τελικό {name}")
+        stats_df = all_stats.xs(name, level="ΣΕΝΑΡΙΟ") if name in all_stats.index.get_level_values(0) else None
+        display_scenario_statistics(result['scenario'].frame(), result['final_column'], f"Τελικό {name}", stats_df=stats_df)
     
     return comparison_df
 
+def display_manual_editor(final_results):
+    """Χειροκίνητες μετακινήσεις με άμεσο νέο score (ScenarioScore, χωρίς πλήρη επαναβαθμολόγηση)."""
+    st.subheader("✏️ Χειροκίνητες Μετακινήσεις")
+    name = st.selectbox("Σενάριο", list(final_results), key="whatif_scenario")
+    result = final_results[name]
+    key = f"whatif_{name}"
+    if key not in st.session_state:
+        st.session_state[key] = ScenarioScore.from_auto(result['scenario'].frame(), result['final_column'])
+    ws = st.session_state[key]
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    student = col1.selectbox("Μαθητής", sorted(ws.students()), key=f"{key}_student")
+    col1.caption(f"Τρέχον τμήμα: {ws.class_of(student)}")
+    target = col2.selectbox("Νέο τμήμα", ws.classes(), key=f"{key}_target")
+    if col3.button("➡️ Μετακίνηση", key=f"{key}_move"):
+        ws.move(student, target)
+    if col3.button("↩️ Αναίρεση", key=f"{key}_undo", disabled=not ws.history):
+        ws.undo()
+
+    score = ws.score()
+    base = result['final_score']['total_score']
+    st.metric("Score μετά τις αλλαγές", score['total_score'], delta=score['total_score'] - base, delta_color="inverse")
+    st.dataframe(pd.DataFrame({
+        'Πληθυσμός': score['population_counts'],
+        'Αγόρια': score['boys_counts'],
+        'Κορίτσια': score['girls_counts'],
+        'Καλή Γνώση': score['good_greek_counts'],
+    }), use_container_width=True)
+    st.caption(f"Συγκρούσεις: {score['conflict_penalty']} · Σπασμένες φιλίες: {score['broken_friendships']} · "
+               f"Κινήσεις: {len(ws.history)}")
+
 def create_download_package(final_results):
     """Δημιουργία πακέτου download"""
     zip_buffer = io.BytesIO()
     
+    all_stats = scenario_statistics({name: (result['scenario'].frame(), result['final_column'])
+                                     for name, result in final_results.items()})
+    
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
         for scenario_name, result in final_results.items():
             # DataFrame σε Excel
             excel_buffer = io.BytesIO()
             with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
                 # Κύρια δεδομένα
-                result['df'].to_excel(writer, sheet_name='Αποτελέσματα', index=False)
+                result['scenario'].frame().to_excel(writer, sheet_name='Αποτελέσματα', index=False)
                 
                 # Στατιστικά
                 try:
-                    df_assigned = result['df'][result['df'][result['final_column']].notna()].copy()
-                    df_assigned['ΤΜΗΜΑ'] = df_assigned[result['final_column']]
-                    stats_df = generate_statistics_table(df_assigned)
+                    stats_df = all_stats.xs(scenario_name, level="ΣΕΝΑΡΙΟ")
                     stats_df.to_excel(writer, sheet_name='Στατιστικά', index=True)
                 except Exception as e:
                     print(f"Σφάλμα στα στατιστικά {scenario_name}: {e}")
@@ -652,6 +592,7 @@ def create_download_package(final_results):
             summary_df = pd.DataFrame(comparison_data)
             with pd.ExcelWriter(summary_buffer, engine='openpyxl') as writer:
                 summary_df.to_excel(writer, sheet_name='Σύγκριση_Σεναρίων', index=False)
+                all_stats.to_excel(writer, sheet_name='Στατιστικά_Σεναρίων', index=True)
             zip_file.writestr("ΣΥΝΟΨΗ_Σύγκριση_Σεναρίων.xlsx", summary_buffer.getvalue())
     
     return zip_buffer.getvalue()
@@ -679,6 +620,8 @@ def main():
         if st.session_state.data is None:
             with st.spinner("Φόρτωση δεδομένων..."):
                 st.session_state.data = load_data(uploaded_file)
+                st.session_state.roster_key = (frame_fingerprint(st.session_state.data)
+                                               if st.session_state.data is not None else None)
         
         if st.session_state.data is not None:
             # Εμφάνιση περίληψης
@@ -687,53 +630,39 @@ def main():
             # Επιλογή βημάτων
             st.sidebar.subheader("🔄 Εκτέλεση Βημάτων")
             
+            busy = bool(st.session_state.get('active_job'))
+            
             # Βήμα 1
-            if st.sidebar.button("▶️ Εκτέλεση Βήματος 1", disabled=st.session_state.current_step > 1):
-                with st.spinner("Εκτέλεση Βήματος 1..."):
-                    result = run_step1(st.session_state.data)
-                    if result:
-                        st.session_state.step_results['step1'] = result
-                        st.session_state.current_step = 2
+            if st.sidebar.button("▶️ Εκτέλεση Βήματος 1", disabled=busy or st.session_state.current_step > 1):
+                start_step_job('step1')
             
             # Βήμα 2
-            if st.sidebar.button("▶️ Εκτέλεση Βήματος 2", disabled=st.session_state.current_step != 2):
+            if st.sidebar.button("▶️ Εκτέλεση Βήματος 2", disabled=busy or st.session_state.current_step != 2):
                 if 'step1' in st.session_state.step_results:
-                    with st.spinner("Εκτέλεση Βήματος 2..."):
-                        result = run_step2(st.session_state.step_results['step1'])
-                        if result:
-                            st.session_state.step_results['step2'] = result
-                            st.session_state.current_step = 3
+                    start_step_job('step2')
             
             # Βήμα 3
-            if st.sidebar.button("▶️ Εκτέλεση Βήματος 3", disabled=st.session_state.current_step != 3):
+            if st.sidebar.button("▶️ Εκτέλεση Βήματος 3", disabled=busy or st.session_state.current_step != 3):
                 if 'step2' in st.session_state.step_results:
-                    with st.spinner("Εκτέλεση Βήματος 3..."):
-                        result = run_step3(st.session_state.step_results['step2'])
-                        if result:
-                            st.session_state.step_results['step3'] = result
-                            st.session_state.current_step = 4
+                    start_step_job('step3')
             
             # Βήμα 4
-            if st.sidebar.button("▶️ Εκτέλεση Βήματος 4", disabled=st.session_state.current_step != 4):
+            if st.sidebar.button("▶️ Εκτέλεση Βήματος 4", disabled=busy or st.session_state.current_step != 4):
                 if 'step3' in st.session_state.step_results:
-                    with st.spinner("Εκτέλεση Βήματος 4..."):
-                        result = run_step4(st.session_state.step_results['step3'])
-                        if result:
-                            st.session_state.step_results['step4'] = result
-                            st.session_state.current_step = 5
+                    start_step_job('step4')
             
             # Βήματα 5-7
-            if st.sidebar.button("▶️ Εκτέλεση Βημάτων 5-7", disabled=st.session_state.current_step != 5):
+            if st.sidebar.button("▶️ Εκτέλεση Βημάτων 5-7", disabled=busy or st.session_state.current_step != 5):
                 if 'step4' in st.session_state.step_results:
-                    with st.spinner("Εκτέλεση Βημάτων 5-7..."):
-                        result = run_steps_5_6_7(st.session_state.step_results['step4'])
-                        if result:
-                            st.session_state.step_results['final'] = result
-                            st.session_state.current_step = 6
+                    start_step_job('final')
+            
+            # Ενεργό job: πρόοδος/ακύρωση όσο τρέχει, αποτελέσματα όταν τελειώσει
+            poll_active_job()
             
             # Εμφάνιση τελικών αποτελεσμάτων
             if 'final' in st.session_state.step_results:
                 comparison_df = display_final_results(st.session_state.step_results['final'])
+                display_manual_editor(st.session_state.step_results['final'])
                 
                 # Download
                 st.sidebar.subheader("💾 Λήψη Αποτελεσμάτων")
@@ -18,7 +18,8 @@ try:
     from step_1_helpers_FIXED import load_and_normalize, enumerate_all, write_outputs
     from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
     from step3_amivaia_filia_FIXED import step3_run_all_from_step2
-    from step4_filikoi_omades_beltiosi_FIXED import apply_step4_strict
+    from step4_filikoi_omades_beltiosi_FIXED import (apply_step4_strict, INTERACTIVE_MAX_NODES,
+                                                     INTERACTIVE_TIME_BUDGET)
     from step_5_ypoloipoi_mathites_FIXED_compat import apply_step5_to_all_scenarios
     from step_6_final_check_and_fix_PATCHED import apply_step6_to_step5_scenarios
     from step_7_final_score_FIXED_PATCHED import score_one_scenario_auto, pick_best_scenario
@@ -266,7 +267,8 @@ def run_all_steps(step1_results):
             progress_bar.progress(45)
             
             step4_results = apply_step4_strict(
-                df, assigned_column=step3_col, num_classes=2, max_results=1, max_nodes=20000
+                df, assigned_column=step3_col, num_classes=2, max_results=1,
+                max_nodes=INTERACTIVE_MAX_NODES, time_budget=INTERACTIVE_TIME_BUDGET
             )
             
             if step4_results:
@@ -39,13 +39,18 @@ def init_session_state():
     if 'detailed_steps' not in st.session_state:
         st.session_state.detailed_steps = {}
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def _read_uploaded(data, file_name):
+    """Ανάγνωση αρχείου από τα bytes του (ίδιο περιεχόμενο → ίδια εγγραφή cache)."""
+    if file_name.endswith('.xlsx'):
+        return pd.read_excel(io.BytesIO(data))
+    return pd.read_csv(io.BytesIO(data))
+
 def safe_load_data(uploaded_file):
     """Ασφαλής φόρτωση και κανονικοποίηση δεδομένων"""
     try:
-        if uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
-        elif uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
+        if uploaded_file.name.endswith(('.xlsx', '.csv')):
+            df = _read_uploaded(uploaded_file.getvalue(), uploaded_file.name)
         else:
             return None, "Μη υποστηριζόμενο format αρχείου"
         